@@ -12,9 +12,146 @@ class Settings(BaseSettings):
     KAFKA_ENABLED: bool = os.getenv('KAFKA_ENABLED', 'true').lower() == 'true'
     KAFKA_BROKER: str = "localhost:9092"
     KAFKA_NOTIFICATION_TOPIC: str = "notifications"
+    KAFKA_EMAIL_TOPIC: str = "emails"
+    
+    # Consumo por lotes: se agrupan hasta N registros o se espera hasta T ms
+    KAFKA_CONSUMER_BATCH_ENABLED: bool = True
+    KAFKA_CONSUMER_BATCH_SIZE: int = 500
+    KAFKA_CONSUMER_LINGER_MS: int = 200
+    # Pool de workers: los eventos de un mismo user_id van siempre al mismo
+    # worker (orden por usuario); 1 conserva el consumo en un solo hilo
+    KAFKA_CONSUMER_WORKERS: int = 4
+    KAFKA_CONSUMER_QUEUE_SIZE: int = 1000
+    KAFKA_CONSUMER_COMMIT_INTERVAL_MS: int = 1000
+    # Eventos recientes recordados para descartar re-entregas sin ir a la DB
+    KAFKA_DEDUP_CACHE_SIZE: int = 100000
+    # Días que se conservan los IDs de eventos procesados (deben cubrir la
+    # retención del tema); 0 los conserva siempre
+    KAFKA_DEDUP_RETENTION_DAYS: int = 7
+    
+    # Fallos del consumidor: los eventos inválidos van al dead-letter y los
+    # errores transitorios se reintentan desde un tema aparte con espera
+    # exponencial, sin frenar la partición original
+    KAFKA_FAILURE_PIPELINE_ENABLED: bool = False
+    KAFKA_RETRY_TOPIC: str = "notifications.retry"
+    KAFKA_DEAD_LETTER_TOPIC: str = "notifications.dlq"
+    KAFKA_RETRY_BACKOFF_SECONDS: float = 1.0
+    KAFKA_RETRY_BACKOFF_MAX_SECONDS: float = 300.0
+    # Intentos totales (incluido el primero) antes del dead-letter
+    KAFKA_RETRY_MAX_ATTEMPTS: int = 6
+    # Reintentos retenidos en memoria a la espera de su hora; al llenarse se pausa el tema
+    KAFKA_RETRY_MAX_PENDING: int = 10000
+    
+    # Productor: envío asíncrono agrupado (compresión: gzip, snappy, lz4, zstd)
+    KAFKA_PRODUCER_LINGER_MS: int = 5
+    KAFKA_PRODUCER_BATCH_SIZE: int = 65536
+    KAFKA_PRODUCER_COMPRESSION: Optional[str] = None
+    KAFKA_PRODUCER_SERIALIZER: str = "json"
+    KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS: float = 10.0
     
     # Database - PostgreSQL for Render
     DATABASE_URL: Optional[str] = os.getenv('DATABASE_URL')
+    # Motor async (psycopg) para las rutas HTTP; el consumidor Kafka usa el síncrono
+    DATABASE_ASYNC_ENABLED: bool = True
+    DATABASE_ASYNC_POOL_SIZE: int = 15
+    DATABASE_ASYNC_MAX_OVERFLOW: int = 0
+    # Pool del motor síncrono (consumidor Kafka, retención, réplicas) y espera máxima por conexión
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Sentencias preparadas de psycopg tras N ejecuciones; -1 las desactiva (PgBouncer en modo transacción)
+    DATABASE_PREPARE_THRESHOLD: int = 5
+    # Réplicas de lectura separadas por comas para los listados y el contador
+    DATABASE_READ_URLS: str = ""
+    # Tras escribir, el usuario lee del primario durante esta ventana (read-your-writes)
+    DATABASE_READ_STICKY_SECONDS: float = 5.0
+    
+    # Arranque rápido (scale-to-zero): la inicialización corre en segundo plano,
+    # /health responde de inmediato y las peticiones esperan a la base de datos
+    FAST_STARTUP: bool = False
+    STARTUP_WAIT_TIMEOUT_SECONDS: float = 30.0
+    # Conexiones abiertas por adelantado en cada pool durante el arranque rápido
+    DATABASE_POOL_WARMUP: int = 2
+    
+    # Paginación de GET /notifications
+    NOTIFICATIONS_PAGE_SIZE: int = 50
+    NOTIFICATIONS_MAX_PAGE_SIZE: int = 200
+    
+    # Creación en lote (POST /notifications/batch)
+    NOTIFICATIONS_BATCH_MAX_SIZE: int = 10000
+    
+    # Group commit de POST /notifications: las creaciones concurrentes se
+    # escriben juntas en una transacción cada N filas o cada T ms
+    NOTIFICATIONS_GROUP_COMMIT_ENABLED: bool = False
+    NOTIFICATIONS_GROUP_COMMIT_MAX_ROWS: int = 500
+    NOTIFICATIONS_GROUP_COMMIT_MAX_DELAY_MS: float = 5.0
+    
+    # Fusión de notificaciones similares (userid, type, related_project_id)
+    # Política "tipo:segundos" separada por comas, p. ej. "informative:60,application:30";
+    # vacía desactiva la fusión
+    NOTIFICATIONS_COALESCE_POLICY: str = ""
+    
+    # Caché del contador de no leídas
+    UNREAD_COUNT_CACHE_TTL_SECONDS: float = 30.0
+    UNREAD_COUNT_CACHE_MAX_USERS: int = 10000
+    
+    # Versión por usuario para ETag en GET /notifications
+    NOTIFICATIONS_VERSION_CACHE_TTL_SECONDS: float = 5.0
+    NOTIFICATIONS_VERSION_CACHE_MAX_USERS: int = 10000
+    
+    # Caché de listados por usuario (read-through, invalidado en escrituras)
+    NOTIFICATIONS_CACHE_ENABLED: bool = True
+    NOTIFICATIONS_CACHE_TTL_SECONDS: float = 30.0
+    NOTIFICATIONS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Hot tier en memoria: las notificaciones más recientes de cada usuario,
+    # actualizadas en cada escritura en lugar de invalidarse; sirve las
+    # páginas de GET /notifications sin filtros que caen dentro del buffer
+    NOTIFICATIONS_HOT_TIER_ENABLED: bool = False
+    NOTIFICATIONS_HOT_TIER_SIZE: int = 50
+    NOTIFICATIONS_HOT_TIER_TTL_SECONDS: float = 30.0
+    NOTIFICATIONS_HOT_TIER_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Notificaciones en vivo (WebSocket / SSE)
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 25.0
+    STREAM_CATCHUP_LIMIT: int = 200
+    
+    # Feed de cambios entre instancias (PostgreSQL LISTEN/NOTIFY): cada
+    # escritura se anuncia en el canal y las demás réplicas invalidan sus
+    # cachés y empujan las notificaciones nuevas a sus conexiones en vivo.
+    # El listener necesita una conexión directa (no PgBouncer en modo transacción)
+    NOTIFICATIONS_CHANGE_FEED_ENABLED: bool = False
+    NOTIFICATIONS_CHANGE_FEED_CHANNEL: str = "notifications_changes"
+    # Ventana para agrupar los avisos de una ráfaga antes de despacharlos
+    NOTIFICATIONS_CHANGE_FEED_BATCH_MS: float = 20.0
+    NOTIFICATIONS_CHANGE_FEED_MAX_BATCH: int = 1000
+    # Con más cambios de un usuario en un lote se reconstruye su estado completo
+    NOTIFICATIONS_CHANGE_FEED_MAX_USER_EVENTS: int = 50
+    
+    # Particionado mensual por fecha (solo PostgreSQL, bases nuevas)
+    NOTIFICATIONS_PARTITIONING_ENABLED: bool = False
+    NOTIFICATIONS_PARTITION_MONTHS_AHEAD: int = 3
+    
+    # Retención en segundo plano (0 desactiva cada regla)
+    NOTIFICATIONS_RETENTION_MONTHS: int = 0
+    NOTIFICATIONS_RETENTION_DETACH_ONLY: bool = False
+    NOTIFICATIONS_READ_RETENTION_DAYS: int = 0
+    NOTIFICATIONS_RETENTION_BATCH_SIZE: int = 1000
+    NOTIFICATIONS_RETENTION_INTERVAL_SECONDS: int = 3600
+    
+    # Resumen por email de no leídas: un evento por usuario en KAFKA_EMAIL_TOPIC
+    # con lo acumulado desde su último resumen (requiere Kafka)
+    NOTIFICATIONS_DIGEST_ENABLED: bool = False
+    NOTIFICATIONS_DIGEST_INTERVAL_SECONDS: int = 3600
+    # Ventana máxima que se revisa; lo más antiguo no entra en ningún resumen
+    NOTIFICATIONS_DIGEST_LOOKBACK_HOURS: int = 48
+    NOTIFICATIONS_DIGEST_MIN_UNREAD: int = 1
+    NOTIFICATIONS_DIGEST_MAX_ITEMS: int = 5
+    NOTIFICATIONS_DIGEST_BATCH_SIZE: int = 500
+    
+    # Métricas Prometheus en /metrics
+    METRICS_ENABLED: bool = True
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -1,6 +1,18 @@
-from sqlalchemy import create_engine, MetaData
+import asyncio
+import hashlib
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import create_engine, inspect, MetaData, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
 from app.config import settings
 import os
 
@@ -13,8 +25,97 @@ if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgres://")
 
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
 Base = declarative_base()
 
+# Read replicas: (label, engine, SessionLocal, async engine, AsyncSessionLocal)
+read_replicas = []
+
+# Cleared while a background startup is still initializing the database
+_ready = threading.Event()
+_ready.set()
+
+SCHEMA_COMPONENT = "notifications"
+
+
+def _normalize_url(db_url: str) -> str:
+    """Convert postgres:// and postgresql:// to postgresql+psycopg:// for psycopg3 support"""
+    if db_url.startswith("postgres://"):
+        return db_url.replace("postgres://", "postgresql+psycopg://", 1)
+    if db_url.startswith("postgresql://"):
+        return db_url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return db_url
+
+
+def _connect_args(db_url: str) -> dict:
+    """Connection arguments for the given URL"""
+    if db_url.startswith("sqlite"):
+        # Sessions may be used from threadpool workers
+        return {"check_same_thread": False}
+    
+    args = {}
+    if "render.com" in db_url:
+        args["sslmode"] = "require"
+    if db_url.startswith("postgresql+psycopg"):
+        # None disables server-side prepared statements (needed behind PgBouncer in transaction mode)
+        threshold = settings.DATABASE_PREPARE_THRESHOLD
+        args["prepare_threshold"] = threshold if threshold >= 0 else None
+    return args
+
+
+def _pool_args(db_url: str, pool_size: int, max_overflow: int) -> dict:
+    """Pool sizing for the given URL; SQLite pools take no sizing"""
+    if db_url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS
+    }
+
+
+def _create_sync_engine(db_url: str, label: str):
+    """Create a sync engine with the configured pool"""
+    new_engine = create_engine(
+        db_url,
+        **_pool_args(db_url, settings.DATABASE_POOL_SIZE, settings.DATABASE_MAX_OVERFLOW),
+        pool_pre_ping=True,
+        pool_recycle=300,
+        connect_args=_connect_args(db_url)
+    )
+    if settings.METRICS_ENABLED:
+        from app.metrics import instrument_engine
+        instrument_engine(new_engine, label)
+    return new_engine
+
+
+def _create_async_engine(db_url: str, label: str):
+    """Create an async engine with the configured pool"""
+    # postgresql+psycopg resolves to psycopg's async driver here.
+    # Every concurrent request reaches the pool (no threadpool cap), so
+    # overflow connections would be opened and closed constantly.
+    if db_url.startswith("sqlite://"):
+        # aiosqlite file databases use NullPool, which takes no sizing
+        db_url = db_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    
+    new_engine = create_async_engine(
+        db_url,
+        **_pool_args(db_url, settings.DATABASE_ASYNC_POOL_SIZE, settings.DATABASE_ASYNC_MAX_OVERFLOW),
+        pool_pre_ping=True,
+        pool_recycle=300,
+        connect_args=_connect_args(db_url)
+    )
+    if settings.METRICS_ENABLED:
+        from app.metrics import instrument_engine
+        instrument_engine(new_engine.sync_engine, label)
+    return new_engine
+
+
+def _async_sessionmaker(bind):
+    return async_sessionmaker(bind, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
 def init_database():
     """Initialize database connection"""
     global engine, SessionLocal
@@ -24,19 +125,8 @@ def init_database():
         return
     
     try:
-        # Convert postgres:// to postgresql+psycopg:// for psycopg3 support
-        db_url = SQLALCHEMY_DATABASE_URL
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql+psycopg://", 1)
-        elif db_url.startswith("postgresql://"):
-            db_url = db_url.replace("postgresql://", "postgresql+psycopg://", 1)
-        
-        engine = create_engine(
-            db_url,
-            pool_pre_ping=True,
-            pool_recycle=300,
-            connect_args={"sslmode": "require"} if "render.com" in db_url else {}
-        )
+        db_url = _normalize_url(SQLALCHEMY_DATABASE_URL)
+        engine = _create_sync_engine(db_url, "sync")
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         
         # Test connection
@@ -47,25 +137,533 @@ def init_database():
         print(f"❌ Database connection failed: {e}")
         engine = None
         SessionLocal = None
+        return
+    
+    if settings.DATABASE_ASYNC_ENABLED:
+        init_async_database(db_url)
+    
+    init_read_replicas()
+
+
+def init_async_database(db_url: str):
+    """Initialize async engine used by the HTTP routes"""
+    global async_engine, AsyncSessionLocal
+    
+    try:
+        async_engine = _create_async_engine(db_url, "async")
+        AsyncSessionLocal = _async_sessionmaker(async_engine)
+        print("✅ Async database engine ready")
+    except Exception as e:
+        print(f"⚠️ Async database engine unavailable, routes will use sync sessions: {e}")
+        async_engine = None
+        AsyncSessionLocal = None
+
+
+def init_read_replicas():
+    """
+    Initialize engines for DATABASE_READ_URLS
+    
+    A replica that cannot be reached at startup is skipped, so reads fall
+    back to the primary instead of failing.
+    """
+    read_replicas.clear()
+    urls = [url.strip() for url in settings.DATABASE_READ_URLS.split(",") if url.strip()]
+    
+    for index, url in enumerate(urls):
+        label = f"replica{index}"
+        db_url = _normalize_url(url)
+        try:
+            replica_engine = _create_sync_engine(db_url, label)
+            with replica_engine.connect():
+                pass
+            replica_async_engine = None
+            if settings.DATABASE_ASYNC_ENABLED:
+                replica_async_engine = _create_async_engine(db_url, f"{label}-async")
+        except Exception as e:
+            print(f"⚠️ Read replica {label} unavailable, skipped: {e}")
+            continue
+        
+        read_replicas.append((
+            label,
+            replica_engine,
+            sessionmaker(autocommit=False, autoflush=False, bind=replica_engine),
+            replica_async_engine,
+            _async_sessionmaker(replica_async_engine) if replica_async_engine is not None else None
+        ))
+        print(f"✅ Read replica {label} ready")
+
+
+async def close_async_database():
+    """Dispose async engine connections"""
+    if async_engine is not None:
+        await async_engine.dispose()
+    for _, _, _, replica_async_engine, _ in read_replicas:
+        if replica_async_engine is not None:
+            await replica_async_engine.dispose()
+
+
+def labeled_engines() -> list:
+    """(label, sync engine) for every pool, including the async engines' sync facade"""
+    engines = []
+    if engine is not None:
+        engines.append(("sync", engine))
+    if async_engine is not None:
+        engines.append(("async", async_engine.sync_engine))
+    for label, replica_engine, _, replica_async_engine, _ in read_replicas:
+        engines.append((label, replica_engine))
+        if replica_async_engine is not None:
+            engines.append((f"{label}-async", replica_async_engine.sync_engine))
+    return engines
+
+
+def pool_stats() -> dict:
+    """Connection pool usage per engine"""
+    stats = {}
+    for label, pool_engine in labeled_engines():
+        pool = pool_engine.pool
+        if not hasattr(pool, "checkedout"):
+            # NullPool / SingletonThreadPool keep no counters
+            stats[label] = {"pool": type(pool).__name__}
+            continue
+        stats[label] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow()
+        }
+    return stats
+
+
+def connect_listener():
+    """
+    Open a dedicated autocommit connection to the primary, outside the pools
+
+    Used for LISTEN: the connection stays open for the life of the process
+    and must not go back to a pool. Returns None unless the primary is
+    PostgreSQL.
+    """
+    if engine is None or engine.dialect.name != "postgresql":
+        return None
+
+    import psycopg
+    url = engine.url.set(drivername="postgresql")
+    return psycopg.connect(
+        url.render_as_string(hide_password=False),
+        autocommit=True,
+        **_connect_args(str(engine.url))
+    )
+
+
+class ReadRouter:
+    """
+    Route read-only sessions to a replica or to the primary
+    
+    Reads go to the replicas in round robin, except for users that wrote
+    within the last `sticky_seconds`: those read from the primary so they
+    see their own writes despite replication lag. Writes are tracked in
+    process, so the window only covers writes made by this instance (the
+    Kafka consumer and the HTTP routes of the same process).
+    """
+    
+    def __init__(self, sticky_seconds: float):
+        self.sticky_seconds = sticky_seconds
+        self._recent_writes = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+    
+    def note_write(self, userid: str):
+        """Pin the user's reads to the primary for the sticky window"""
+        if not read_replicas:
+            return
+        
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes.pop(userid, None)
+            self._recent_writes[userid] = now + self.sticky_seconds
+            # Same window for everyone: the oldest entries expire first
+            while self._recent_writes:
+                oldest, expires_at = next(iter(self._recent_writes.items()))
+                if expires_at > now:
+                    break
+                del self._recent_writes[oldest]
+    
+    def replica_for(self, userid: Optional[str] = None) -> Optional[tuple]:
+        """Replica to read from, or None to use the primary"""
+        replicas = read_replicas
+        if not replicas:
+            return None
+        
+        if userid is not None:
+            with self._lock:
+                expires_at = self._recent_writes.get(userid)
+            if expires_at is not None and expires_at > time.monotonic():
+                return None
+        
+        return replicas[next(self._counter) % len(replicas)]
+
+
+read_router = ReadRouter(settings.DATABASE_READ_STICKY_SECONDS)
+
+
+def initialize():
+    """Initialize the engines and the schema, then mark the database as ready"""
+    try:
+        init_database()
+        create_tables()
+        ensure_current_partitions()
+    finally:
+        _ready.set()
+
+
+def defer_initialization():
+    """Hold database sessions until initialize() finishes in the background"""
+    _ready.clear()
+
+
+def is_ready() -> bool:
+    """Whether the (possibly background) initialization finished"""
+    return _ready.is_set()
+
+
+async def wait_until_ready():
+    """Wait for a background initialization, up to STARTUP_WAIT_TIMEOUT_SECONDS"""
+    deadline = time.monotonic() + settings.STARTUP_WAIT_TIMEOUT_SECONDS
+    # Polling keeps waiting requests off the threadpool the initialization may need
+    while not _ready.is_set() and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+
+
+def warm_pool(connections: int):
+    """Open pool connections ahead of the first requests"""
+    if engine is None or connections <= 0:
+        return
+    
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    except Exception as e:
+        print(f"⚠️ Pool warm-up failed: {e}")
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+async def warm_async_pool(connections: int):
+    """Open async pool connections ahead of the first requests (must run on the server loop)"""
+    if async_engine is None or connections <= 0:
+        return
+    
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await async_engine.connect())
+    except Exception as e:
+        print(f"⚠️ Async pool warm-up failed: {e}")
+    finally:
+        for connection in opened:
+            await connection.close()
+
+
+def schema_fingerprint(metadata: MetaData) -> str:
+    """Hash of the DDL generated from the models; changes with any table, column or index"""
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    
+    from app.models.notification import SEARCH_CONFIG
+    
+    parts = [f"partitioned={settings.NOTIFICATIONS_PARTITIONING_ENABLED}", f"search={SEARCH_CONFIG}"]
+    for table in metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        for index in sorted(table.indexes, key=lambda index: str(index.name)):
+            parts.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def stored_schema_fingerprint() -> Optional[str]:
+    """Fingerprint recorded by the last successful create_tables, None if unknown"""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(
+                text("SELECT fingerprint FROM schema_version WHERE component = :component"),
+                {"component": SCHEMA_COMPONENT}
+            ).scalar()
+    except Exception:
+        # schema_version does not exist yet
+        return None
+
+
+def store_schema_fingerprint(fingerprint: str):
+    """Record the fingerprint of the schema just created"""
+    with engine.begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                component VARCHAR(64) PRIMARY KEY,
+                fingerprint VARCHAR(64) NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        """))
+        connection.execute(text("""
+            INSERT INTO schema_version (component, fingerprint, applied_at)
+            VALUES (:component, :fingerprint, :applied_at)
+            ON CONFLICT (component) DO UPDATE
+            SET fingerprint = excluded.fingerprint, applied_at = excluded.applied_at
+        """), {"component": SCHEMA_COMPONENT, "fingerprint": fingerprint, "applied_at": datetime.utcnow()})
 
 
 def create_tables():
-    """Create database tables"""
+    """
+    Create database tables
+    
+    Reflecting and creating the schema takes several round trips, so it is
+    skipped when schema_version holds the fingerprint of the current models.
+    """
     from app.models.notification import Base as NotificationBase
     
     if engine is None:
         print("⚠️ Cannot create tables: database engine not initialized")
         return
     
+    fingerprint = schema_fingerprint(NotificationBase.metadata)
+    if stored_schema_fingerprint() == fingerprint:
+        print("✅ Database schema up to date")
+        return
+    
     try:
+        if settings.NOTIFICATIONS_PARTITIONING_ENABLED and engine.dialect.name == "postgresql":
+            create_partitioned_table()
+        
         NotificationBase.metadata.create_all(bind=engine)
+        add_missing_columns(NotificationBase.metadata)
+        
+        # create_all no agrega índices nuevos a tablas que ya existen
+        for table in NotificationBase.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        
+        if engine.dialect.name == "postgresql":
+            ensure_search_column()
+        store_schema_fingerprint(fingerprint)
         print("✅ Database tables created successfully")
     except Exception as e:
         print(f"❌ Error creating tables: {e}")
 
 
+def add_missing_columns(metadata: MetaData):
+    """
+    Add model columns that are missing from existing tables
+    
+    create_all only creates missing tables, so columns added to a model
+    after the table exists are added here. New columns must be nullable or
+    have a server default.
+    """
+    inspector = inspect(engine)
+    
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                connection.execute(text(ddl))
+                print(f"✅ Added column {table.name}.{column.name}")
+
+
+def ensure_search_column():
+    """
+    Add the full-text search column and its GIN index (PostgreSQL only)
+    
+    search_vector is a stored generated column kept out of the model, so the
+    ORM never loads it and other databases fall back to LIKE. Adding it to
+    an existing table rewrites the table once.
+    """
+    from app.models.notification import SEARCH_CONFIG
+    
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            ALTER TABLE notifications ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', title || ' ' || description)) STORED
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_notifications_search ON notifications USING GIN (search_vector)"
+        ))
+
+
+PARTITION_NAME_PATTERN = re.compile(r"^notifications_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "notifications_default"
+
+
+def _month_start(year: int, month: int) -> date:
+    """First day of a month, normalizing month overflow"""
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def is_table_partitioned(connection) -> bool:
+    """Check whether notifications is a partitioned table"""
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = 'notifications' AND relkind IN ('r', 'p')")
+    ).scalar()
+    return relkind == "p"
+
+
+def create_partitioned_table():
+    """
+    Create notifications as a table range-partitioned by month on date
+    
+    Only applies to new databases: an existing regular table is left
+    untouched. The primary key must include the partition key.
+    """
+    from app.models.notification import NotificationType
+    
+    labels = ", ".join(f"'{member.name}'" for member in NotificationType)
+    
+    with engine.begin() as connection:
+        exists = connection.execute(text("SELECT to_regclass('notifications')")).scalar()
+        if exists is not None:
+            if not is_table_partitioned(connection):
+                print("⚠️ notifications already exists as a regular table, partitioning skipped")
+            return
+        
+        connection.execute(text(f"""
+            DO $$ BEGIN
+                CREATE TYPE notificationtype AS ENUM ({labels});
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$
+        """))
+        connection.execute(text("""
+            CREATE TABLE notifications (
+                notificationid VARCHAR(36) NOT NULL,
+                userid VARCHAR(36) NOT NULL,
+                type notificationtype NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT NOT NULL,
+                was_read BOOLEAN DEFAULT FALSE,
+                date TIMESTAMP NOT NULL,
+                coalesced_count INTEGER NOT NULL DEFAULT 1,
+                related_project_id VARCHAR(36),
+                related_user_id VARCHAR(36),
+                related_task_id VARCHAR(36),
+                PRIMARY KEY (notificationid, date)
+            ) PARTITION BY RANGE (date)
+        """))
+        ensure_partitions(connection, settings.NOTIFICATIONS_PARTITION_MONTHS_AHEAD)
+    
+    print("✅ Partitioned notifications table created")
+
+
+def ensure_current_partitions():
+    """
+    Run ensure_partitions at startup
+    
+    Even when the schema fingerprint skips create_tables, inserts must not
+    depend on the retention thread having created this month's partition.
+    """
+    if engine is None or engine.dialect.name != "postgresql" or not settings.NOTIFICATIONS_PARTITIONING_ENABLED:
+        return
+    
+    try:
+        with engine.begin() as connection:
+            if is_table_partitioned(connection):
+                ensure_partitions(connection, settings.NOTIFICATIONS_PARTITION_MONTHS_AHEAD)
+    except Exception as e:
+        print(f"❌ Error creating partitions: {e}")
+
+
+def ensure_partitions(connection, months_ahead: int, today: date = None):
+    """
+    Create monthly partitions from the current month up to months_ahead
+    
+    A DEFAULT partition catches rows no monthly partition covers (e.g. while
+    the retention thread is not running), so inserts never fail for lack of
+    a partition. PostgreSQL rejects a new partition whose range has rows in
+    the default one, so those rows are moved into it as it is created.
+    """
+    today = today or datetime.utcnow().date()
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF notifications DEFAULT"))
+    
+    for offset in range(months_ahead + 1):
+        start = _month_start(today.year, today.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        name = f"notifications_p{start.year:04d}_{start.month:02d}"
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+            continue
+        
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        params = {"start": start, "end": end}
+        stranded = connection.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end)"
+        ), params).scalar()
+        if not stranded:
+            connection.execute(text(f"CREATE TABLE {name} PARTITION OF notifications {bounds}"))
+            continue
+        
+        # Generated columns (search_vector) are recomputed by the new table
+        columns = ", ".join(connection.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'notifications' AND is_generated = 'NEVER'
+            ORDER BY ordinal_position
+        """)).scalars())
+        connection.execute(text(f"CREATE TABLE {name} (LIKE notifications INCLUDING DEFAULTS INCLUDING GENERATED)"))
+        connection.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end RETURNING {columns}
+            )
+            INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+        """), params)
+        connection.execute(text(f"ALTER TABLE notifications ATTACH PARTITION {name} {bounds}"))
+
+
+def expire_partitions(connection, retention_months: int, detach_only: bool = False, today: date = None) -> tuple:
+    """
+    Drop (or detach, for archival) monthly partitions older than retention_months
+    
+    Each partition is removed with a metadata-only operation instead of a
+    DELETE scan. Returns the affected partition names and the userids that
+    had rows in them, so the caller can bump their versions and caches.
+    """
+    today = today or datetime.utcnow().date()
+    cutoff = _month_start(today.year, today.month - retention_months)
+    
+    partitions = connection.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'notifications'
+    """)).scalars().all()
+    
+    expired = []
+    userids = set()
+    for name in sorted(partitions):
+        match = PARTITION_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        
+        year, month = int(match.group(1)), int(match.group(2))
+        if _month_start(year, month + 1) > cutoff:
+            continue
+        
+        userids.update(connection.execute(text(f"SELECT DISTINCT userid FROM {name}")).scalars())
+        if detach_only:
+            connection.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+        else:
+            connection.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    
+    return expired, userids
+
+
 def get_database():
     """Get database session"""
+    _ready.wait(settings.STARTUP_WAIT_TIMEOUT_SECONDS)
     if SessionLocal is None:
         return None
     
@@ -75,6 +673,65 @@ def get_database():
     finally:
         db.close()
 
+@asynccontextmanager
+async def async_session_scope():
+    """Async session scope (sync session if async engine is unavailable)"""
+    if not _ready.is_set():
+        await wait_until_ready()
+    
+    if AsyncSessionLocal is None:
+        if SessionLocal is None:
+            yield None
+            return
+        
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_database():
+    """Get async database session"""
+    async with async_session_scope() as db:
+        yield db
+
+
+@asynccontextmanager
+async def async_read_session_scope(userid: Optional[str] = None):
+    """Session for read-only work, on a replica unless the user just wrote"""
+    if not _ready.is_set():
+        await wait_until_ready()
+    
+    replica = read_router.replica_for(userid)
+    if replica is None:
+        async with async_session_scope() as db:
+            yield db
+        return
+    
+    _, _, ReplicaSession, _, AsyncReplicaSession = replica
+    if AsyncReplicaSession is None:
+        db = ReplicaSession()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    
+    async with AsyncReplicaSession() as db:
+        yield db
+
+
+async def get_async_read_database(request: Request):
+    """Get a read-only session routed by the request's userid query parameter"""
+    async with async_read_session_scope(request.query_params.get("userid")) as db:
+        yield db
+
+
 def is_database_available():
     """Check if database is available"""
     return engine is not None and SessionLocal is not None
\ No newline at end of file
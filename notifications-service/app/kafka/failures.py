@@ -0,0 +1,280 @@
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Categorías de error
+INVALID = "invalid"
+TRANSIENT = "transient"
+
+# Errores del propio evento: reintentarlo no cambiaría el resultado
+INVALID_ERRORS = (ValidationError, ValueError, TypeError, KeyError, DataError, IntegrityError)
+
+try:
+    import psycopg
+    # El COPY de inserción en lote usa la conexión de psycopg sin el envoltorio de SQLAlchemy
+    INVALID_ERRORS += (psycopg.DataError, psycopg.IntegrityError)
+except ImportError:
+    pass
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    INVALID si el evento no se puede procesar nunca (validación, datos que
+    la base rechaza); TRANSIENT para el resto (conexión, timeouts, base de
+    datos no disponible), que se reintenta
+    """
+    return INVALID if isinstance(error, INVALID_ERRORS) else TRANSIENT
+
+
+def parse_event(value: Any) -> Any:
+    """
+    Decodifica el valor crudo (bytes) de un registro de Kafka
+
+    Un valor que no es JSON válido, o un registro sin valor, lanza
+    ValueError (INVALID). Los valores ya decodificados se devuelven igual.
+    """
+    if value is None:
+        raise ValueError("Registro de Kafka sin valor")
+    if isinstance(value, (bytes, bytearray)):
+        return json.loads(value)
+    return value
+
+
+def isolate_invalid(process: Callable[[List[Any]], Any], items: List[Any]) -> List[Tuple[Any, BaseException]]:
+    """
+    Ejecuta `process` sobre el lote; si falla por un error de datos lo
+    divide en mitades hasta aislar a los culpables
+
+    Devuelve los (item, error) que no se pudieron procesar por ser
+    inválidos; el resto del lote queda procesado. Un error transitorio se
+    propaga para que quien llama reintente (las partes ya procesadas se
+    deduplican en el reintento).
+    """
+    try:
+        process(items)
+        return []
+    except Exception as error:
+        if classify_error(error) != INVALID:
+            raise
+        if len(items) == 1:
+            return [(items[0], error)]
+        middle = len(items) // 2
+        return isolate_invalid(process, items[:middle]) + isolate_invalid(process, items[middle:])
+
+
+class FailurePipeline:
+    """
+    Manejo de fallos del consumidor de notificaciones
+
+    Los eventos se procesan en lote; si el lote falla por un error de datos
+    se divide en mitades hasta aislar a los culpables, así un evento
+    venenoso cuesta unas pocas transacciones y no una por evento del lote.
+    Cada evento fallido sale
+    del camino principal en lugar de bloquear su partición:
+
+    - inválido: al tema dead-letter con el error y los intentos;
+    - transitorio: al tema de reintentos con `not_before` según una espera
+      exponencial; tras `max_attempts` intentos, al dead-letter.
+
+    Los valores pueden llegar crudos (bytes) del consumidor: uno que no es
+    JSON válido va al dead-letter como inválido con el contenido original
+    en `raw`, sin frenar al resto del lote.
+
+    Los envíos se confirman antes de volver, así el consumidor confirma el
+    offset original solo cuando el evento quedó escrito en la base o en otro
+    tema. Si el productor falla, la excepción se propaga y el consumidor
+    reintenta como sin este pipeline. `producer` necesita la interfaz de
+    KafkaProducerService: send(topic, message, key=...) devuelve un futuro
+    con get(timeout).
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[dict], list], int],
+        producer,
+        retry_topic: str,
+        dead_letter_topic: str,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+        max_attempts: int,
+        send_timeout: float
+    ):
+        self.process_batch = process_batch
+        self.producer = producer
+        self.retry_topic = retry_topic
+        self.dead_letter_topic = dead_letter_topic
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.max_attempts = max(max_attempts, 1)
+        self.send_timeout = send_timeout
+        self._lock = threading.Lock()
+        self.retried = 0
+        self.dead_lettered = {INVALID: 0, TRANSIENT: 0}
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del intento siguiente a `attempt`"""
+        return min(self.backoff_seconds * 2 ** (attempt - 1), self.backoff_max_seconds)
+
+    def handle(self, events: List[Any]) -> int:
+        """Procesa eventos del tema principal; devuelve las notificaciones creadas"""
+        return self._process(events, lambda event: (parse_event(event), 1, None))
+
+    def handle_retry(self, envelopes: List[Any]) -> int:
+        """Procesa en un lote los eventos vencidos del tema de reintentos"""
+        return self._process(envelopes, self._retry_item)
+
+    @staticmethod
+    def _retry_item(value: Any) -> Tuple[Any, int, dict]:
+        envelope = parse_event(value)
+        if not isinstance(envelope, dict):
+            raise ValueError("Mensaje de reintento sin formato de sobre")
+        return envelope.get("event"), envelope.get("attempt", 2), envelope
+
+    def _process(self, values: List[Any], parse: Callable[[Any], Tuple[Any, int, Optional[dict]]]) -> int:
+        items = []
+        failures = []
+        for value in values:
+            try:
+                items.append(parse(value))
+            except ValueError as error:
+                failures.append(((value, 1, None), error))
+
+        rejected = []
+        created = self._bisect(items, rejected, failures) if items else 0
+
+        by_event = {id(item[0]): item for item in items}
+        failures.extend((by_event[id(event)], error) for event, error in rejected if id(event) in by_event)
+        if failures:
+            self._route(failures)
+        return created
+
+    def _bisect(self, items: list, rejected: list, failures: list) -> int:
+        mark = len(rejected)
+        try:
+            return self.process_batch([event for event, _, _ in items], rejected)
+        except Exception as error:
+            # El intento fallido no cuenta: sus rechazos se vuelven a reportar al reprocesar
+            del rejected[mark:]
+            if len(items) == 1 or classify_error(error) == TRANSIENT:
+                # Un error de conexión no depende del evento: todo el lote se reintenta
+                failures.extend((item, error) for item in items)
+                return 0
+            middle = len(items) // 2
+            return self._bisect(items[:middle], rejected, failures) + self._bisect(items[middle:], rejected, failures)
+
+    def _route(self, failures: list):
+        """Envía cada fallo al tema de reintentos o al dead-letter y espera la confirmación"""
+        now = time.time()
+        sends = []
+        for (event, attempt, envelope), error in failures:
+            category = classify_error(error)
+            raw = None
+            if isinstance(event, (bytes, bytearray)):
+                # No se pudo decodificar: se guarda tal cual llegó
+                event, raw = None, event.decode("utf-8", errors="replace")
+            if category == TRANSIENT and attempt < self.max_attempts:
+                topic = self.retry_topic
+                message = {
+                    "event": event,
+                    "attempt": attempt + 1,
+                    "not_before": now + self.backoff(attempt),
+                    "first_failed_at": (envelope or {}).get("first_failed_at") or datetime.utcnow().isoformat(),
+                    "error": str(error),
+                    "error_type": type(error).__name__
+                }
+            else:
+                topic = self.dead_letter_topic
+                message = {
+                    "event": event,
+                    "attempts": attempt,
+                    "category": category,
+                    "error": str(error),
+                    "error_type": type(error).__name__,
+                    "first_failed_at": (envelope or {}).get("first_failed_at") or datetime.utcnow().isoformat(),
+                    "failed_at": datetime.utcnow().isoformat()
+                }
+                if raw is not None:
+                    message["raw"] = raw
+                logger.warning(f"Evento enviado al dead-letter ({category}, {attempt} intentos): {str(error)}")
+
+            userid = event.get("user_id") if isinstance(event, dict) else None
+            key = str(userid).encode("utf-8") if userid is not None else None
+            sends.append((topic, category, self.producer.send(topic, message, key=key)))
+
+        for topic, category, future in sends:
+            future.get(timeout=self.send_timeout)
+            with self._lock:
+                if topic == self.retry_topic:
+                    self.retried += 1
+                else:
+                    self.dead_lettered[category] += 1
+            if settings.METRICS_ENABLED:
+                from app.metrics import kafka_records_failed_total
+                kafka_records_failed_total.inc(topic, category)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"retried": self.retried, "dead_lettered": dict(self.dead_lettered)}
+
+
+class DelayQueue:
+    """
+    Registros del tema de reintentos ordenados por `not_before`
+
+    El consumidor de reintentos los retiene en memoria hasta su hora en vez
+    de dormir con la partición tomada: un registro con espera larga no
+    demora a los que vencen antes. Solo lo usa el hilo que hace poll.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, due: float, item: Any):
+        heapq.heappush(self._heap, (due, next(self._sequence), item))
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Any]:
+        """Saca los registros vencidos, en orden de vencimiento"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def discard(self, predicate: Callable[[Any], bool]):
+        """Quita los registros que cumplen `predicate` (particiones revocadas)"""
+        self._heap = [entry for entry in self._heap if not predicate(entry[2])]
+        heapq.heapify(self._heap)
+
+
+def create_failure_pipeline(process_batch: Callable[[List[dict], list], int], producer=None) -> FailurePipeline:
+    """Pipeline con la configuración del servicio y el productor compartido"""
+    if producer is None:
+        from app.kafka.producer import KafkaProducerService
+        producer = KafkaProducerService()
+
+    return FailurePipeline(
+        process_batch,
+        producer,
+        retry_topic=settings.KAFKA_RETRY_TOPIC,
+        dead_letter_topic=settings.KAFKA_DEAD_LETTER_TOPIC,
+        backoff_seconds=settings.KAFKA_RETRY_BACKOFF_SECONDS,
+        backoff_max_seconds=settings.KAFKA_RETRY_BACKOFF_MAX_SECONDS,
+        max_attempts=settings.KAFKA_RETRY_MAX_ATTEMPTS,
+        send_timeout=settings.KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS
+    )
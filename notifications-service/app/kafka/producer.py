@@ -1,64 +1,228 @@
+from kafka import ConsumerRebalanceListener
 from kafka import KafkaConsumer
 from kafka import KafkaProducer
+from kafka import TopicPartition
+from kafka.structs import OffsetAndMetadata
+from collections import Counter, deque
+from typing import Any, Callable, Iterable, Optional
+import asyncio
 import json
 import logging
+import queue
+import threading
+import time
 from app.config import settings
+from app.kafka.failures import DelayQueue, INVALID, classify_error, isolate_invalid, parse_event
+from app.kafka.worker_pool import KeyedWorkerPool, PartitionOffsets
 
 logger = logging.getLogger(__name__)
 
 
+def json_serializer(value) -> bytes:
+    """Serializador JSON de la librería estándar"""
+    return json.dumps(value).encode('utf-8')
+
+
+def get_serializer(name: str) -> Callable[[Any], bytes]:
+    """
+    Devuelve el serializador de mensajes configurado
+
+    `orjson` es opcional; si no está instalado se usa el JSON estándar.
+    """
+    if name == "orjson":
+        try:
+            import orjson
+            return orjson.dumps
+        except ImportError:
+            logger.warning("orjson no está instalado, se usa el serializador JSON estándar")
+    return json_serializer
+
+
 class KafkaProducerService:
-    """Servicio para producir mensajes en Kafka"""
+    """
+    Servicio para producir mensajes en Kafka
+
+    `send` no bloquea: el mensaje queda en el buffer del productor y se
+    envía agrupado según `linger_ms`/`batch_size`. Quien necesite la
+    confirmación puede pasar un callback, esperar el futuro devuelto o usar
+    `send_async` desde código async.
+    """
     
     _instance = None
     
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
     
-    def __init__(self):
+    def __init__(self, value_serializer: Optional[Callable[[Any], bytes]] = None):
         if not self._initialized:
             self.producer = KafkaProducer(
                 bootstrap_servers=[settings.KAFKA_BROKER],
-                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                value_serializer=value_serializer or get_serializer(settings.KAFKA_PRODUCER_SERIALIZER),
                 acks='all',
-                retries=3
+                retries=3,
+                linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+                batch_size=settings.KAFKA_PRODUCER_BATCH_SIZE,
+                compression_type=settings.KAFKA_PRODUCER_COMPRESSION
             )
+            self._lock = threading.Lock()
+            self.in_flight = 0
+            self.delivered = 0
+            self.failed = 0
             self._initialized = True
     
+    def send(self, topic: str, message: dict, callback: Optional[Callable] = None, key: Optional[bytes] = None):
+        """
+        Encola un mensaje sin esperar la confirmación del broker
+
+        `callback(error, metadata)` se invoca desde el hilo de red del
+        productor: `error` es None si la entrega fue exitosa.
+        """
+        with self._lock:
+            self.in_flight += 1
+        
+        try:
+            future = self.producer.send(topic, value=message, key=key)
+        except Exception as e:
+            self._on_error(topic, e, None)
+            raise
+        
+        future.add_callback(self._on_success, callback)
+        future.add_errback(self._on_error_callback, topic, callback)
+        logger.debug(f"Mensaje encolado para {topic}: {message}")
+        return future
+    
+    async def send_async(self, topic: str, message: dict, key: Optional[bytes] = None):
+        """Envía un mensaje y espera la confirmación sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        
+        def resolve(error, metadata):
+            if error is None:
+                loop.call_soon_threadsafe(_set_result, result, metadata)
+            else:
+                loop.call_soon_threadsafe(_set_exception, result, error)
+        
+        self.send(topic, message, callback=resolve, key=key)
+        return await result
+    
     def send_message(self, topic: str, message: dict):
-        """Envía un mensaje a un tema de Kafka"""
+        """Envía un mensaje a un tema de Kafka y espera la confirmación"""
         try:
-            future = self.producer.send(topic, value=message)
-            future.get(timeout=10)
-            logger.info(f"Mensaje enviado a {topic}: {message}")
+            self.send(topic, message).get(timeout=10)
+            logger.debug(f"Mensaje enviado a {topic}: {message}")
         except Exception as e:
             logger.error(f"Error al enviar mensaje a {topic}: {str(e)}")
             raise
     
+    def flush(self, timeout: Optional[float] = None):
+        """Espera a que se entreguen los mensajes pendientes"""
+        self.producer.flush(timeout=timeout)
+    
+    def stats(self) -> dict:
+        """Contadores de mensajes en vuelo, entregados y fallidos"""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "delivered": self.delivered,
+                "failed": self.failed
+            }
+    
     def close(self):
-        """Cierra la conexión del productor"""
+        """Vacía el buffer y cierra la conexión del productor"""
         if self.producer:
+            try:
+                self.flush(timeout=settings.KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.error(f"Error al vaciar el productor de Kafka: {str(e)}")
             self.producer.close()
+    
+    @classmethod
+    def close_instance(cls):
+        """Cierra el productor compartido si llegó a crearse"""
+        if cls._instance is not None and cls._instance._initialized:
+            cls._instance.close()
+            cls._instance = None
+    
+    @classmethod
+    def instance_stats(cls) -> Optional[dict]:
+        """Contadores del productor compartido, o None si no se creó"""
+        if cls._instance is not None and cls._instance._initialized:
+            return cls._instance.stats()
+        return None
+    
+    def _on_success(self, callback, metadata):
+        with self._lock:
+            self.in_flight -= 1
+            self.delivered += 1
+        if callback:
+            callback(None, metadata)
+    
+    def _on_error_callback(self, topic, callback, error):
+        self._on_error(topic, error, callback)
+    
+    def _on_error(self, topic, error, callback):
+        with self._lock:
+            self.in_flight -= 1
+            self.failed += 1
+        logger.error(f"Error al enviar mensaje a {topic}: {str(error)}")
+        if callback:
+            callback(error, None)
+
+
+def _set_result(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future: asyncio.Future, error):
+    if not future.done():
+        future.set_exception(error)
 
 
 class KafkaConsumerService:
-    """Servicio para consumir mensajes de Kafka"""
+    """
+    Servicio para consumir mensajes de Kafka
+    
+    Los valores se leen crudos y se decodifican al recibirlos: un registro
+    que no es JSON válido conserva sus bytes y lo rechaza como inválido
+    quien lo procese (parse_event), en vez de cortar el poll. Un error
+    inesperado del ciclo de poll se registra y el ciclo se reanuda tras una
+    pausa, así el hilo del consumidor no muere.
+    """
+    
+    # Espera máxima del poll cuando no hay registros pendientes de repartir
+    POLL_TIMEOUT_MS = 100
+    # Pausa tras un error inesperado del ciclo de poll
+    ERROR_BACKOFF_SECONDS = 1
+    # Espera máxima a los workers antes de ceder particiones o al cerrar
+    DRAIN_TIMEOUT_SECONDS = 10
     
     def __init__(self, topic: str, group_id: str):
         self.topic = topic
         self.group_id = group_id
         self.consumer = None
+        self.pool = None
+        self.offsets = None
+        self.delayed = None
+        self._backlog = deque()
+        self._paused = False
+        self._stopping = threading.Event()
+        self._closed = threading.Event()
     
     def start(self, callback):
-        """Inicia el consumidor y procesa mensajes"""
+        """
+        Inicia el consumidor y procesa mensajes
+        
+        Si el callback falla por un error transitorio se vuelve a leer el
+        mensaje tras una pausa; un mensaje inválido se registra y se omite.
+        """
         self.consumer = KafkaConsumer(
             self.topic,
             bootstrap_servers=[settings.KAFKA_BROKER],
             group_id=self.group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
             auto_offset_reset='earliest',
             enable_auto_commit=True
         )
@@ -66,17 +230,448 @@ class KafkaConsumerService:
         logger.info(f"Iniciado consumidor Kafka para topic: {self.topic}")
         
         try:
-            for message in self.consumer:
+            while not self._stopping.is_set():
                 try:
-                    callback(message.value)
+                    for message in self.consumer:
+                        message = self._decode(message)
+                        start = time.perf_counter()
+                        try:
+                            callback(message.value)
+                        except Exception as e:
+                            logger.error(f"Error procesando mensaje: {str(e)}")
+                            if classify_error(e) != INVALID:
+                                self._rewind([message])
+                                time.sleep(1)
+                                continue
+                        self._record_metrics([message], time.perf_counter() - start)
                 except Exception as e:
-                    logger.error(f"Error procesando mensaje: {str(e)}")
+                    self._on_loop_error(e)
         except KeyboardInterrupt:
             logger.info("Consumidor de Kafka detenido")
         finally:
             self.consumer.close()
     
+    def start_batch(self, callback, batch_size: int = None, linger_ms: int = None):
+        """
+        Inicia el consumidor en modo por lotes
+        
+        Agrupa hasta `batch_size` registros o espera hasta `linger_ms` ms y
+        entrega la lista de mensajes al callback. Los offsets solo se
+        confirman después de que el callback termina sin errores; si falla
+        por un error transitorio, se vuelve al primer offset de cada
+        partición para reintentar el lote. Si falla por un evento inválido,
+        el lote se divide hasta aislarlo y se confirma omitiéndolo.
+        """
+        batch_size = batch_size or settings.KAFKA_CONSUMER_BATCH_SIZE
+        linger_ms = linger_ms if linger_ms is not None else settings.KAFKA_CONSUMER_LINGER_MS
+        
+        self.consumer = KafkaConsumer(
+            self.topic,
+            bootstrap_servers=[settings.KAFKA_BROKER],
+            group_id=self.group_id,
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            max_poll_records=batch_size
+        )
+        
+        logger.info(
+            f"Iniciado consumidor Kafka por lotes para topic: {self.topic} "
+            f"(batch_size={batch_size}, linger_ms={linger_ms})"
+        )
+        
+        try:
+            while not self._stopping.is_set():
+                try:
+                    records = self._poll_batch(batch_size, linger_ms)
+                except Exception as e:
+                    self._on_loop_error(e)
+                    continue
+                if not records:
+                    continue
+                
+                start = time.perf_counter()
+                try:
+                    for value, error in isolate_invalid(callback, [record.value for record in records]):
+                        logger.error(f"Mensaje inválido omitido: {str(error)}")
+                    self.consumer.commit()
+                    self._record_metrics(records, time.perf_counter() - start)
+                except Exception as e:
+                    logger.error(f"Error procesando lote de {len(records)} mensajes: {str(e)}")
+                    self._rewind(records)
+                    time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("Consumidor de Kafka detenido")
+        finally:
+            self.consumer.close()
+    
+    def start_parallel(
+        self,
+        callback,
+        workers: int = None,
+        queue_size: int = None,
+        batch_size: int = 1
+    ):
+        """
+        Inicia el consumidor con un pool de workers
+        
+        Este hilo solo hace poll y reparte cada registro al worker de su
+        `user_id`: los eventos de un usuario se procesan en orden y los de
+        usuarios distintos en paralelo. `callback` recibe los valores que el
+        worker tomó de su cola (hasta `batch_size`); un fallo transitorio se
+        reintenta y un evento inválido se omite. Si una cola se llena se pausan
+        las particiones hasta que haya espacio, y cada partición confirma su
+        offset solo cuando todos los registros anteriores terminaron.
+        """
+        workers = workers or settings.KAFKA_CONSUMER_WORKERS
+        queue_size = queue_size or settings.KAFKA_CONSUMER_QUEUE_SIZE
+        commit_interval = settings.KAFKA_CONSUMER_COMMIT_INTERVAL_MS / 1000
+        
+        self.offsets = PartitionOffsets()
+        self.pool = KeyedWorkerPool(
+            lambda records: callback([record.value for record in records]),
+            workers=workers,
+            queue_size=queue_size,
+            batch_size=batch_size,
+            name="kafka-worker"
+        )
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=[settings.KAFKA_BROKER],
+            group_id=self.group_id,
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            max_poll_records=settings.KAFKA_CONSUMER_BATCH_SIZE
+        )
+        self.consumer.subscribe([self.topic], listener=_DrainOnRebalance(self))
+        self.pool.start()
+        
+        logger.info(
+            f"Iniciado consumidor Kafka para topic: {self.topic} "
+            f"(workers={workers}, queue_size={queue_size}, batch_size={batch_size})"
+        )
+        
+        last_commit = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    # Con registros sin repartir se espera a que algún worker libere espacio
+                    self._collect_completed(wait=0.05 if self._backlog else 0)
+                    self._dispatch_backlog()
+                    self._apply_backpressure()
+                    
+                    polled = self.consumer.poll(
+                        timeout_ms=0 if self._backlog else self.POLL_TIMEOUT_MS,
+                        max_records=settings.KAFKA_CONSUMER_BATCH_SIZE
+                    )
+                    for partition_records in polled.values():
+                        for record in partition_records:
+                            self.offsets.received(TopicPartition(record.topic, record.partition), record.offset)
+                            self._backlog.append(self._decode(record))
+                    
+                    if time.monotonic() - last_commit >= commit_interval:
+                        self._commit()
+                        last_commit = time.monotonic()
+                except Exception as e:
+                    self._on_loop_error(e)
+        except KeyboardInterrupt:
+            logger.info("Consumidor de Kafka detenido")
+        finally:
+            self._drain(self.consumer.assignment())
+            self._commit()
+            self.pool.stop(timeout=self.DRAIN_TIMEOUT_SECONDS)
+            self.consumer.close(autocommit=False)
+            self._closed.set()
+    
+    def start_delayed(self, callback, max_pending: int = None):
+        """
+        Inicia el consumidor del tema de reintentos
+        
+        Cada registro trae `not_before`: se retiene en memoria hasta esa
+        hora y recién entonces se entrega al callback, sin dormir con la
+        partición tomada. Como en el pool de workers, cada partición confirma
+        solo hasta el registro más antiguo aún retenido, así un reinicio
+        vuelve a entregar lo que no se procesó. Con `max_pending` registros
+        retenidos se pausan las particiones. Los vencidos se entregan al
+        callback en lotes de hasta KAFKA_CONSUMER_BATCH_SIZE valores.
+        """
+        max_pending = max_pending or settings.KAFKA_RETRY_MAX_PENDING
+        commit_interval = settings.KAFKA_CONSUMER_COMMIT_INTERVAL_MS / 1000
+        
+        self.offsets = PartitionOffsets()
+        self.delayed = DelayQueue()
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=[settings.KAFKA_BROKER],
+            group_id=self.group_id,
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            max_poll_records=settings.KAFKA_CONSUMER_BATCH_SIZE
+        )
+        self.consumer.subscribe([self.topic], listener=_DrainOnRebalance(self))
+        
+        logger.info(f"Iniciado consumidor Kafka de reintentos para topic: {self.topic}")
+        
+        last_commit = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    due = self.delayed.pop_due(time.time())
+                    for offset in range(0, len(due), settings.KAFKA_CONSUMER_BATCH_SIZE):
+                        records = due[offset:offset + settings.KAFKA_CONSUMER_BATCH_SIZE]
+                        start = time.perf_counter()
+                        try:
+                            callback([record.value for record in records])
+                        except Exception as e:
+                            # No se pudieron reenviar los fallos (p. ej. productor caído): se retienen de nuevo
+                            logger.error(f"Error procesando reintentos: {str(e)}")
+                            for record in records:
+                                self.delayed.add(time.time() + KeyedWorkerPool.RETRY_DELAY_SECONDS, record)
+                            continue
+                        for record in records:
+                            self.offsets.done(TopicPartition(record.topic, record.partition), record.offset)
+                        self._record_metrics(records, time.perf_counter() - start)
+                    
+                    self._pause_when_full(max_pending)
+                    timeout_ms = self.POLL_TIMEOUT_MS
+                    next_due = self.delayed.next_due()
+                    if next_due is not None:
+                        timeout_ms = min(max(int((next_due - time.time()) * 1000), 0), timeout_ms)
+                    
+                    polled = self.consumer.poll(timeout_ms=timeout_ms, max_records=settings.KAFKA_CONSUMER_BATCH_SIZE)
+                    for partition_records in polled.values():
+                        for record in partition_records:
+                            record = self._decode(record)
+                            self.offsets.received(TopicPartition(record.topic, record.partition), record.offset)
+                            self.delayed.add(self._not_before(record.value), record)
+                    
+                    if time.monotonic() - last_commit >= commit_interval:
+                        self._commit()
+                        last_commit = time.monotonic()
+                except Exception as e:
+                    self._on_loop_error(e)
+        except KeyboardInterrupt:
+            logger.info("Consumidor de Kafka detenido")
+        finally:
+            self._commit()
+            self.consumer.close(autocommit=False)
+            self._closed.set()
+    
+    @staticmethod
+    def _decode(record):
+        """El registro con su valor JSON decodificado; si no se puede, el valor queda crudo"""
+        try:
+            return record._replace(value=parse_event(record.value))
+        except ValueError:
+            return record
+    
+    def _on_loop_error(self, error: Exception):
+        """Registra un error inesperado del ciclo de poll y espera antes de reanudarlo"""
+        if not self._stopping.is_set():
+            logger.exception(f"Error inesperado en el consumidor de {self.topic}, se reanuda: {str(error)}")
+            self._stopping.wait(self.ERROR_BACKOFF_SECONDS)
+    
+    @staticmethod
+    def _not_before(value) -> float:
+        """Hora (epoch) a partir de la cual se puede reintentar un registro"""
+        try:
+            return float(value.get("not_before", 0)) if isinstance(value, dict) else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+    
+    def _pause_when_full(self, max_pending: int):
+        """Pausa las particiones mientras haya demasiados reintentos retenidos"""
+        paused = self.consumer.paused()
+        if len(self.delayed) >= max_pending:
+            unpaused = self.consumer.assignment() - paused
+            if unpaused:
+                self.consumer.pause(*unpaused)
+        elif paused:
+            self.consumer.resume(*paused)
+        self._paused = len(self.delayed) >= max_pending
+    
+    @staticmethod
+    def _record_key(record) -> str:
+        """Clave de reparto: el usuario del evento, o la partición si no lo trae"""
+        value = record.value
+        userid = value.get("user_id") if isinstance(value, dict) else None
+        return userid if userid is not None else f"partition-{record.partition}"
+    
+    def _dispatch_backlog(self):
+        """Encola los registros pendientes sin adelantar a otros del mismo worker"""
+        blocked = set()
+        remaining = deque()
+        for record in self._backlog:
+            index = self.pool.worker_for(self._record_key(record))
+            if index in blocked or not self.pool.try_submit(index, record):
+                blocked.add(index)
+                remaining.append(record)
+        self._backlog = remaining
+    
+    def _apply_backpressure(self):
+        """Pausa las particiones mientras haya registros que no caben en las colas"""
+        paused = self.consumer.paused()
+        if self._backlog:
+            # Incluye las particiones recién asignadas tras un rebalanceo
+            unpaused = self.consumer.assignment() - paused
+            if unpaused:
+                self.consumer.pause(*unpaused)
+                logger.debug(f"Colas llenas, particiones pausadas ({len(self._backlog)} registros en espera)")
+        elif paused:
+            self.consumer.resume(*paused)
+        self._paused = bool(self._backlog)
+    
+    def _collect_completed(self, wait: float = 0):
+        """Libera los offsets de los registros que los workers terminaron"""
+        while True:
+            try:
+                records, elapsed = self.pool.completed.get(timeout=wait) if wait else self.pool.completed.get_nowait()
+            except queue.Empty:
+                return
+            wait = 0
+            for record in records:
+                self.offsets.done(TopicPartition(record.topic, record.partition), record.offset)
+            self._record_metrics(records, elapsed)
+    
+    def _commit(self, partitions: Iterable[TopicPartition] = None):
+        """Confirma los offsets que avanzaron"""
+        offsets = self.offsets.committable(partitions)
+        if not offsets:
+            return
+        
+        try:
+            self.consumer.commit({tp: OffsetAndMetadata(offset, None) for tp, offset in offsets.items()})
+            self.offsets.mark_committed(offsets)
+        except Exception as e:
+            logger.warning(f"No se pudieron confirmar los offsets: {str(e)}")
+    
+    def _drain(self, partitions: Iterable[TopicPartition]) -> bool:
+        """Espera a que los workers terminen lo que ya recibieron de esas particiones"""
+        partitions = set(partitions)
+        deadline = time.monotonic() + self.DRAIN_TIMEOUT_SECONDS
+        while True:
+            undispatched = Counter(TopicPartition(r.topic, r.partition) for r in self._backlog)
+            if all(self.offsets.pending_count(tp) <= undispatched[tp] for tp in partitions):
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning("Los workers no terminaron a tiempo; lo pendiente se volverá a entregar")
+                return False
+            self._collect_completed(wait=0.05)
+    
+    def _on_partitions_revoked(self, revoked):
+        """Antes de ceder particiones confirma todo lo que los workers terminaron"""
+        revoked = set(revoked)
+        if not revoked:
+            return
+        
+        if self.delayed is not None:
+            # Lo retenido lo recibirá el nuevo dueño desde el offset confirmado
+            self._commit(revoked)
+            self.delayed.discard(lambda r: TopicPartition(r.topic, r.partition) in revoked)
+            self.offsets.forget(revoked)
+            return
+        
+        self._drain(revoked)
+        self._commit(revoked)
+        # Lo que no se repartió lo recibirá el nuevo dueño desde el offset confirmado
+        self._backlog = deque(
+            r for r in self._backlog if TopicPartition(r.topic, r.partition) not in revoked
+        )
+        self.offsets.forget(revoked)
+    
+    def stats(self) -> Optional[dict]:
+        """Estado del pool de workers o de los reintentos retenidos; None si no usa ninguno"""
+        if self.delayed is not None:
+            return {"delayed": len(self.delayed), "paused": self._paused}
+        if self.pool is None:
+            return None
+        return {
+            "workers": len(self.pool.queues),
+            "queued": sum(self.pool.queued()),
+            "backlog": len(self._backlog),
+            "paused": self._paused
+        }
+    
+    def _poll_batch(self, batch_size: int, linger_ms: int) -> list:
+        """Acumula registros hasta completar el lote o agotar el tiempo de espera"""
+        records = []
+        deadline = None
+        
+        while len(records) < batch_size:
+            timeout_ms = linger_ms
+            if deadline is not None:
+                timeout_ms = int((deadline - time.monotonic()) * 1000)
+                if timeout_ms <= 0:
+                    break
+            
+            try:
+                polled = self.consumer.poll(
+                    timeout_ms=timeout_ms,
+                    max_records=batch_size - len(records)
+                )
+            except Exception:
+                if not records:
+                    raise
+                # Lo ya recibido se entrega; si el error persiste se verá en el próximo poll
+                break
+            for partition_records in polled.values():
+                records.extend(self._decode(record) for record in partition_records)
+            
+            if not records:
+                break
+            if deadline is None:
+                # La ventana de espera comienza con el primer registro recibido
+                deadline = time.monotonic() + linger_ms / 1000
+        
+        return records
+    
+    def _record_metrics(self, records: list, elapsed: float):
+        """Registros consumidos, tiempo de procesamiento y lag por partición"""
+        if not settings.METRICS_ENABLED:
+            return
+        
+        from app.metrics import kafka_records_consumed_total, kafka_processing_duration_seconds, kafka_consumer_lag
+        
+        kafka_records_consumed_total.inc(self.topic, amount=len(records))
+        kafka_processing_duration_seconds.observe(elapsed, self.topic)
+        
+        last_offsets = {}
+        for record in records:
+            last_offsets[record.partition] = max(record.offset, last_offsets.get(record.partition, -1))
+        
+        for partition, offset in last_offsets.items():
+            # highwater viene en las respuestas de fetch, no requiere otra llamada al broker
+            highwater = self.consumer.highwater(TopicPartition(self.topic, partition))
+            if highwater is not None:
+                kafka_consumer_lag.set(max(highwater - offset - 1, 0), self.topic, str(partition))
+    
+    def _rewind(self, records: list):
+        """Reposiciona cada partición en el primer offset no confirmado del lote"""
+        first_offsets = {}
+        for record in records:
+            tp = TopicPartition(record.topic, record.partition)
+            if tp not in first_offsets or record.offset < first_offsets[tp]:
+                first_offsets[tp] = record.offset
+        
+        for tp, offset in first_offsets.items():
+            self.consumer.seek(tp, offset)
+    
     def close(self):
         """Cierra la conexión del consumidor"""
-        if self.consumer:
+        self._stopping.set()
+        if self.pool is not None or self.delayed is not None:
+            # El hilo del consumidor espera a los workers, confirma y cierra
+            self._closed.wait(self.DRAIN_TIMEOUT_SECONDS + 5)
+        elif self.consumer:
             self.consumer.close()
+
+
+class _DrainOnRebalance(ConsumerRebalanceListener):
+    """Confirma lo procesado antes de un rebalanceo del grupo"""
+    
+    def __init__(self, service: KafkaConsumerService):
+        self.service = service
+    
+    def on_partitions_revoked(self, revoked):
+        self.service._on_partitions_revoked(revoked)
+    
+    def on_partitions_assigned(self, assigned):
+        # El poll siguiente las pausa si todavía hay registros sin repartir
+        pass
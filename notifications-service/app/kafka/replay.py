@@ -0,0 +1,146 @@
+"""
+Reenvía eventos del dead-letter al tema de notificaciones
+
+Lee KAFKA_DEAD_LETTER_TOPIC con su propio grupo de consumo y publica el
+`event` original de cada mensaje en KAFKA_NOTIFICATION_TOPIC, con hasta
+--concurrency envíos en vuelo. Los offsets se confirman recién cuando los
+envíos de cada tanda están confirmados por el broker: si el proceso se
+interrumpe, lo no confirmado se vuelve a reenviar (el consumidor descarta
+los duplicados por event_id).
+
+Uso:
+    python -m app.kafka.replay --category transient --max-messages 1000
+    python -m app.kafka.replay --dry-run
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from typing import Optional
+from app.config import settings
+from app.kafka.failures import INVALID, TRANSIENT, parse_event
+
+logger = logging.getLogger(__name__)
+
+REPLAY_GROUP_ID = "notifications-service-replay"
+POLL_TIMEOUT_MS = 500
+
+
+def replay(
+    consumer,
+    producer,
+    topic: str,
+    max_messages: Optional[int] = None,
+    concurrency: int = 100,
+    category: Optional[str] = None,
+    dry_run: bool = False,
+    idle_seconds: float = 5.0,
+    send_timeout: float = 10.0
+) -> dict:
+    """
+    Reenvía los mensajes de `consumer` (ya suscrito al dead-letter) a `topic`
+
+    Termina tras `max_messages` mensajes leídos o `idle_seconds` sin
+    mensajes nuevos. Con `category` solo se reenvían los de esa categoría;
+    los demás se saltean y también se confirman, igual que los que no traen
+    `event` (los que llegaron sin JSON válido solo tienen `raw`). Con `dry_run` no se envía
+    ni se confirma nada.
+    """
+    slots = threading.BoundedSemaphore(max(concurrency, 1))
+    counts = {"read": 0, "replayed": 0, "skipped": 0, "by_category": {}}
+    idle_since = time.monotonic()
+
+    def release(error, metadata):
+        slots.release()
+
+    while max_messages is None or counts["read"] < max_messages:
+        limit = max_messages - counts["read"] if max_messages is not None else None
+        polled = consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=limit)
+        records = [record for partition_records in polled.values() for record in partition_records]
+        if not records:
+            if time.monotonic() - idle_since >= idle_seconds:
+                break
+            continue
+        idle_since = time.monotonic()
+
+        futures = []
+        for record in records[:limit]:
+            counts["read"] += 1
+            try:
+                message = parse_event(record.value)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                message = {}
+            record_category = message.get("category", "unknown")
+            counts["by_category"][record_category] = counts["by_category"].get(record_category, 0) + 1
+            event = message.get("event")
+            if event is None or (category is not None and record_category != category):
+                counts["skipped"] += 1
+                continue
+            if dry_run:
+                counts["replayed"] += 1
+                continue
+
+            userid = event.get("user_id") if isinstance(event, dict) else None
+            key = str(userid).encode("utf-8") if userid is not None else None
+            slots.acquire()
+            try:
+                futures.append(producer.send(topic, event, callback=release, key=key))
+            except Exception:
+                slots.release()
+                raise
+
+        # Un envío fallido corta el reenvío antes de confirmar la tanda
+        for future in futures:
+            future.get(timeout=send_timeout)
+        counts["replayed"] += len(futures)
+        if not dry_run:
+            consumer.commit()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-messages", type=int, default=None, help="Máximo de mensajes a leer")
+    parser.add_argument("--concurrency", type=int, default=100, help="Envíos en vuelo como máximo")
+    parser.add_argument("--category", choices=[INVALID, TRANSIENT], default=None, help="Solo esta categoría")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta lo que se reenviaría")
+    parser.add_argument("--idle-seconds", type=float, default=5.0, help="Termina tras este tiempo sin mensajes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
+
+    from kafka import KafkaConsumer
+    from app.kafka.producer import KafkaProducerService
+
+    consumer = KafkaConsumer(
+        settings.KAFKA_DEAD_LETTER_TOPIC,
+        bootstrap_servers=[settings.KAFKA_BROKER],
+        group_id=REPLAY_GROUP_ID,
+        auto_offset_reset='earliest',
+        enable_auto_commit=False
+    )
+    producer = KafkaProducerService()
+    try:
+        counts = replay(
+            consumer,
+            producer,
+            settings.KAFKA_NOTIFICATION_TOPIC,
+            max_messages=args.max_messages,
+            concurrency=args.concurrency,
+            category=args.category,
+            dry_run=args.dry_run,
+            idle_seconds=args.idle_seconds,
+            send_timeout=settings.KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS
+        )
+    finally:
+        consumer.close(autocommit=False)
+        producer.close()
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+from app.kafka.failures import isolate_invalid
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionOffsets:
+    """
+    Offsets confirmables por partición
+
+    Cada registro se anota al recibirse y se libera al terminar. El offset a
+    confirmar de una partición es el menor registro aún pendiente (o el
+    siguiente al último recibido), de modo que nunca se confirma un mensaje
+    mientras otro anterior de la misma partición siga en curso, aunque los
+    workers terminen fuera de orden. Solo lo usa el hilo que hace poll.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Any, set] = {}
+        self._next: Dict[Any, int] = {}
+        self._committed: Dict[Any, int] = {}
+
+    def received(self, tp, offset: int):
+        self._pending.setdefault(tp, set()).add(offset)
+        self._next[tp] = max(offset + 1, self._next.get(tp, 0))
+
+    def done(self, tp, offset: int):
+        # La partición pudo haberse revocado mientras el registro estaba en curso
+        pending = self._pending.get(tp)
+        if pending is not None:
+            pending.discard(offset)
+
+    def pending_count(self, tp) -> int:
+        return len(self._pending.get(tp, ()))
+
+    def committable(self, partitions: Optional[Iterable] = None) -> dict:
+        """Offsets que avanzaron desde la última confirmación"""
+        offsets = {}
+        for tp in (self._next if partitions is None else partitions):
+            if tp not in self._next:
+                continue
+            pending = self._pending.get(tp)
+            offset = min(pending) if pending else self._next[tp]
+            if offset != self._committed.get(tp):
+                offsets[tp] = offset
+        return offsets
+
+    def mark_committed(self, offsets: dict):
+        self._committed.update(offsets)
+
+    def forget(self, partitions: Iterable):
+        for tp in partitions:
+            self._pending.pop(tp, None)
+            self._next.pop(tp, None)
+            self._committed.pop(tp, None)
+
+
+class KeyedWorkerPool:
+    """
+    Workers con una cola acotada cada uno
+
+    Los elementos con la misma clave van siempre al mismo worker (hash
+    estable de la clave), así que se procesan en el orden en que se
+    enviaron; claves distintas avanzan en paralelo. Cada worker toma hasta
+    `batch_size` elementos de su cola por llamada al handler. Si el handler
+    falla por un elemento inválido, el grupo se divide hasta aislarlo y se
+    omite solo ese elemento. Ante un error transitorio el mismo grupo se
+    reintenta hasta que funcione o se detenga el pool: descartarlo
+    perdería eventos válidos.
+    Los grupos terminados se publican en `completed` como (items, segundos).
+    """
+
+    RETRY_DELAY_SECONDS = 1.0
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], None],
+        workers: int,
+        queue_size: int,
+        batch_size: int = 1,
+        name: str = "worker"
+    ):
+        self.handler = handler
+        self.batch_size = max(batch_size, 1)
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(max(workers, 1))]
+        self.completed = queue.SimpleQueue()
+        self._stopping = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(index,), name=f"{name}-{index}", daemon=True)
+            for index in range(len(self.queues))
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def worker_for(self, key: Hashable) -> int:
+        """Índice del worker de una clave; estable entre procesos (no usa hash())"""
+        return zlib.crc32(str(key).encode("utf-8")) % len(self.queues)
+
+    def try_submit(self, index: int, item: Any) -> bool:
+        """Encola sin bloquear; False si la cola del worker está llena"""
+        try:
+            self.queues[index].put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def queued(self) -> List[int]:
+        return [q.qsize() for q in self.queues]
+
+    def stop(self, timeout: float = None):
+        """Detiene los workers; lo que quede en las colas no se procesa"""
+        self._stopping.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            thread.join(remaining)
+
+    def _run(self, index: int):
+        work = self.queues[index]
+        while not self._stopping.is_set():
+            try:
+                items = [work.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            while len(items) < self.batch_size:
+                try:
+                    items.append(work.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            if self._process(items):
+                self.completed.put((items, time.perf_counter() - start))
+
+    def _process(self, items: List[Any]) -> bool:
+        """Ejecuta el handler; False si se abandonó el grupo al detener el pool"""
+        while True:
+            try:
+                for item, error in isolate_invalid(self.handler, items):
+                    logger.error(f"Mensaje inválido omitido: {str(error)}")
+                return True
+            except Exception as e:
+                logger.error(f"Error procesando {len(items)} mensajes, se reintentará: {str(e)}")
+            if self._stopping.wait(self.RETRY_DELAY_SECONDS):
+                return False
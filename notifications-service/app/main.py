@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import functools
 import logging
 from app.config import settings
 from app.routes import notification
-from app.database import init_database
+from app import database
 import threading
+import time
 
 # Configurar logging
 logging.basicConfig(level=settings.LOG_LEVEL)
@@ -26,6 +30,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia y códigos de estado por ruta para /metrics
+if settings.METRICS_ENABLED:
+    from app.metrics import MetricsMiddleware
+    app.add_middleware(MetricsMiddleware)
+
 # Incluir rutas
 app.include_router(notification.router)
 
@@ -34,10 +43,20 @@ app.include_router(notification.router)
 kafka_consumer = None
 kafka_consumer_thread = None
 
+# Reintentos y dead-letter de los eventos que fallan
+failure_pipeline = None
+retry_consumer = None
+
+# Mantenimiento de retención en segundo plano
+retention_service = None
+
+# Resúmenes por email de notificaciones no leídas
+digest_service = None
+
 
 def start_kafka_consumer():
     """Inicia el consumidor de Kafka en un hilo separado"""
-    global kafka_consumer, kafka_consumer_thread
+    global kafka_consumer, kafka_consumer_thread, failure_pipeline
     
     if not settings.KAFKA_ENABLED:
         logger.info("Kafka está deshabilitado, no se iniciará el consumidor")
@@ -53,43 +72,187 @@ def start_kafka_consumer():
             group_id="notifications-service-group"
         )
         
+        if settings.KAFKA_FAILURE_PIPELINE_ENABLED:
+            from app.kafka.failures import create_failure_pipeline
+            failure_pipeline = create_failure_pipeline(notification_service.process_kafka_batch)
+        
         def process_message(message):
-            logger.info(f"Procesando mensaje de Kafka: {message}")
-            notification_service.process_kafka_event(message)
+            logger.debug(f"Procesando mensaje de Kafka: {message}")
+            if failure_pipeline is not None:
+                failure_pipeline.handle([message])
+            else:
+                notification_service.process_kafka_event(message)
+        
+        def process_batch(messages):
+            if failure_pipeline is not None:
+                created = failure_pipeline.handle(messages)
+            else:
+                created = notification_service.process_kafka_batch(messages)
+            logger.info(f"Lote de Kafka procesado: {len(messages)} mensajes, {created} notificaciones")
+        
+        def process_each(messages):
+            for message in messages:
+                process_message(message)
+        
+        if settings.KAFKA_CONSUMER_WORKERS > 1:
+            # Cada worker agrupa lo que haya en su cola; los eventos inválidos se omiten
+            # y los lotes que fallan por errores transitorios se reintentan (con el
+            # pipeline de fallos, solo cuando no se pudo enviar a reintentos o al dead-letter)
+            batch = settings.KAFKA_CONSUMER_BATCH_ENABLED
+            target = functools.partial(
+                kafka_consumer.start_parallel,
+                batch_size=settings.KAFKA_CONSUMER_BATCH_SIZE if batch else 1
+            )
+            callback = process_batch if batch else process_each
+        elif settings.KAFKA_CONSUMER_BATCH_ENABLED:
+            target, callback = kafka_consumer.start_batch, process_batch
+        else:
+            target, callback = kafka_consumer.start, process_message
         
         kafka_consumer_thread = threading.Thread(
-            target=kafka_consumer.start,
-            args=(process_message,),
+            target=target,
+            args=(callback,),
             daemon=True
         )
         kafka_consumer_thread.start()
         logger.info("Consumidor de Kafka iniciado")
+        
+        if failure_pipeline is not None:
+            start_retry_consumer()
     except Exception as e:
         logger.error(f"Error al iniciar consumidor de Kafka: {str(e)}")
 
 
+def start_retry_consumer():
+    """Consume el tema de reintentos; cada evento se procesa al vencer su espera"""
+    global retry_consumer
+    
+    from app.kafka.producer import KafkaConsumerService
+    
+    retry_consumer = KafkaConsumerService(
+        topic=settings.KAFKA_RETRY_TOPIC,
+        group_id="notifications-service-retry"
+    )
+    threading.Thread(
+        target=retry_consumer.start_delayed,
+        args=(failure_pipeline.handle_retry,),
+        name="kafka-retry",
+        daemon=True
+    ).start()
+    logger.info("Consumidor de reintentos de Kafka iniciado")
+
+
+def start_retention_service():
+    """Inicia el mantenimiento de particiones y retención si está configurado"""
+    global retention_service
+    
+    from app.services.retention_service import RetentionService
+    
+    service = RetentionService()
+    if not service.is_enabled():
+        return
+    
+    retention_service = service
+    retention_service.start()
+
+
+def start_digest_service():
+    """Inicia los resúmenes por email si están habilitados"""
+    global digest_service
+    
+    from app.services.digest_service import DigestService
+    
+    service = DigestService()
+    if not service.is_enabled():
+        return
+    
+    digest_service = service
+    digest_service.start()
+
+
+def start_change_feed():
+    """Escucha las escrituras de las demás instancias si el feed de cambios está habilitado"""
+    from app.services.change_feed import change_feed
+    
+    if not change_feed.enabled:
+        return
+    
+    service = notification.notification_service
+    change_feed.subscribe(service.apply_remote_changes, service.resync_local_state)
+    change_feed.start()
+
+
+def initialize_in_background(loop: asyncio.AbstractEventLoop):
+    """Arranque rápido: base de datos, calentamiento de pools y servicios fuera del arranque"""
+    start = time.perf_counter()
+    database.initialize()
+    logger.info(f"Base de datos lista en {time.perf_counter() - start:.2f}s")
+    
+    database.warm_pool(settings.DATABASE_POOL_WARMUP)
+    # Las conexiones async quedan ligadas al loop del servidor
+    asyncio.run_coroutine_threadsafe(database.warm_async_pool(settings.DATABASE_POOL_WARMUP), loop)
+    
+    start_kafka_consumer()
+    start_retention_service()
+    start_digest_service()
+    start_change_feed()
+
+
 @app.on_event("startup")
 async def startup_event():
     """Evento al iniciar la aplicación"""
     logger.info(f"Iniciando {settings.SERVICE_NAME}...")
     
-    # Inicializar base de datos
-    init_database()
+    if settings.FAST_STARTUP:
+        # /health responde de inmediato; las peticiones esperan a la base de datos
+        database.defer_initialization()
+        threading.Thread(
+            target=initialize_in_background,
+            args=(asyncio.get_running_loop(),),
+            name="startup",
+            daemon=True
+        ).start()
+        return
     
-    # Crear tablas en la base de datos
-    from app.database import create_tables
-    create_tables()
+    # Inicializar base de datos y crear las tablas (se omite si el esquema no cambió)
+    database.initialize()
     
     # Inicializar Kafka solo si está habilitado
     start_kafka_consumer()
+    
+    start_retention_service()
+    start_digest_service()
+    start_change_feed()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Evento al cerrar la aplicación"""
     logger.info(f"Cerrando {settings.SERVICE_NAME}...")
+    
+    # Confirmar las creaciones que esperan su grupo antes de cerrar los pools
+    group_commit = notification.notification_service.group_commit
+    if group_commit is not None:
+        await group_commit.close()
+    
     if kafka_consumer:
         kafka_consumer.close()
+    if retry_consumer:
+        retry_consumer.close()
+    if retention_service:
+        retention_service.stop()
+    if digest_service:
+        digest_service.stop()
+    
+    from app.services.change_feed import change_feed
+    change_feed.stop()
+    
+    # Entregar los mensajes que sigan en el buffer del productor
+    if settings.KAFKA_ENABLED:
+        from app.kafka.producer import KafkaProducerService
+        KafkaProducerService.close_instance()
+    
+    await database.close_async_database()
 
 
 @app.get("/", tags=["info"])
@@ -106,16 +269,74 @@ async def read_root():
 @app.get("/health", tags=["health"])
 async def health_check():
     """Health check endpoint"""
-    from app.database import is_database_available
+    from app.services.notification_cache import notification_cache
+    from app.services.hot_notifications import hot_notifications
+    from app.services.change_feed import change_feed
+    
+    # kafka-python solo se importa si Kafka está habilitado
+    producer_stats = None
+    if settings.KAFKA_ENABLED:
+        from app.kafka.producer import KafkaProducerService
+        producer_stats = KafkaProducerService.instance_stats()
+    consumer_stats = kafka_consumer.stats() if kafka_consumer else None
+    failure_stats = None
+    if failure_pipeline is not None:
+        failure_stats = {
+            **failure_pipeline.stats(),
+            **({"retry_consumer": retry_consumer.stats()} if retry_consumer else {})
+        }
+    group_commit = notification.notification_service.group_commit
+    
+    if not database.is_ready():
+        database_status = "starting"
+    else:
+        database_status = "connected" if database.is_database_available() else "disconnected"
     
     return {
         "status": "healthy",
         "service": settings.SERVICE_NAME,
-        "database": "connected" if is_database_available() else "disconnected",
-        "kafka": "enabled" if settings.KAFKA_ENABLED else "disabled"
+        "database": database_status,
+        "kafka": "enabled" if settings.KAFKA_ENABLED else "disabled",
+        "cache": notification_cache.stats(),
+        "hot_tier": hot_notifications.stats(),
+        "change_feed": change_feed.stats(),
+        "pools": database.pool_stats(),
+        **({"producer": producer_stats} if producer_stats is not None else {}),
+        **({"consumer": consumer_stats} if consumer_stats is not None else {}),
+        **({"failures": failure_stats} if failure_stats is not None else {}),
+        **({"group_commit": group_commit.stats()} if group_commit is not None else {})
     }
 
 
+@app.get("/health/live", tags=["health"])
+async def liveness_check():
+    """Liveness: el proceso atiende peticiones; no consulta dependencias"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["health"])
+async def readiness_check():
+    """Readiness: inicialización terminada y base de datos disponible (503 si no)"""
+    if not database.is_ready():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    if not database.is_database_available():
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    from app.metrics import registry, record_pool_usage, stream_connections
+    from app.services.notification_hub import notification_hub
+    
+    for label, engine in database.labeled_engines():
+        record_pool_usage(engine, label)
+    stream_connections.set(notification_hub.connection_count())
+    
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=settings.SERVICE_PORT)
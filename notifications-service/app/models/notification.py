@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Enum as SQLEnum, Text
+from sqlalchemy import Column, String, DateTime, Boolean, BigInteger, Integer, Enum as SQLEnum, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import enum
 
 Base = declarative_base()
 
+# Configuración de texto de PostgreSQL de la columna generada search_vector
+SEARCH_CONFIG = "spanish"
+
 
 class NotificationType(str, enum.Enum):
     """Tipos de notificación permitidos"""
@@ -25,8 +28,74 @@ class Notification(Base):
     description = Column(Text, nullable=False)
     was_read = Column(Boolean, default=False, index=True, name="was_read")
     date = Column(DateTime, default=datetime.utcnow, name="date")
+    # Cantidad de eventos similares fusionados en esta notificación
+    coalesced_count = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Campos adicionales opcionales para tracking
     related_project_id = Column(String(36), nullable=True, index=True)
     related_user_id = Column(String(36), nullable=True)
     related_task_id = Column(String(36), nullable=True)
+    
+    __table_args__ = (
+        # Paginación keyset: cada página es un recorrido de rango sobre este índice
+        Index("idx_notifications_userid_date", userid, date.desc(), notificationid.desc()),
+        # Índice parcial: el conteo de no leídas se resuelve con un index-only scan
+        Index(
+            "idx_notifications_userid_unread",
+            userid,
+            postgresql_where=(was_read == False),
+            sqlite_where=(was_read == False)
+        ),
+        # Filtros de GET /notifications: cada forma se recorre en el orden de la página
+        Index(
+            "idx_notifications_userid_unread_date",
+            userid, date.desc(), notificationid.desc(),
+            postgresql_where=(was_read == False),
+            sqlite_where=(was_read == False)
+        ),
+        Index("idx_notifications_userid_type_date", userid, type, date.desc(), notificationid.desc()),
+        Index("idx_notifications_userid_project_date", userid, related_project_id, date.desc(), notificationid.desc()),
+        Index("idx_notifications_userid_task_date", userid, related_task_id, date.desc(), notificationid.desc()),
+        # Resúmenes por email: rango de fechas de las no leídas de todos los usuarios
+        Index(
+            "idx_notifications_unread_date",
+            date,
+            postgresql_where=(was_read == False),
+            sqlite_where=(was_read == False)
+        ),
+    )
+
+
+class NotificationUserVersion(Base):
+    """Versión de las notificaciones de un usuario; cada escritura la incrementa"""
+    __tablename__ = "notification_user_versions"
+    
+    userid = Column(String(36), primary_key=True, name="userid")
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class NotificationKafkaEvent(Base):
+    """Evento de Kafka ya procesado, por el ID de notificación derivado del evento"""
+    __tablename__ = "notification_kafka_events"
+    
+    notificationid = Column(String(36), primary_key=True, name="notificationid")
+    processed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class NotificationDigestWatermark(Base):
+    """Última notificación incluida en el resumen por email de cada usuario"""
+    __tablename__ = "notification_digest_watermarks"
+    
+    userid = Column(String(36), primary_key=True, name="userid")
+    last_notification_at = Column(DateTime, nullable=False)
+    last_digest_at = Column(DateTime, nullable=False)
+
+
+class NotificationRecipient(Base):
+    """Dirección de email de cada usuario, informada por los eventos de Kafka"""
+    __tablename__ = "notification_recipients"
+    
+    userid = Column(String(36), primary_key=True, name="userid")
+    email = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,38 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Codifica a JSON compacto en UTF-8
+
+    Produce los mismos bytes que JSONResponse de Starlette para contenido
+    ya serializable (strings, números, booleanos, listas y dicts); usa
+    orjson si está instalado.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON sin jsonable_encoder ni validación de response_model
+
+    El contenido debe estar ya en tipos JSON nativos (fechas como string).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
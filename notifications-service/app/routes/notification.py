@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.schemas.notification import (
-    NotificationResponse, 
     NotificationCreate,
+    NotificationBatchCreate,
     NotificationListResponse,
+    NotificationFilters,
+    NotificationType,
     NotificationMarkReadRequest,
-    NotificationDeleteRequest
+    NotificationDeleteRequest,
+    NotificationBulkMarkReadRequest,
+    NotificationBulkDeleteRequest
 )
 from app.services.notification_service import NotificationService
-from app.database import get_database
+from app.database import get_async_database, get_async_read_database, async_read_session_scope, async_session_scope
+from app.services.notification_hub import notification_hub, SubscriptionDropped
+from app.config import settings
+from app.responses import FastJSONResponse
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -20,47 +30,124 @@ notification_service = NotificationService()
 @router.get("", response_model=NotificationListResponse)
 async def get_notifications(
     userid: str = Query(..., description="ID del usuario"),
-    db: Session = Depends(get_database)
+    limit: int = Query(
+        settings.NOTIFICATIONS_PAGE_SIZE,
+        ge=1,
+        le=settings.NOTIFICATIONS_MAX_PAGE_SIZE,
+        description="Cantidad máxima de notificaciones por página"
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto como next_cursor"),
+    type: Optional[List[NotificationType]] = Query(None, description="Solo estos tipos (se puede repetir)"),
+    unread: bool = Query(False, description="Solo notificaciones no leídas"),
+    related_project_id: Optional[str] = Query(None, description="Solo notificaciones de este proyecto"),
+    related_task_id: Optional[str] = Query(None, description="Solo notificaciones de esta tarea"),
+    since: Optional[datetime] = Query(None, description="Fecha mínima (inclusive)"),
+    until: Optional[datetime] = Query(None, description="Fecha máxima (inclusive)"),
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Búsqueda de texto en título y descripción"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_database)
 ):
     """
-    Obtiene las notificaciones del usuario
+    Obtiene las notificaciones del usuario, paginadas por cursor
+    
+    Para obtener la página siguiente se envía el `next_cursor` de la
+    respuesta anterior (con los mismos filtros); es null cuando no hay más
+    notificaciones. Los filtros se combinan entre sí y el orden es siempre
+    por fecha, más recientes primero, también al buscar con `q`.
+    
+    La respuesta incluye un `ETag` con la versión de las notificaciones del
+    usuario; si se reenvía en `If-None-Match` y nada cambió, se responde
+    304 sin consultar las notificaciones.
     
     Nota: La autenticación debe ser manejada por el backend Java.
     Este endpoint confía en que el backend ya validó al usuario.
     """
     try:
-        notifications = notification_service.get_user_notifications(userid, db)
-        
-        # Convertir las notificaciones al formato requerido
-        notifications_list = [
-            {
-                "notificationid": n.notificationid,
-                "title": n.title,
-                "description": n.description,
-                "type": n.type.value if hasattr(n.type, 'value') else n.type,
-                "date": n.date.isoformat(),
-                "wasRead": n.was_read
-            }
-            for n in notifications
-        ]
+        # La versión se lee (del primario) antes que la página: si una escritura
+        # ocurre en medio, el ETag queda viejo y el siguiente sondeo recibe un 200
+        version = await notification_service.get_version_async(userid)
+        headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+        if _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
         
-        return NotificationListResponse(
-            success=True,
-            message="Notificaciones obtenidas exitosamente",
-            body={"notifications": notifications_list}
+        filters = NotificationFilters(
+            types=type,
+            unread=unread,
+            related_project_id=related_project_id,
+            related_task_id=related_task_id,
+            since=since,
+            until=until,
+            q=q
         )
+        # Si la réplica todavía no alcanzó la versión del ETag, la página se lee
+        # del primario: un ETag más nuevo que la página la dejaría fija en el cliente
+        if await notification_service.is_behind_version_async(userid, version, db):
+            async with async_session_scope() as primary:
+                notifications_list, next_cursor = await notification_service.get_user_notifications_cached_async(
+                    userid, primary, limit, cursor, filters
+                )
+        else:
+            notifications_list, next_cursor = await notification_service.get_user_notifications_cached_async(
+                userid, db, limit, cursor, filters
+            )
+        
+        # Se devuelve una Response para evitar revalidar con response_model
+        return FastJSONResponse({
+            "success": True,
+            "message": "Notificaciones obtenidas exitosamente",
+            "body": {"notifications": notifications_list, "next_cursor": next_cursor}
+        }, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return NotificationListResponse(
             success=False,
             message=f"Error al obtener notificaciones: {str(e)}",
-            body={"notifications": []}
+            body={"notifications": [], "next_cursor": None}
         )
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara If-None-Match (lista de ETags o *) con el ETag actual"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+@router.get("/unread-count")
+async def get_unread_count(
+    userid: str = Query(..., description="ID del usuario"),
+    db: AsyncSession = Depends(get_async_read_database)
+):
+    """
+    Obtiene la cantidad de notificaciones no leídas del usuario
+    
+    Nota: La autenticación debe ser manejada por el backend Java.
+    Este endpoint confía en que el backend ya validó al usuario.
+    """
+    try:
+        count = await notification_service.get_unread_count_async(userid, db)
+        
+        return {
+            "success": True,
+            "message": "Contador obtenido exitosamente",
+            "body": {"unread_count": count}
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error al obtener contador: {str(e)}",
+            "body": {"unread_count": 0}
+        }
+
+
 @router.patch("/read")
 async def mark_notification_as_read(
     request: NotificationMarkReadRequest,
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_async_database)
 ):
     """
     Marca una notificación como leída
@@ -68,7 +155,7 @@ async def mark_notification_as_read(
     Nota: La autenticación debe ser manejada por el backend Java.
     Este endpoint confía en que el backend ya validó al usuario.
     """
-    result = notification_service.mark_as_read(request.userid, request.notificationid, db)
+    result = await notification_service.mark_as_read_async(request.userid, request.notificationid, db)
     
     if not result:
         return {
@@ -82,10 +169,68 @@ async def mark_notification_as_read(
     }
 
 
+@router.patch("/read/bulk")
+async def mark_notifications_as_read_bulk(
+    request: NotificationBulkMarkReadRequest,
+    db: AsyncSession = Depends(get_async_database)
+):
+    """
+    Marca varias notificaciones como leídas en una sola operación
+    
+    Se indica una lista de `notificationids` o `all=true`, opcionalmente
+    limitado con `until` (fecha máxima) y `type`.
+    
+    Nota: La autenticación debe ser manejada por el backend Java.
+    Este endpoint confía en que el backend ya validó al usuario.
+    """
+    updated = await notification_service.mark_as_read_bulk_async(
+        request.userid,
+        db,
+        notificationids=None if request.all else request.notificationids,
+        until=request.until,
+        type=request.type
+    )
+    
+    return {
+        "success": True,
+        "message": "Notificaciones marcadas como leídas",
+        "body": {"updated": updated}
+    }
+
+
+@router.delete("/bulk")
+async def delete_notifications_bulk(
+    request: NotificationBulkDeleteRequest,
+    db: AsyncSession = Depends(get_async_database)
+):
+    """
+    Elimina varias notificaciones en una sola operación
+    
+    Se indica una lista de `notificationids` o `all=true`, opcionalmente
+    limitado con `until` (fecha máxima) y `type`.
+    
+    Nota: La autenticación debe ser manejada por el backend Java.
+    Este endpoint confía en que el backend ya validó al usuario.
+    """
+    deleted_ids = await notification_service.delete_notifications_bulk_async(
+        request.userid,
+        db,
+        notificationids=None if request.all else request.notificationids,
+        until=request.until,
+        type=request.type
+    )
+    
+    return {
+        "success": True,
+        "message": "Notificaciones eliminadas exitosamente",
+        "body": {"deleted": len(deleted_ids), "notificationids": deleted_ids}
+    }
+
+
 @router.delete("")
 async def delete_notification(
     request: NotificationDeleteRequest,
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_async_database)
 ):
     """
     Elimina una notificación
@@ -93,7 +238,7 @@ async def delete_notification(
     Nota: La autenticación debe ser manejada por el backend Java.
     Este endpoint confía en que el backend ya validó al usuario.
     """
-    result = notification_service.delete_notification(request.userid, request.notificationid, db)
+    result = await notification_service.delete_notification_async(request.userid, request.notificationid, db)
     
     if not result:
         return {
@@ -110,7 +255,7 @@ async def delete_notification(
 @router.post("")
 async def create_notification(
     request: NotificationCreate,
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_async_database)
 ):
     """
     Crea una nueva notificación manualmente (sin Kafka)
@@ -130,7 +275,7 @@ async def create_notification(
     """
     try:
         # Llamar al servicio para crear la notificación
-        notification = notification_service.create_notification(
+        notification = await notification_service.create_notification_async(
             notification_create=request,
             db=db
         )
@@ -147,6 +292,135 @@ async def create_notification(
         )
 
 
+@router.post("/batch")
+async def create_notifications_batch(
+    request: NotificationBatchCreate,
+    db: AsyncSession = Depends(get_async_database)
+):
+    """
+    Crea muchas notificaciones en una sola petición y una sola transacción
+    
+    Acepta una lista explícita o una plantilla para varios usuarios:
+    {
+        "template": {"type": "informative", "title": "...", "description": "..."},
+        "userids": ["123", "456"]
+    }
+    
+    Nota: La autenticación debe ser manejada por el backend Java.
+    """
+    try:
+        notification_ids = await notification_service.create_notifications_batch_async(request, db)
+        
+        return {
+            "success": True,
+            "message": "Notificaciones creadas exitosamente",
+            "body": {"created": len(notification_ids), "notificationids": notification_ids}
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al crear notificaciones: {str(e)}"
+        )
+
+
+async def _catch_up(userid: str, since: Optional[datetime]) -> List[dict]:
+    """Notificaciones perdidas desde `since`, recuperadas con una sola consulta"""
+    if since is None:
+        return []
+    
+    async with async_read_session_scope(userid) as db:
+        notifications = await notification_service.get_notifications_since_async(
+            userid, since, db, settings.STREAM_CATCHUP_LIMIT
+        )
+    return [notification_service.serialize(n) for n in notifications]
+
+
+@router.websocket("/stream")
+async def notifications_stream(
+    websocket: WebSocket,
+    userid: str = Query(..., description="ID del usuario"),
+    since: Optional[datetime] = Query(None, description="Fecha de la última notificación recibida")
+):
+    """
+    Notificaciones en vivo por WebSocket
+    
+    Mensajes: {"event": "notification", "data": {...}} y
+    {"event": "heartbeat"}. Al reconectar se envía `since` con la fecha de
+    la última notificación recibida para recuperar las perdidas.
+    """
+    await websocket.accept()
+    subscription = notification_hub.subscribe(userid)
+    
+    try:
+        sent_ids = set()
+        for payload in await _catch_up(userid, since):
+            sent_ids.add(payload["notificationid"])
+            await websocket.send_json({"event": "notification", "data": payload})
+        
+        while True:
+            payload = await subscription.get(settings.STREAM_HEARTBEAT_SECONDS)
+            if payload is None:
+                await websocket.send_json({"event": "heartbeat"})
+            elif payload["notificationid"] not in sent_ids:
+                await websocket.send_json({"event": "notification", "data": payload})
+    except SubscriptionDropped:
+        # 1013: el cliente debe reconectar con `since`
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def notifications_stream_sse(
+    request: Request,
+    userid: str = Query(..., description="ID del usuario"),
+    since: Optional[datetime] = Query(None, description="Fecha de la última notificación recibida"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Notificaciones en vivo por Server-Sent Events (alternativa al WebSocket)
+    
+    El `id` de cada evento es la fecha de la notificación, así EventSource
+    la reenvía como Last-Event-ID al reconectar y se recupera lo perdido.
+    """
+    if since is None and last_event_id:
+        try:
+            since = datetime.fromisoformat(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID inválido")
+    
+    subscription = notification_hub.subscribe(userid)
+    
+    def format_event(payload: dict) -> str:
+        return f"id: {payload['date']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+    
+    async def event_stream():
+        try:
+            sent_ids = set()
+            for payload in await _catch_up(userid, since):
+                sent_ids.add(payload["notificationid"])
+                yield format_event(payload)
+            
+            while not await request.is_disconnected():
+                payload = await subscription.get(settings.STREAM_HEARTBEAT_SECONDS)
+                if payload is None:
+                    yield ": heartbeat\n\n"
+                elif payload["notificationid"] not in sent_ids:
+                    yield format_event(payload)
+        except SubscriptionDropped:
+            yield "event: dropped\ndata: {}\n\n"
+        finally:
+            notification_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/health", tags=["health"])
 async def health_check():
     """Verificación de salud del servicio"""
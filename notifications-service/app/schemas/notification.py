@@ -1,7 +1,15 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import datetime, timezone
+from typing import List, Optional
 from enum import Enum
+from app.config import settings
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Las fechas se guardan en UTC sin zona: una fecha con zona se convierte"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class NotificationType(str, Enum):
@@ -23,6 +31,34 @@ class NotificationCreate(BaseModel):
     related_task_id: Optional[str] = None
 
 
+class NotificationTemplate(BaseModel):
+    """Plantilla común para notificar a varios usuarios"""
+    type: NotificationType = Field(..., description="Tipo de notificación: warning, success, informative, application")
+    title: str = Field(..., description="Título de la notificación")
+    description: str = Field(..., description="Descripción de la notificación")
+    related_project_id: Optional[str] = None
+    related_user_id: Optional[str] = None
+    related_task_id: Optional[str] = None
+
+
+class NotificationBatchCreate(BaseModel):
+    """Schema para crear notificaciones en lote: lista explícita o plantilla + userids"""
+    notifications: Optional[List[NotificationCreate]] = Field(None, description="Notificaciones a crear")
+    template: Optional[NotificationTemplate] = Field(None, description="Plantilla común")
+    userids: Optional[List[str]] = Field(None, description="Destinatarios de la plantilla")
+    
+    @model_validator(mode="after")
+    def check_shape(self):
+        if (self.notifications is None) == (self.template is None):
+            raise ValueError("Se debe indicar notifications o template, no ambos")
+        if self.template is not None and not self.userids:
+            raise ValueError("template requiere una lista de userids")
+        size = len(self.notifications or self.userids)
+        if size > settings.NOTIFICATIONS_BATCH_MAX_SIZE:
+            raise ValueError(f"El lote supera el máximo de {settings.NOTIFICATIONS_BATCH_MAX_SIZE} notificaciones")
+        return self
+
+
 class NotificationResponse(BaseModel):
     """Schema de respuesta de notificación"""
     notificationid: str
@@ -31,6 +67,7 @@ class NotificationResponse(BaseModel):
     type: str
     date: datetime
     wasRead: bool
+    count: int = 1
     
     class Config:
         from_attributes = True
@@ -43,6 +80,26 @@ class NotificationListResponse(BaseModel):
     body: dict
 
 
+class NotificationFilters(BaseModel):
+    """Filtros combinables de GET /notifications"""
+    types: Optional[List[NotificationType]] = Field(None, description="Solo estos tipos")
+    unread: bool = Field(False, description="Solo notificaciones no leídas")
+    related_project_id: Optional[str] = None
+    related_task_id: Optional[str] = None
+    since: Optional[datetime] = Field(None, description="Fecha mínima (inclusive)")
+    until: Optional[datetime] = Field(None, description="Fecha máxima (inclusive)")
+    q: Optional[str] = Field(None, description="Búsqueda de texto en título y descripción")
+    
+    _naive_dates = field_validator("since", "until")(naive_utc)
+    
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_defaults=True)
+    
+    def cache_key(self) -> str:
+        """Representación estable para la clave del caché de páginas"""
+        return self.model_dump_json(exclude_defaults=True)
+
+
 class NotificationMarkReadRequest(BaseModel):
     """Schema para marcar notificación como leída"""
     userid: str = Field(..., description="ID del usuario")
@@ -55,8 +112,34 @@ class NotificationDeleteRequest(BaseModel):
     notificationid: str = Field(..., description="ID de la notificación")
 
 
+class NotificationBulkRequest(BaseModel):
+    """Schema base para operaciones masivas sobre notificaciones"""
+    userid: str = Field(..., description="ID del usuario")
+    notificationids: Optional[List[str]] = Field(None, description="IDs de las notificaciones")
+    all: bool = Field(False, description="Aplica a todas las notificaciones del usuario")
+    until: Optional[datetime] = Field(None, description="Solo notificaciones con fecha menor o igual")
+    type: Optional[NotificationType] = Field(None, description="Solo notificaciones de este tipo")
+    
+    _naive_until = field_validator("until")(naive_utc)
+    
+    @model_validator(mode="after")
+    def check_target(self):
+        if not self.all and not self.notificationids:
+            raise ValueError("Se debe indicar notificationids o all=true")
+        return self
+
+
+class NotificationBulkMarkReadRequest(NotificationBulkRequest):
+    """Schema para marcar varias notificaciones como leídas"""
+
+
+class NotificationBulkDeleteRequest(NotificationBulkRequest):
+    """Schema para eliminar varias notificaciones"""
+
+
 class KafkaNotificationEvent(BaseModel):
     """Schema para eventos de Kafka"""
+    event_id: Optional[str] = Field(None, description="ID único del evento; si falta se usa un hash del contenido")
     event_type: str
     user_id: str
     notification_type: NotificationType
@@ -66,3 +149,5 @@ class KafkaNotificationEvent(BaseModel):
     related_project_id: Optional[str] = None
     related_user_id: Optional[str] = None
     related_task_id: Optional[str] = None
+    user_email: Optional[str] = Field(None, description="Email del usuario; lo usan los resúmenes por email")
+    user_name: Optional[str] = Field(None, description="Nombre del usuario para los resúmenes por email")
@@ -0,0 +1,253 @@
+import json
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Operaciones de un cambio
+CREATE, READ, DELETE = "c", "r", "d"
+
+# (userid, operación, notificationid); sin ID cuando no se sabe qué filas cambiaron
+Change = Tuple[str, str, Optional[str]]
+
+
+class UserChanges:
+    """Cambios de un usuario coalescidos dentro de un lote del listener"""
+
+    __slots__ = ("created", "read", "deleted", "reset")
+
+    def __init__(self):
+        # IDs creados o fusionados, en orden de llegada; None si fueron demasiados
+        self.created = []
+        self.read = set()
+        self.deleted = set()
+        # El estado derivado del usuario no se puede actualizar: hay que reconstruirlo
+        self.reset = False
+
+
+def coalesce(changes: Iterable[Change], max_user_events: int) -> Dict[str, "UserChanges"]:
+    """Agrupa los cambios de un lote por usuario"""
+    users = {}
+    counts = defaultdict(int)
+    for userid, op, notificationid in changes:
+        user = users.get(userid)
+        if user is None:
+            user = users[userid] = UserChanges()
+        counts[userid] += 1
+
+        if notificationid is None or op not in (CREATE, READ, DELETE):
+            user.reset = True
+        elif op == CREATE:
+            user.created.append(notificationid)
+        elif op == READ:
+            user.read.add(notificationid)
+        else:
+            user.deleted.add(notificationid)
+
+    for userid, user in users.items():
+        user.created = list(dict.fromkeys(user.created))
+        if counts[userid] > max_user_events:
+            user.reset = True
+            if len(user.created) > max_user_events:
+                user.created = None
+    return users
+
+
+class ChangeFeed:
+    """
+    Feed de cambios de notificaciones entre instancias con LISTEN/NOTIFY
+
+    Cada escritura del servicio anuncia sus cambios compactos (userid,
+    operación, notificationid) con pg_notify dentro de su transacción, así
+    el aviso se entrega solo si la escritura se confirma. Cada instancia
+    escucha el canal con una conexión dedicada, agrupa los avisos de una
+    ráfaga durante `batch_ms`, omite los propios (el estado local ya se
+    actualizó al escribir), los coalesce por usuario y los despacha a los
+    suscriptores locales (cachés, hot tier, conexiones en vivo).
+
+    NOTIFY no conserva los avisos emitidos mientras el listener no estaba
+    conectado: cada vez que la escucha (re)comienza se pide a los
+    suscriptores una resincronización completa.
+    """
+
+    # PostgreSQL rechaza avisos de 8000 bytes o más
+    MAX_PAYLOAD_BYTES = 7900
+    # Sin avisos durante este tiempo se verifica que la conexión siga viva
+    IDLE_CHECK_SECONDS = 5.0
+    RECONNECT_MAX_SECONDS = 30.0
+
+    def __init__(self, enabled: bool, channel: str, batch_ms: float, max_batch: int, max_user_events: int):
+        self.enabled = enabled
+        self.channel = channel
+        self.batch_seconds = batch_ms / 1000
+        self.max_batch = max(max_batch, 1)
+        self.max_user_events = max_user_events
+        # Identifica los avisos de este proceso
+        self.origin = uuid.uuid4().hex[:12]
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.connected = False
+        self.received = 0
+        self.own = 0
+        self.batches = 0
+        self.resyncs = 0
+
+    def subscribe(
+        self,
+        on_changes: Callable[[Dict[str, UserChanges]], None],
+        on_resync: Callable[[], None]
+    ):
+        """Registra un suscriptor local; se invoca desde el hilo del listener"""
+        self._subscribers.append((on_changes, on_resync))
+
+    def _payloads(self, changes: List[Change]) -> List[str]:
+        """Avisos de hasta MAX_PAYLOAD_BYTES con los cambios sin repetir"""
+        header = f'{{"o":"{self.origin}","c":['
+        payloads = []
+        current = []
+        size = len(header) + 2
+        for change in dict.fromkeys(changes):
+            # ensure_ascii (por defecto): un carácter por byte
+            encoded = json.dumps(change, separators=(",", ":"))
+            if current and size + len(encoded) + 1 > self.MAX_PAYLOAD_BYTES:
+                payloads.append(header + ",".join(current) + "]}")
+                current = []
+                size = len(header) + 2
+            current.append(encoded)
+            size += len(encoded) + 1
+        if current:
+            payloads.append(header + ",".join(current) + "]}")
+        return payloads
+
+    def _statement(self, changes: List[Change]):
+        """Un solo round trip sin importar cuántos avisos haga falta enviar"""
+        return text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload").bindparams(
+            bindparam("channel", self.channel),
+            bindparam("payloads", self._payloads(changes), type_=ARRAY(String))
+        )
+
+    def emit(self, db: Session, changes: Iterable[Change]):
+        """Anuncia los cambios dentro de la transacción actual; se entregan al confirmarla"""
+        if not self.enabled:
+            return
+        changes = list(changes)
+        if changes and db.get_bind().dialect.name == "postgresql":
+            db.execute(self._statement(changes))
+
+    async def emit_async(self, db: AsyncSession, changes: Iterable[Change]):
+        """Anuncia los cambios dentro de la transacción actual (async)"""
+        if not self.enabled:
+            return
+        changes = list(changes)
+        if changes and db.get_bind().dialect.name == "postgresql":
+            await db.execute(self._statement(changes))
+
+    def start(self):
+        """Inicia el listener en un hilo separado"""
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+        logger.info(f"Feed de cambios escuchando el canal {self.channel}")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        from psycopg import sql
+        from app.database import connect_listener
+
+        delay = 0.5
+        while not self._stop.is_set():
+            try:
+                connection = connect_listener()
+                if connection is None:
+                    logger.warning("El feed de cambios requiere PostgreSQL; no se iniciará")
+                    return
+
+                with connection:
+                    connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.connected = True
+                    delay = 0.5
+                    # Lo escrito por otras instancias antes de este LISTEN no llegará
+                    self._resync()
+                    self._listen(connection)
+            except Exception as e:
+                logger.error(f"Feed de cambios desconectado: {str(e)}")
+            finally:
+                self.connected = False
+
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+
+    def _listen(self, connection):
+        while not self._stop.is_set():
+            notifies = list(connection.notifies(timeout=self.IDLE_CHECK_SECONDS, stop_after=1))
+            if not notifies:
+                # Detecta una conexión caída sin esperar al próximo aviso
+                connection.execute("SELECT 1")
+                continue
+
+            if self.batch_seconds > 0 and self.max_batch > 1:
+                notifies.extend(connection.notifies(timeout=self.batch_seconds, stop_after=self.max_batch - 1))
+            self._dispatch([notify.payload for notify in notifies])
+
+    def _dispatch(self, payloads: List[str]):
+        changes = []
+        for payload in payloads:
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                logger.warning("Aviso del feed de cambios inválido descartado")
+                continue
+
+            self.received += 1
+            if message.get("o") == self.origin:
+                self.own += 1
+                continue
+            changes.extend(tuple(change) for change in message.get("c", ()))
+
+        if not changes:
+            return
+
+        users = coalesce(changes, self.max_user_events)
+        self.batches += 1
+        for on_changes, _ in self._subscribers:
+            try:
+                on_changes(users)
+            except Exception as e:
+                logger.error(f"Error aplicando cambios de otras instancias: {str(e)}")
+
+    def _resync(self):
+        self.resyncs += 1
+        for _, on_resync in self._subscribers:
+            try:
+                on_resync()
+            except Exception as e:
+                logger.error(f"Error resincronizando el estado local: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "received": self.received,
+            "own": self.own,
+            "batches": self.batches,
+            "resyncs": self.resyncs
+        }
+
+
+change_feed = ChangeFeed(
+    enabled=settings.NOTIFICATIONS_CHANGE_FEED_ENABLED,
+    channel=settings.NOTIFICATIONS_CHANGE_FEED_CHANNEL,
+    batch_ms=settings.NOTIFICATIONS_CHANGE_FEED_BATCH_MS,
+    max_batch=settings.NOTIFICATIONS_CHANGE_FEED_MAX_BATCH,
+    max_user_events=settings.NOTIFICATIONS_CHANGE_FEED_MAX_USER_EVENTS
+)
@@ -0,0 +1,269 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.config import settings
+from app.models.notification import Notification, NotificationDigestWatermark, NotificationRecipient
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock de PostgreSQL: una sola instancia arma los resúmenes
+DIGEST_LOCK_KEY = 0x6E6F7469
+
+
+class PendingDigest(NamedTuple):
+    """No leídas de un usuario posteriores a su marca"""
+    userid: str
+    unread: int
+    oldest: datetime
+    latest: datetime
+    titles: List[str]
+    email: str
+    name: Optional[str]
+
+
+class DigestService:
+    """
+    Resumen periódico por email de notificaciones no leídas
+
+    Cada pasada agrupa con una sola consulta las no leídas de cada usuario
+    posteriores a su marca (la fecha de la última notificación incluida en
+    su resumen anterior) y publica un evento por usuario en el tema de
+    emails, en lotes. La consulta recorre un rango del índice por fecha, no
+    la tabla completa: la primera pasada cubre la ventana
+    NOTIFICATIONS_DIGEST_LOOKBACK_HOURS y las siguientes empiezan donde
+    terminó la anterior, o antes si quedaron usuarios pendientes (debajo del
+    mínimo, conectados, sin email conocido o con la entrega fallida). Las marcas se actualizan después
+    de que Kafka confirma cada lote: si el proceso cae en medio, el
+    siguiente resumen puede repetirse (al menos una vez); `event_id` es
+    estable para que el consumidor descarte duplicados.
+
+    Los usuarios con una conexión en vivo en esta instancia se omiten y
+    conservan lo pendiente para la siguiente pasada. El servicio de email
+    necesita `to_email`: la dirección sale de notification_recipients (la
+    informan los eventos de Kafka en `user_email`/`user_name`), y los
+    usuarios sin dirección tampoco avanzan su marca hasta tenerla.
+    """
+
+    # Las filas más nuevas pueden no estar confirmadas todavía
+    SETTLE_SECONDS = 60
+
+    def __init__(self, producer=None):
+        self._producer = producer
+        self._stop = threading.Event()
+        self._thread = None
+        # Inicio del rango a revisar en la próxima pasada (en memoria: tras
+        # reiniciar se vuelve a revisar la ventana completa)
+        self._scan_from: Optional[datetime] = None
+
+    def is_enabled(self) -> bool:
+        return settings.NOTIFICATIONS_DIGEST_ENABLED and settings.KAFKA_ENABLED
+
+    @property
+    def producer(self):
+        if self._producer is None:
+            from app.kafka.producer import KafkaProducerService
+            self._producer = KafkaProducerService()
+        return self._producer
+
+    @staticmethod
+    def _digest_statement(dialect_name: str, since: datetime, until: datetime, max_items: int):
+        """Una fila por usuario: cantidad, fechas extremas, títulos más recientes y destinatario"""
+        watermark = NotificationDigestWatermark
+        recipient = NotificationRecipient
+        if dialect_name == "postgresql":
+            titles = func.array_agg(aggregate_order_by(Notification.title, Notification.date.desc()))
+            titles = titles[1:max_items]
+        else:
+            # SQLite no ordena dentro del agregado; se recortan y ordenan en Python
+            titles = func.json_group_array(func.json_array(Notification.date, Notification.title))
+
+        return (
+            select(
+                Notification.userid, func.count(), func.min(Notification.date), func.max(Notification.date), titles,
+                recipient.email, recipient.name
+            )
+            .select_from(Notification)
+            .outerjoin(watermark, watermark.userid == Notification.userid)
+            .outerjoin(recipient, recipient.userid == Notification.userid)
+            .where(
+                Notification.was_read == False,
+                Notification.date > since,
+                Notification.date <= until,
+                or_(watermark.last_notification_at.is_(None), Notification.date > watermark.last_notification_at)
+            )
+            .group_by(Notification.userid, recipient.email, recipient.name)
+        )
+
+    @staticmethod
+    def _titles(value, max_items: int) -> List[str]:
+        if isinstance(value, str):
+            pairs = sorted(json.loads(value), reverse=True)
+            return [title for _, title in pairs[:max_items]]
+        return list(value or [])[:max_items]
+
+    @staticmethod
+    def render(digest: PendingDigest) -> dict:
+        """Evento para el servicio de email con el resumen de un usuario"""
+        userid, unread, titles = digest.userid, digest.unread, digest.titles
+        lines = [f"- {title}" for title in titles]
+        if unread > len(titles):
+            lines.append(f"- y {unread - len(titles)} más")
+        subject = (
+            "Tienes 1 notificación nueva sin leer" if unread == 1
+            else f"Tienes {unread} notificaciones nuevas sin leer"
+        )
+        return {
+            "event_id": f"digest-{userid}-{digest.latest.isoformat()}",
+            "event_type": "notification_digest",
+            "user_id": userid,
+            "to_email": digest.email,
+            "to_name": digest.name,
+            "related_user_id": userid,
+            "subject": subject,
+            "body": "Notificaciones recientes:\n" + "\n".join(lines),
+            "template_data": {"unread_count": unread},
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def run_once(self, now: Optional[datetime] = None) -> dict:
+        """Arma y publica los resúmenes pendientes"""
+        from app.database import engine
+        from app.services.notification_hub import notification_hub
+
+        result = {
+            "users": 0, "notifications": 0, "skipped_online": 0, "below_minimum": 0, "no_recipient": 0, "failed": 0
+        }
+        if engine is None:
+            return result
+
+        now = now or datetime.utcnow()
+        until = now - timedelta(seconds=self.SETTLE_SECONDS)
+        since = now - timedelta(hours=settings.NOTIFICATIONS_DIGEST_LOOKBACK_HOURS)
+        if self._scan_from is not None:
+            since = max(since, self._scan_from)
+        max_items = settings.NOTIFICATIONS_DIGEST_MAX_ITEMS
+        is_postgresql = engine.dialect.name == "postgresql"
+
+        # Una sola conexión para toda la pasada: el advisory lock es de sesión
+        with engine.connect() as connection:
+            if is_postgresql:
+                locked = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": DIGEST_LOCK_KEY}
+                ).scalar()
+                connection.commit()
+                if not locked:
+                    # Otra instancia está armando los resúmenes
+                    return result
+
+            try:
+                stmt = self._digest_statement(engine.dialect.name, since, until, max_items)
+                pending = []
+                # Fecha más antigua de lo que queda para una próxima pasada
+                carried = [until]
+                for userid, unread, oldest, latest, titles, email, name in connection.execute(stmt):
+                    if unread < settings.NOTIFICATIONS_DIGEST_MIN_UNREAD:
+                        result["below_minimum"] += 1
+                    elif not email:
+                        # Sin dirección el servicio de email no puede enviarlo
+                        result["no_recipient"] += 1
+                    elif notification_hub.has_subscribers(userid):
+                        result["skipped_online"] += 1
+                    else:
+                        pending.append(PendingDigest(
+                            userid, unread, oldest, latest, self._titles(titles, max_items), email, name
+                        ))
+                        continue
+                    carried.append(oldest)
+                connection.commit()
+
+                batch_size = max(settings.NOTIFICATIONS_DIGEST_BATCH_SIZE, 1)
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    sent = self._publish(batch)
+                    result["failed"] += len(batch) - len(sent)
+                    delivered = {digest.userid for digest in sent}
+                    carried.extend(digest.oldest for digest in batch if digest.userid not in delivered)
+                    if sent:
+                        self._store_watermarks(connection, sent, now)
+                        connection.commit()
+                        result["users"] += len(sent)
+                        result["notifications"] += sum(digest.unread for digest in sent)
+                # Lo anterior a esta fecha ya quedó resuelto (o fuera de la ventana)
+                self._scan_from = min(carried) - timedelta(microseconds=1)
+            finally:
+                if is_postgresql:
+                    connection.rollback()
+                    connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": DIGEST_LOCK_KEY})
+                    connection.commit()
+
+        return result
+
+    def _publish(self, batch: List[PendingDigest]) -> List[PendingDigest]:
+        """Publica un lote y devuelve los resúmenes cuya entrega confirmó Kafka"""
+        futures = []
+        for digest in batch:
+            try:
+                future = self.producer.send(
+                    settings.KAFKA_EMAIL_TOPIC, self.render(digest), key=digest.userid.encode("utf-8")
+                )
+            except Exception as e:
+                logger.error(f"Error al encolar el resumen de {digest.userid}: {str(e)}")
+                continue
+            futures.append((future, digest))
+
+        self.producer.flush(timeout=settings.KAFKA_PRODUCER_FLUSH_TIMEOUT_SECONDS)
+
+        sent = []
+        for future, digest in futures:
+            try:
+                future.get(timeout=0)
+                sent.append(digest)
+            except Exception as e:
+                logger.error(f"Resumen de {digest.userid} no entregado: {str(e)}")
+        return sent
+
+    @staticmethod
+    def _store_watermarks(connection, sent: List[PendingDigest], now: datetime):
+        """Avanza la marca de cada usuario hasta la última notificación incluida"""
+        table = NotificationDigestWatermark
+        values = [
+            {"userid": digest.userid, "last_notification_at": digest.latest, "last_digest_at": now}
+            for digest in sent
+        ]
+        insert = sqlite_insert if connection.dialect.name == "sqlite" else postgresql_insert
+        stmt = insert(table).values(values)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.userid],
+            set_={
+                "last_notification_at": stmt.excluded.last_notification_at,
+                "last_digest_at": stmt.excluded.last_digest_at
+            }
+        ))
+
+    def start(self):
+        """Inicia los resúmenes periódicos en un hilo separado"""
+        self._thread = threading.Thread(target=self._run, name="digest", daemon=True)
+        self._thread.start()
+        logger.info("Resúmenes de notificaciones no leídas iniciados")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = self.run_once()
+                if result["users"] or result["failed"]:
+                    logger.info(
+                        f"Resúmenes publicados: {result['users']} usuarios, "
+                        f"{result['notifications']} notificaciones, {result['failed']} fallidos"
+                    )
+            except Exception as e:
+                logger.error(f"Error armando resúmenes de notificaciones: {str(e)}")
+
+            self._stop.wait(settings.NOTIFICATIONS_DIGEST_INTERVAL_SECONDS)
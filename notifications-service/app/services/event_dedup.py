@@ -0,0 +1,35 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+from app.config import settings
+
+
+class RecentlySeenEvents:
+    """
+    Conjunto acotado de eventos de Kafka ya persistidos
+
+    Descarta la mayoría de las re-entregas antes de tocar la base de datos;
+    al superar `max_size` se olvidan los más antiguos. Es solo un filtro
+    previo: la tabla de eventos procesados sigue siendo la garantía.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._keys
+
+    def add_many(self, keys: Iterable[str]):
+        """Registra eventos cuya transacción ya se confirmó"""
+        with self._lock:
+            for key in keys:
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+
+recently_seen_events = RecentlySeenEvents(max_size=settings.KAFKA_DEDUP_CACHE_SIZE)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Agrupa escrituras concurrentes en una sola transacción
+
+    Cada `submit` encola un elemento y espera; una tarea del event loop
+    reúne lo encolado y llama a `flush` con el grupo cuando hay `max_rows`
+    elementos o cuando el más antiguo lleva `max_delay_seconds` esperando.
+    Mientras un grupo se confirma, el siguiente se va formando. `submit`
+    termina solo después del commit de su grupo, así que la durabilidad es
+    la misma que escribiendo de a uno. Si el grupo falla, sus elementos se
+    reintentan de a uno para que el error llegue solo a quien lo causó.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Awaitable[None]],
+        max_rows: int,
+        max_delay_seconds: float
+    ):
+        self.flush = flush
+        self.max_rows = max(max_rows, 1)
+        self.max_delay_seconds = max_delay_seconds
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._arrived: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._groups = 0
+        self._rows = 0
+        self._largest_group = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = loop.create_task(self._run())
+        if self._pending:
+            self._arrived.set()
+
+    async def submit(self, item: Any):
+        """Encola un elemento y espera al commit de su grupo"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        self._arrived.set()
+        await future
+
+    async def _run(self):
+        while True:
+            await self._arrived.wait()
+            self._arrived.clear()
+            if not self._pending:
+                if self._closing:
+                    return
+                continue
+
+            # El plazo corre desde la llegada del elemento más antiguo
+            remaining = self.max_delay_seconds - (time.monotonic() - self._pending[0][2])
+            if len(self._pending) < self.max_rows and remaining > 0 and not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            group = self._pending[:self.max_rows]
+            self._pending = self._pending[self.max_rows:]
+            await self._write(group)
+            if self._pending or self._closing:
+                self._arrived.set()
+                if len(self._pending) >= self.max_rows:
+                    self._full.set()
+
+    async def _write(self, group: List[Tuple[Any, asyncio.Future, float]]):
+        try:
+            await self.flush([item for item, _, _ in group])
+        except Exception as e:
+            if len(group) == 1:
+                self._resolve(group, e)
+                return
+            logger.warning(f"Falló un grupo de {len(group)} escrituras, se reintentan de a una: {str(e)}")
+            for entry in group:
+                await self._write([entry])
+            return
+
+        self._groups += 1
+        self._rows += len(group)
+        self._largest_group = max(self._largest_group, len(group))
+        self._resolve(group)
+
+    @staticmethod
+    def _resolve(group: List[Tuple[Any, asyncio.Future, float]], error: Optional[Exception] = None):
+        for _, future, _ in group:
+            # La petición pudo cancelarse (cliente desconectado) mientras esperaba
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def close(self):
+        """Termina de escribir lo pendiente y detiene la tarea"""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        self._arrived.set()
+        self._full.set()
+        await self._task
+        self._task = None
+        self._closing = False
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "groups": self._groups,
+            "rows": self._rows,
+            "average_group": round(self._rows / self._groups, 1) if self._groups else 0.0,
+            "largest_group": self._largest_group
+        }
@@ -0,0 +1,322 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+from app.config import settings
+from app.models.notification import NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Registro compacto en el orden de NotificationService.LISTING_COLUMNS:
+# (notificationid, title, description, type, date, was_read, coalesced_count)
+HotRecord = tuple
+
+ID, TITLE, DESCRIPTION, TYPE, DATE, WAS_READ, COUNT = range(7)
+
+
+def _key(record: HotRecord) -> Tuple[datetime, str]:
+    """Posición en el orden del listado (date, notificationid)"""
+    return record[DATE], record[ID]
+
+
+def _record_size(record: HotRecord) -> int:
+    """Bytes aproximados: tupla, ID, fecha y los dos textos"""
+    return 330 + len(record[TITLE]) + len(record[DESCRIPTION])
+
+
+# Tamaño aproximado de un usuario sin registros (entrada, deque y clave)
+USER_OVERHEAD = 800
+
+
+class _HotUser:
+    """Notificaciones más recientes de un usuario, de la más nueva a la más antigua"""
+
+    __slots__ = ("records", "has_more", "expires_at", "size")
+
+    def __init__(self, capacity: int, ttl_seconds: float):
+        self.records = deque(maxlen=capacity)
+        # Si el usuario tiene notificaciones más antiguas que las del buffer
+        self.has_more = False
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.size = USER_OVERHEAD
+
+
+class HotNotificationTier:
+    """
+    Buffer circular en memoria con las notificaciones recientes de cada usuario
+
+    Se llena desde la base de datos en el primer listado del usuario y desde
+    ahí se mantiene con cada escritura del servicio (creaciones, marcado
+    como leídas y borrados) en lugar de invalidarse. El buffer es siempre el
+    tramo más reciente y contiguo de las notificaciones del usuario, así que
+    cualquier página que caiga completa dentro de él se sirve sin consultar
+    la base de datos. Ante un cambio que no se puede reflejar con certeza se
+    descarta el usuario y se vuelve a llenar en la siguiente lectura; lo
+    mismo si reflejar la escritura falla, porque la escritura ya quedó
+    confirmada en la base de datos.
+
+    Las entradas expiran tras `ttl_seconds` (escrituras de otras instancias
+    no llegan a este proceso) y los usuarios menos usados se desalojan
+    cuando el tamaño estimado supera `max_bytes`. Como en el caché de
+    listados, una generación por usuario evita guardar un llenado leído
+    antes de una escritura concurrente.
+    """
+
+    GENERATION_STRIPES = 4096
+
+    def __init__(self, enabled: bool, capacity: int, ttl_seconds: float, max_bytes: int):
+        self.enabled = enabled
+        self.capacity = max(capacity, 1)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._generations = [0] * self.GENERATION_STRIPES
+        self._users = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, userid: str) -> int:
+        """Generación actual del usuario; se toma antes de leer de la DB"""
+        with self._lock:
+            return self._generations[self._stripe(userid)]
+
+    def fill(self, userid: str, records: Iterable[HotRecord], has_more: bool, generation: int):
+        """Guarda las notificaciones más recientes leídas de la DB (de la más nueva a la más antigua)"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if self._generations[self._stripe(userid)] != generation:
+                return
+            if userid in self._users:
+                self._remove(userid)
+
+            user = _HotUser(self.capacity, self.ttl_seconds)
+            for record in islice(records, self.capacity):
+                user.records.append(tuple(record))
+                user.size += _record_size(user.records[-1])
+            user.has_more = has_more
+            self._users[userid] = user
+            self._size += user.size
+            self._evict()
+
+    def page(
+        self,
+        userid: str,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> Optional[Tuple[List[HotRecord], bool]]:
+        """
+        Página de `limit` registros posteriores a `after` (o desde el inicio)
+
+        Devuelve (registros, hay_más) o None si la página no cae completa
+        dentro del buffer y hay que consultar la base de datos.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            user = self._get(userid)
+            if user is None:
+                self.misses += 1
+                return None
+
+            records = user.records
+            start = 0
+            if after is not None:
+                if user.has_more and (not records or after < _key(records[-1])):
+                    self.misses += 1
+                    return None
+                while start < len(records) and _key(records[start]) >= after:
+                    start += 1
+
+            page = list(islice(records, start, start + limit))
+            if len(page) < limit and user.has_more:
+                self.misses += 1
+                return None
+
+            self._users.move_to_end(userid)
+            self.hits += 1
+            return page, user.has_more or start + limit < len(records)
+
+    def add(self, userid: str, record: HotRecord, replaces_older: bool = False):
+        """
+        Agrega (o reemplaza por ID) una notificación recién escrita
+
+        `replaces_older` indica que la escritura actualizó una notificación
+        existente (fusión), que puede haber estado fuera del buffer.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._bump(userid)
+            user = self._get(userid)
+            if user is None:
+                return
+
+            with self._mirroring(userid, user):
+                before = user.size
+                keep = self._insert(user, record, replaces_older)
+                self._size += user.size - before
+                if not keep:
+                    self._remove(userid)
+            self._evict()
+
+    @staticmethod
+    def _insert(user: _HotUser, record: HotRecord, replaces_older: bool) -> bool:
+        """Ubica el registro en orden; False si el buffer dejó de ser confiable"""
+        records = user.records
+        index = next((i for i, r in enumerate(records) if r[ID] == record[ID]), None)
+        if index is not None:
+            user.size -= _record_size(records[index])
+            del records[index]
+        elif replaces_older and user.has_more:
+            # Salió del tramo no cacheado: no se sabe si quedan notificaciones más viejas
+            return False
+
+        key = _key(record)
+        position = 0
+        while position < len(records) and _key(records[position]) > key:
+            position += 1
+
+        if position == len(records) and (user.has_more or len(records) == records.maxlen):
+            # Más antigua que todo el buffer: queda en el tramo no cacheado
+            user.has_more = True
+            return True
+
+        if len(records) == records.maxlen:
+            user.size -= _record_size(records.pop())
+            user.has_more = True
+        records.insert(position, record)
+        user.size += _record_size(record)
+        return True
+
+    def mark_read(
+        self,
+        userid: str,
+        notificationids: Optional[Iterable[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ):
+        """Refleja un marcado como leídas con las mismas condiciones que el UPDATE"""
+        if not self.enabled:
+            return
+
+        ids = set(notificationids) if notificationids else None
+        with self._lock:
+            self._bump(userid)
+            user = self._get(userid)
+            if user is None:
+                return
+
+            with self._mirroring(userid, user):
+                for index, record in enumerate(user.records):
+                    if record[WAS_READ]:
+                        continue
+                    if ids is not None and record[ID] not in ids:
+                        continue
+                    if until is not None and record[DATE] > until:
+                        continue
+                    if type is not None and record[TYPE] != type:
+                        continue
+                    user.records[index] = record[:WAS_READ] + (True,) + record[WAS_READ + 1:]
+
+    def remove(self, userid: str, notificationids: Iterable[str]):
+        """Quita notificaciones borradas; el buffer sigue siendo el tramo más reciente"""
+        if not self.enabled:
+            return
+
+        ids = set(notificationids)
+        with self._lock:
+            self._bump(userid)
+            user = self._get(userid)
+            if user is None or not ids:
+                return
+
+            with self._mirroring(userid, user):
+                kept = [record for record in user.records if record[ID] not in ids]
+                if user.has_more and len(user.records) - len(kept) < len(ids):
+                    # Se borraron notificaciones del tramo no cacheado: puede que ya no quede ninguna
+                    self._remove(userid)
+                elif len(kept) != len(user.records):
+                    user.records = deque(kept, maxlen=self.capacity)
+                    size = USER_OVERHEAD + sum(_record_size(record) for record in kept)
+                    self._size += size - user.size
+                    user.size = size
+
+    def invalidate(self, userid: str):
+        """Descarta el buffer del usuario (cambios que no se pueden reflejar)"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._bump(userid)
+            if userid in self._users:
+                self._remove(userid)
+
+    def clear(self):
+        """Descarta todos los buffers (cambios de otras instancias que no se recibieron)"""
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self._users.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "users": len(self._users),
+                "bytes": self._size
+            }
+
+    def _get(self, userid: str) -> Optional[_HotUser]:
+        user = self._users.get(userid)
+        if user is not None and user.expires_at < time.monotonic():
+            self._remove(userid)
+            return None
+        return user
+
+    @contextmanager
+    def _mirroring(self, userid: str, user: _HotUser):
+        """Refleja una escritura en el buffer; si falla, descarta el usuario en vez de propagar el error"""
+        size = user.size
+        try:
+            yield
+        except Exception as e:
+            logger.warning(f"No se pudo reflejar la escritura en el buffer de {userid}, se descarta: {str(e)}")
+            if self._users.get(userid) is user:
+                user.size = size
+                self._remove(userid)
+
+    def _stripe(self, userid: str) -> int:
+        return hash(userid) % self.GENERATION_STRIPES
+
+    def _bump(self, userid: str):
+        self._generations[self._stripe(userid)] += 1
+
+    def _remove(self, userid: str):
+        user = self._users.pop(userid)
+        self._size -= user.size
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._users:
+            self._remove(next(iter(self._users)))
+            self.evictions += 1
+
+
+hot_notifications = HotNotificationTier(
+    enabled=settings.NOTIFICATIONS_HOT_TIER_ENABLED,
+    capacity=settings.NOTIFICATIONS_HOT_TIER_SIZE,
+    ttl_seconds=settings.NOTIFICATIONS_HOT_TIER_TTL_SECONDS,
+    max_bytes=settings.NOTIFICATIONS_HOT_TIER_MAX_BYTES
+)
@@ -0,0 +1,201 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+from app.config import settings
+
+
+class NotificationCacheBackend(ABC):
+    """
+    Interfaz del caché de listados de notificaciones por usuario
+
+    Cada usuario tiene un grupo de páginas (`page_key`) que se invalida
+    completo tras cualquier escritura. La generación evita guardar una
+    página leída antes de una invalidación concurrente. Un backend
+    compatible con Redis puede mapear el grupo a un hash y la generación
+    a un contador INCR.
+    """
+
+    @abstractmethod
+    def generation(self, userid: str) -> int:
+        """Generación actual del usuario; se toma antes de leer de la DB"""
+
+    @abstractmethod
+    def get(self, userid: str, page_key: str) -> Optional[Any]:
+        """Devuelve la página cacheada o None"""
+
+    @abstractmethod
+    def set(self, userid: str, page_key: str, value: Any, generation: int):
+        """Guarda una página si el usuario no fue invalidado desde `generation`"""
+
+    @abstractmethod
+    def invalidate(self, userid: str):
+        """Descarta todas las páginas del usuario"""
+
+    @abstractmethod
+    def clear(self):
+        """Descarta las páginas de todos los usuarios"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Contadores de aciertos, fallos y desalojos"""
+
+
+class NullCacheBackend(NotificationCacheBackend):
+    """Backend sin caché (NOTIFICATIONS_CACHE_ENABLED=false)"""
+
+    def generation(self, userid: str) -> int:
+        return 0
+
+    def get(self, userid: str, page_key: str) -> Optional[Any]:
+        return None
+
+    def set(self, userid: str, page_key: str, value: Any, generation: int):
+        pass
+
+    def invalidate(self, userid: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+class _UserEntry:
+    """Páginas cacheadas de un usuario"""
+
+    __slots__ = ("expires_at", "pages", "size")
+
+    def __init__(self, ttl_seconds: float):
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.pages = {}
+        self.size = 0
+
+
+class InMemoryLRUCacheBackend(NotificationCacheBackend):
+    """
+    Caché en proceso con TTL por usuario y límite de memoria
+
+    Los usuarios menos usados se desalojan cuando el tamaño estimado de
+    las páginas supera `max_bytes`. Las generaciones se guardan en un
+    arreglo fijo indexado por hash del usuario, así invalidar no necesita
+    estado por usuario; una colisión solo omite un llenado del caché.
+    """
+
+    GENERATION_STRIPES = 4096
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._generations = [0] * self.GENERATION_STRIPES
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, userid: str) -> int:
+        with self._lock:
+            return self._generations[self._stripe(userid)]
+
+    def get(self, userid: str, page_key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(userid)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(userid)
+                entry = None
+
+            page = entry.pages.get(page_key) if entry is not None else None
+            if page is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(userid)
+            self.hits += 1
+            return page[0]
+
+    def set(self, userid: str, page_key: str, value: Any, generation: int):
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if self._generations[self._stripe(userid)] != generation:
+                return
+
+            entry = self._entries.get(userid)
+            if entry is None:
+                entry = _UserEntry(self.ttl_seconds)
+                self._entries[userid] = entry
+
+            previous = entry.pages.get(page_key)
+            if previous is not None:
+                entry.size -= previous[1]
+                self._size -= previous[1]
+
+            entry.pages[page_key] = (value, size)
+            entry.size += size
+            self._size += size
+            self._entries.move_to_end(userid)
+
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, userid: str):
+        with self._lock:
+            self._generations[self._stripe(userid)] += 1
+            if userid in self._entries:
+                self._remove(userid)
+
+    def clear(self):
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "users": len(self._entries),
+                "bytes": self._size
+            }
+
+    def _stripe(self, userid: str) -> int:
+        return hash(userid) % self.GENERATION_STRIPES
+
+    def _remove(self, userid: str):
+        entry = self._entries.pop(userid)
+        self._size -= entry.size
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Tamaño aproximado de una página (notifications, next_cursor)"""
+        notifications, next_cursor = value
+        size = 64 + len(next_cursor or "")
+        for n in notifications:
+            size += 160 + len(n["title"]) + len(n["description"])
+        return size
+
+
+def create_cache_backend() -> NotificationCacheBackend:
+    """Crea el backend configurado"""
+    if not settings.NOTIFICATIONS_CACHE_ENABLED:
+        return NullCacheBackend()
+
+    return InMemoryLRUCacheBackend(
+        ttl_seconds=settings.NOTIFICATIONS_CACHE_TTL_SECONDS,
+        max_bytes=settings.NOTIFICATIONS_CACHE_MAX_BYTES
+    )
+
+
+notification_cache = create_cache_backend()
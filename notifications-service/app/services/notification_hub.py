@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marca que se deja en la cola cuando la suscripción se descarta
+_DROPPED = object()
+
+
+class SubscriptionDropped(Exception):
+    """El cliente no consumió a tiempo y su cola se llenó"""
+
+
+class Subscription:
+    """Conexión en vivo de un usuario con su cola de envío acotada"""
+
+    def __init__(self, userid: str, queue_size: int):
+        self.userid = userid
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = False
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """
+        Espera la siguiente notificación
+
+        Devuelve None si pasa `timeout` sin mensajes (momento de enviar un
+        heartbeat) y lanza SubscriptionDropped si la cola se desbordó.
+        """
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        if item is _DROPPED:
+            raise SubscriptionDropped()
+        return item
+
+    def _put(self, payload: dict):
+        """Encola un mensaje; se ejecuta siempre en el loop de la conexión"""
+        if self.dropped:
+            return
+
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta en lugar de acumular sin límite.
+            # Al reconectar con `since` recupera lo perdido desde la DB.
+            self._drop()
+            logger.warning(f"Conexión en vivo descartada por cola llena: {self.userid}")
+
+    def _drop(self):
+        """Vacía la cola y avisa a la conexión que debe reconectar"""
+        if self.dropped:
+            return
+
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_DROPPED)
+
+
+class NotificationHub:
+    """
+    Hub en proceso de suscripciones en vivo por usuario
+
+    `publish` puede llamarse desde cualquier hilo (rutas HTTP o el
+    consumidor de Kafka); la entrega se agenda en el loop de cada conexión.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, userid: str) -> Subscription:
+        """Registra una conexión en vivo; debe llamarse dentro del event loop"""
+        subscription = Subscription(userid, self.queue_size)
+        with self._lock:
+            self._subscriptions[userid].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Elimina una conexión en vivo"""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.userid)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.userid]
+
+    def has_subscribers(self, userid: str) -> bool:
+        """Indica si el usuario tiene conexiones en vivo (evita serializar en vano)"""
+        return userid in self._subscriptions
+
+    def publish(self, userid: str, payload: dict):
+        """Envía una notificación serializada a las conexiones del usuario"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(userid, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, payload)
+            except RuntimeError:
+                # El loop de la conexión ya se cerró
+                self.unsubscribe(subscription)
+
+    def resync(self, userid: Optional[str] = None):
+        """
+        Descarta las conexiones del usuario (o todas) cuando pudieron perder
+        notificaciones; el cliente reconecta con `since` y las recupera
+        """
+        with self._lock:
+            if userid is None:
+                subscriptions = [s for group in self._subscriptions.values() for s in group]
+            else:
+                subscriptions = list(self._subscriptions.get(userid, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._drop)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def connection_count(self) -> int:
+        """Cantidad de conexiones en vivo"""
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+notification_hub = NotificationHub(queue_size=settings.STREAM_QUEUE_SIZE)
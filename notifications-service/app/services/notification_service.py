@@ -1,52 +1,656 @@
+import base64
+import hashlib
+import json
 import logging
 import uuid
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import String, and_, bindparam, column, delete, func, insert, literal, literal_column, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.notification import Notification, NotificationType
-from app.schemas.notification import NotificationCreate, NotificationResponse, KafkaNotificationEvent
-from app.database import get_database
+from starlette.concurrency import run_in_threadpool
+from app.models.notification import Notification, NotificationKafkaEvent, NotificationRecipient, NotificationType, SEARCH_CONFIG
+from app.schemas.notification import (
+    NotificationCreate,
+    NotificationTemplate,
+    NotificationBatchCreate,
+    NotificationFilters,
+    KafkaNotificationEvent
+)
+from app.database import async_session_scope, read_router
+from app.services.unread_count_cache import unread_count_cache
+from app.services.notification_hub import notification_hub
+from app.services.notification_cache import notification_cache
+from app.services.hot_notifications import hot_notifications
+from app.services.notification_versions import notification_versions
+from app.services.event_dedup import recently_seen_events
+from app.services.group_commit import GroupCommitWriter
+from app.services.change_feed import change_feed, UserChanges, CREATE, READ, DELETE
+from app.kafka.failures import parse_event
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Espacio de nombres de los IDs derivados de eventos de Kafka
+KAFKA_EVENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "notifications-service/kafka-events")
+
 
 class NotificationService:
     """Servicio de negocio para notificaciones"""
     
+    # Columnas escritas con COPY en las inserciones masivas
+    COPY_COLUMNS = (
+        "notificationid", "userid", "type", "title", "description", "was_read",
+        "date", "related_project_id", "related_user_id", "related_task_id", "coalesced_count"
+    )
+    
+    # Columnas leídas para los listados (tuplas en lugar de objetos ORM)
+    LISTING_COLUMNS = (
+        Notification.notificationid, Notification.title, Notification.description,
+        Notification.type, Notification.date, Notification.was_read, Notification.coalesced_count
+    )
+    
     def __init__(self, db: Session = None):
         self.db = db
+        self.group_commit = None
+        if settings.NOTIFICATIONS_GROUP_COMMIT_ENABLED:
+            self.group_commit = GroupCommitWriter(
+                self._commit_group,
+                max_rows=settings.NOTIFICATIONS_GROUP_COMMIT_MAX_ROWS,
+                max_delay_seconds=settings.NOTIFICATIONS_GROUP_COMMIT_MAX_DELAY_MS / 1000
+            )
+    
+    # Tabla temporal para COPY + INSERT ... ON CONFLICT DO NOTHING
+    STAGING_TABLE = "notifications_staging"
+    
+    @staticmethod
+    def _build_row(notification_create: NotificationCreate, notificationid: Optional[str] = None) -> dict:
+        """Construye los valores de una fila nueva de notificación"""
+        return {
+            "notificationid": notificationid or str(uuid.uuid4()),
+            "userid": notification_create.userid,
+            "type": notification_create.type,
+            "title": notification_create.title,
+            "description": notification_create.description,
+            "was_read": False,
+            "date": datetime.utcnow(),
+            "related_project_id": notification_create.related_project_id,
+            "related_user_id": notification_create.related_user_id,
+            "related_task_id": notification_create.related_task_id,
+            "coalesced_count": 1
+        }
+    
+    @staticmethod
+    def _build_template_rows(template: NotificationTemplate, userids: List[str]) -> List[dict]:
+        """Construye una fila por destinatario a partir de una plantilla común"""
+        base = {
+            "type": template.type,
+            "title": template.title,
+            "description": template.description,
+            "was_read": False,
+            "date": datetime.utcnow(),
+            "related_project_id": template.related_project_id,
+            "related_user_id": template.related_user_id,
+            "related_task_id": template.related_task_id,
+            "coalesced_count": 1
+        }
+        return [{**base, "notificationid": str(uuid.uuid4()), "userid": userid} for userid in userids]
+    
+    @staticmethod
+    def serialize(notification: Notification) -> dict:
+        """Convierte una notificación al formato de respuesta de la API"""
+        return {
+            "notificationid": notification.notificationid,
+            "title": notification.title,
+            "description": notification.description,
+            "type": notification.type.value if hasattr(notification.type, 'value') else notification.type,
+            "date": notification.date.isoformat(),
+            "wasRead": notification.was_read,
+            "count": notification.coalesced_count
+        }
+    
+    @staticmethod
+    def serialize_columns(row) -> dict:
+        """Convierte una fila de LISTING_COLUMNS al formato de respuesta de la API"""
+        notificationid, title, description, notification_type, date, was_read, count = row
+        return {
+            "notificationid": notificationid,
+            "title": title,
+            "description": description,
+            "type": notification_type.value,
+            "date": date.isoformat(),
+            "wasRead": was_read,
+            "count": count
+        }
+    
+    @staticmethod
+    def serialize_row(row: dict) -> dict:
+        """Convierte una fila recién construida al formato de respuesta de la API"""
+        return {
+            "notificationid": row["notificationid"],
+            "title": row["title"],
+            "description": row["description"],
+            "type": row["type"].value if hasattr(row["type"], 'value') else row["type"],
+            "date": row["date"].isoformat(),
+            "wasRead": row["was_read"],
+            "count": row["coalesced_count"]
+        }
+    
+    @staticmethod
+    def _invalidate(userid: str):
+        """Invalida los cachés del usuario tras una escritura y fija sus lecturas al primario"""
+        unread_count_cache.invalidate(userid)
+        notification_cache.invalidate(userid)
+        notification_versions.invalidate(userid)
+        read_router.note_write(userid)
+    
+    @staticmethod
+    def _hot_record(row: dict) -> tuple:
+        """Registro del hot tier (orden de LISTING_COLUMNS) a partir de una fila escrita"""
+        return (
+            row["notificationid"], row["title"], row["description"], NotificationType(row["type"]),
+            row["date"], row["was_read"], row["coalesced_count"]
+        )
+    
+    def _after_create(self, rows: List[dict], merged_ids: frozenset = frozenset()):
+        """Invalida cachés, actualiza el hot tier y empuja las filas nuevas o fusionadas a las conexiones en vivo"""
+        for userid in {row["userid"] for row in rows}:
+            self._invalidate(userid)
+        for row in rows:
+            hot_notifications.add(row["userid"], self._hot_record(row), row["notificationid"] in merged_ids)
+        for row in rows:
+            if notification_hub.has_subscribers(row["userid"]):
+                notification_hub.publish(row["userid"], self.serialize_row(row))
+    
+    @staticmethod
+    def _created_changes(rows: List[dict]) -> list:
+        """Cambios del feed para filas insertadas o fusionadas"""
+        return [(row["userid"], CREATE, row["notificationid"]) for row in rows]
+    
+    @staticmethod
+    def _read_changes(userid: str, notificationids=None, until=None, type=None) -> list:
+        """Cambios del feed de un marcado masivo; con condiciones no se sabe qué IDs cambiaron"""
+        if notificationids and until is None and type is None:
+            return [(userid, READ, notificationid) for notificationid in notificationids]
+        return [(userid, READ, None)]
+    
+    def apply_remote_changes(self, changes: Dict[str, UserChanges]):
+        """
+        Refleja en el estado local las escrituras de otras instancias
+        
+        Se invoca desde el listener del feed de cambios. Las notificaciones
+        creadas se leen del primario solo para los usuarios con conexiones
+        en vivo en esta instancia.
+        """
+        push = []
+        for userid, change in changes.items():
+            self._invalidate(userid)
+            if change.reset or change.created:
+                hot_notifications.invalidate(userid)
+            else:
+                if change.read:
+                    hot_notifications.mark_read(userid, change.read)
+                if change.deleted:
+                    hot_notifications.remove(userid, change.deleted)
+            
+            if notification_hub.has_subscribers(userid):
+                if change.created is None:
+                    # Demasiadas para empujar una a una: el cliente las recupera con `since`
+                    notification_hub.resync(userid)
+                else:
+                    push.extend(change.created)
+        
+        from app.database import SessionLocal
+        if not push or SessionLocal is None:
+            return
+        
+        with SessionLocal() as db:
+            notifications = db.execute(
+                select(Notification)
+                .where(Notification.notificationid.in_(push))
+                .order_by(Notification.date.asc(), Notification.notificationid.asc())
+            ).scalars()
+            for notification in notifications:
+                notification_hub.publish(notification.userid, self.serialize(notification))
+    
+    @staticmethod
+    def resync_local_state():
+        """Descarta el estado derivado de todos los usuarios tras un hueco en el feed de cambios"""
+        unread_count_cache.clear()
+        notification_cache.clear()
+        notification_versions.clear()
+        hot_notifications.clear()
+        notification_hub.resync()
+    
+    @staticmethod
+    def coalesce_policy() -> Dict[NotificationType, timedelta]:
+        """Ventana de fusión por tipo según NOTIFICATIONS_COALESCE_POLICY"""
+        policy = {}
+        for item in settings.NOTIFICATIONS_COALESCE_POLICY.split(","):
+            if not item.strip():
+                continue
+            name, seconds = item.split(":")
+            policy[NotificationType(name.strip())] = timedelta(seconds=float(seconds))
+        return policy
+    
+    @staticmethod
+    def _coalesce_key(row: dict) -> tuple:
+        return (row["userid"], NotificationType(row["type"]), row["related_project_id"])
+    
+    def _coalesce(self, rows: List[dict], db: Session) -> Tuple[List[dict], List[dict]]:
+        """
+        Fusiona filas similares antes de escribirlas
+        
+        Las filas de un tipo con política y la misma clave (userid, type,
+        related_project_id) se agrupan en una sola; si el usuario ya tiene
+        una notificación no leída con esa clave dentro de la ventana, se
+        actualiza (contador, fecha y texto más recientes) en lugar de
+        insertar. Devuelve (filas a insertar, filas fusionadas en
+        notificaciones existentes). Debe ejecutarse dentro de la transacción
+        de la escritura.
+        """
+        policy = self.coalesce_policy()
+        if not policy:
+            return rows, []
+        
+        to_insert = []
+        groups = {}
+        for row in rows:
+            if NotificationType(row["type"]) not in policy:
+                to_insert.append(row)
+                continue
+            
+            key = self._coalesce_key(row)
+            current = groups.get(key)
+            if current is None:
+                groups[key] = dict(row)
+            else:
+                # Se conserva el ID del primero y el contenido del más reciente
+                groups[key] = {
+                    **row,
+                    "notificationid": current["notificationid"],
+                    "coalesced_count": current["coalesced_count"] + row["coalesced_count"]
+                }
+        
+        if not groups:
+            return to_insert, []
+        
+        targets = self._coalesce_targets(groups, policy, db)
+        merged = []
+        for key, row in groups.items():
+            target = targets.get(key)
+            count = self._merge_into(target, row, db) if target else None
+            if count is None:
+                to_insert.append(row)
+            else:
+                merged.append({**row, "notificationid": target, "coalesced_count": count})
+        
+        return to_insert, merged
+    
+    def _coalesce_targets(self, groups: dict, policy: Dict[NotificationType, timedelta], db: Session) -> dict:
+        """Notificación no leída más reciente dentro de la ventana para cada clave"""
+        now = datetime.utcnow()
+        stmt = (
+            select(
+                Notification.notificationid, Notification.userid, Notification.type,
+                Notification.related_project_id, Notification.date
+            )
+            .where(
+                Notification.userid.in_({key[0] for key in groups}),
+                Notification.type.in_({key[1] for key in groups}),
+                Notification.was_read == False,
+                Notification.date >= now - max(policy.values())
+            )
+            .order_by(Notification.date.desc())
+        )
+        
+        targets = {}
+        for notificationid, userid, notification_type, related_project_id, date in db.execute(stmt):
+            key = (userid, notification_type, related_project_id)
+            if key in groups and key not in targets and date >= now - policy[notification_type]:
+                targets[key] = notificationid
+        return targets
+    
+    @staticmethod
+    def _merge_into(notificationid: str, row: dict, db: Session) -> Optional[int]:
+        """Suma la fila a una notificación existente; None si ya fue leída o borrada"""
+        result = db.execute(
+            update(Notification)
+            .where(Notification.notificationid == notificationid, Notification.was_read == False)
+            .values(
+                coalesced_count=Notification.coalesced_count + row["coalesced_count"],
+                date=row["date"],
+                title=row["title"],
+                description=row["description"],
+                related_user_id=row["related_user_id"],
+                related_task_id=row["related_task_id"]
+            )
+            .returning(Notification.coalesced_count)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar()
     
     def create_notification(self, notification_create: NotificationCreate, db: Session) -> Notification:
         """Crea una nueva notificación"""
-        notification_id = str(uuid.uuid4())
-        
-        notification = Notification(
-            notificationid=notification_id,
-            userid=notification_create.userid,
-            type=notification_create.type,
-            title=notification_create.title,
-            description=notification_create.description,
-            was_read=False,
-            date=datetime.utcnow(),
-            related_project_id=notification_create.related_project_id,
-            related_user_id=notification_create.related_user_id,
-            related_task_id=notification_create.related_task_id
-        )
+        row = self._build_row(notification_create)
+        if NotificationType(row["type"]) in self.coalesce_policy():
+            return Notification(**self._store_rows([row], db)[0])
+        
+        notification = Notification(**row)
+        notification_id = notification.notificationid
         
         db.add(notification)
+        notification_versions.bump([row["userid"]], db)
+        change_feed.emit(db, [(row["userid"], CREATE, notification_id)])
         db.commit()
         db.refresh(notification)
-        logger.info(f"Notificación creada: {notification_id}")
+        self._after_create([row])
+        logger.debug(f"Notificación creada: {notification_id}")
         
         return notification
     
-    def get_user_notifications(self, userid: str, db: Session) -> List[Notification]:
-        """Obtiene las notificaciones de un usuario"""
-        notifications = db.query(Notification).filter(
-            Notification.userid == userid
-        ).order_by(Notification.date.desc()).all()
+    @classmethod
+    def _copy_statement(cls) -> str:
+        return f"COPY {Notification.__tablename__} ({', '.join(cls.COPY_COLUMNS)}) FROM STDIN"
+    
+    @classmethod
+    def _copy_record(cls, row: dict) -> list:
+        """Valores de una fila para COPY (el Enum de SQLAlchemy guarda el nombre del miembro)"""
+        record = [row[column] for column in cls.COPY_COLUMNS]
+        record[2] = NotificationType(row["type"]).name
+        return record
+    
+    def _write_rows(self, rows: List[dict], db: Session):
+        """
+        Escribe filas nuevas dentro de la transacción actual
+        
+        En PostgreSQL usa COPY, que evita compilar y adaptar una sentencia
+        con miles de parámetros; en otros motores, un executemany.
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(insert(Notification), rows)
+            return
         
-        return notifications
+        driver_connection = db.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(self._copy_statement()) as copy:
+                for row in rows:
+                    copy.write_row(self._copy_record(row))
+    
+    def _write_rows_skip_duplicates(self, rows: List[dict], db: Session) -> List[str]:
+        """
+        Escribe filas nuevas omitiendo las que ya existen; devuelve los IDs insertados
+        
+        COPY no admite ON CONFLICT, así que en PostgreSQL las filas se copian
+        a una tabla temporal y se pasan con INSERT ... SELECT ... ON CONFLICT
+        DO NOTHING, conservando la velocidad de COPY.
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            ids = [row["notificationid"] for row in rows]
+            existing = set(db.execute(
+                select(Notification.notificationid).where(Notification.notificationid.in_(ids))
+            ).scalars())
+            new_rows = [row for row in rows if row["notificationid"] not in existing]
+            if new_rows:
+                db.execute(insert(Notification), new_rows)
+            return [row["notificationid"] for row in new_rows]
+        
+        # En cada llamada: si la transacción que creó la tabla se revierte, la tabla
+        # desaparece y un indicador guardado en la conexión del pool quedaría desfasado
+        connection = db.connection()
+        connection.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.STAGING_TABLE} "
+            f"(LIKE {Notification.__tablename__} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+        
+        columns = ", ".join(self.COPY_COLUMNS)
+        driver_connection = connection.connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY {self.STAGING_TABLE} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(self._copy_record(row))
+        
+        result = connection.execute(text(
+            f"INSERT INTO {Notification.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM {self.STAGING_TABLE} "
+            f"ON CONFLICT DO NOTHING RETURNING notificationid"
+        ))
+        return list(result.scalars())
+    
+    @staticmethod
+    def _claim_events(rows: List[dict], db: Session) -> List[dict]:
+        """
+        Registra los eventos de las filas y devuelve las que no se habían procesado
+        
+        La clave de notification_kafka_events es solo el ID derivado del
+        evento: en la tabla particionada la clave primaria incluye la fecha
+        de inserción y ON CONFLICT no reconocería una re-entrega.
+        """
+        table = NotificationKafkaEvent
+        ids = [row["notificationid"] for row in rows]
+        now = datetime.utcnow()
+        if db.get_bind().dialect.name == "sqlite":
+            stmt = sqlite_insert(table).values([{"notificationid": i, "processed_at": now} for i in ids])
+        else:
+            events = select(func.unnest(bindparam("ids", ids, type_=ARRAY(String))), literal(now))
+            stmt = postgresql_insert(table).from_select(["notificationid", "processed_at"], events)
+        
+        claimed = set(db.execute(
+            stmt.on_conflict_do_nothing(index_elements=[table.notificationid]).returning(table.notificationid)
+        ).scalars())
+        return [row for row in rows if row["notificationid"] in claimed]
+    
+    async def _write_rows_async(self, rows: List[dict], db: AsyncSession):
+        """Escribe filas nuevas dentro de la transacción actual (async)"""
+        if db.get_bind().dialect.name != "postgresql":
+            await db.execute(insert(Notification), rows)
+            return
+        
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        async with raw_connection.driver_connection.cursor() as cursor:
+            async with cursor.copy(self._copy_statement()) as copy:
+                for row in rows:
+                    await copy.write_row(self._copy_record(row))
+    
+    def create_notifications_bulk(self, notifications_create: List[NotificationCreate], db: Session) -> List[str]:
+        """
+        Crea varias notificaciones con una escritura masiva
+        
+        Todas las filas se escriben en una sola transacción; devuelve los IDs creados.
+        """
+        return self.insert_rows([self._build_row(n) for n in notifications_create], db)
+    
+    def insert_rows(self, rows: List[dict], db: Session, skip_duplicates: bool = False) -> List[str]:
+        """
+        Inserta filas ya construidas en una sola transacción y devuelve sus IDs
+        
+        Con `skip_duplicates` (eventos de Kafka) las filas cuyo evento ya se
+        procesó o cuyo ID ya existe se omiten en lugar de fallar, y solo se
+        devuelven los IDs realmente insertados. Las
+        filas fusionadas en una notificación existente devuelven el ID de esa
+        notificación.
+        """
+        return [row["notificationid"] for row in self._store_rows(rows, db, skip_duplicates)]
+    
+    def _store_rows(self, rows: List[dict], db: Session, skip_duplicates: bool = False) -> List[dict]:
+        """Fusiona, inserta y confirma; devuelve las filas escritas"""
+        if not rows:
+            return []
+        
+        if skip_duplicates:
+            # Antes de fusionar: un evento fusionado no deja una fila con su ID,
+            # solo su registro, y una re-entrega volvería a sumarse al contador
+            rows = self._claim_events(rows, db)
+        
+        rows, merged = self._coalesce(rows, db)
+        if rows and skip_duplicates:
+            # ON CONFLICT además cubre los eventos escritos antes de la tabla de eventos
+            inserted_ids = set(self._write_rows_skip_duplicates(rows, db))
+            rows = [row for row in rows if row["notificationid"] in inserted_ids]
+        elif rows:
+            self._write_rows(rows, db)
+        
+        rows = rows + merged
+        if rows:
+            notification_versions.bump((row["userid"] for row in rows), db)
+            change_feed.emit(db, self._created_changes(rows))
+        db.commit()
+        self._after_create(rows, frozenset(row["notificationid"] for row in merged))
+        logger.info(f"Notificaciones creadas en lote: {len(rows)}")
+        
+        return rows
+    
+    def get_user_notifications(
+        self,
+        userid: str,
+        db: Session,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        columns: Optional[tuple] = None,
+        filters: Optional[NotificationFilters] = None
+    ) -> List[Notification]:
+        """
+        Obtiene las notificaciones de un usuario, más recientes primero
+        
+        Con `columns` devuelve tuplas con esas columnas en lugar de objetos ORM.
+        """
+        stmt = self._notifications_statement(userid, limit, cursor, columns, filters, db.get_bind().dialect.name)
+        result = db.execute(stmt)
+        return list(result) if columns else list(result.scalars())
+    
+    def _notifications_statement(
+        self,
+        userid: str,
+        limit: Optional[int],
+        cursor: Optional[str],
+        columns: Optional[tuple] = None,
+        filters: Optional[NotificationFilters] = None,
+        dialect_name: str = "postgresql"
+    ):
+        """Construye la consulta keyset de notificaciones de un usuario"""
+        stmt = select(*columns) if columns else select(Notification)
+        stmt = stmt.where(Notification.userid == userid)
+        if filters is not None:
+            stmt = stmt.where(*self._filter_conditions(filters, dialect_name))
+        
+        if cursor:
+            cursor_date, cursor_id = self.decode_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(Notification.date, Notification.notificationid) < (cursor_date, cursor_id)
+            )
+        
+        stmt = stmt.order_by(Notification.date.desc(), Notification.notificationid.desc())
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        
+        return stmt
+    
+    @staticmethod
+    def _filter_conditions(filters: NotificationFilters, dialect_name: str) -> list:
+        """
+        Condiciones WHERE de los filtros de listado
+        
+        Los filtros de un solo valor tienen un índice (userid, filtro, date,
+        notificationid) que entrega la página ya ordenada; el rango de fechas
+        usa el índice de la paginación. La búsqueda `q` usa la columna
+        generada search_vector (índice GIN) en PostgreSQL; en otros motores
+        cada palabra debe aparecer en el título o la descripción.
+        """
+        conditions = []
+        if filters.types:
+            types = [NotificationType(t.value) for t in filters.types]
+            conditions.append(Notification.type == types[0] if len(types) == 1 else Notification.type.in_(types))
+        if filters.unread:
+            conditions.append(Notification.was_read == False)
+        if filters.related_project_id is not None:
+            conditions.append(Notification.related_project_id == filters.related_project_id)
+        if filters.related_task_id is not None:
+            conditions.append(Notification.related_task_id == filters.related_task_id)
+        if filters.since is not None:
+            conditions.append(Notification.date >= filters.since)
+        if filters.until is not None:
+            conditions.append(Notification.date <= filters.until)
+        
+        if filters.q:
+            if dialect_name == "postgresql":
+                # websearch_to_tsquery acepta frases, OR y -exclusión sin errores de sintaxis
+                query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), filters.q)
+                conditions.append(column("search_vector").op("@@")(query))
+            else:
+                for word in filters.q.split():
+                    pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    conditions.append(or_(
+                        Notification.title.ilike(pattern, escape="\\"),
+                        Notification.description.ilike(pattern, escape="\\")
+                    ))
+        
+        return conditions
+    
+    def get_user_notifications_page(
+        self,
+        userid: str,
+        db: Session,
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[tuple] = None,
+        filters: Optional[NotificationFilters] = None
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """
+        Obtiene una página de notificaciones con paginación keyset
+        
+        Devuelve las notificaciones y el cursor de la página siguiente
+        (None si no hay más resultados).
+        """
+        notifications = self.get_user_notifications(userid, db, limit + 1, cursor, columns, filters)
+        return self._split_page(notifications, limit)
+    
+    def _split_page(self, notifications: List[Notification], limit: int) -> Tuple[List[Notification], Optional[str]]:
+        """Recorta la fila extra de una página y calcula el cursor siguiente"""
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = self.encode_cursor(notifications[-1].date, notifications[-1].notificationid)
+        
+        return notifications, next_cursor
+    
+    @staticmethod
+    def encode_cursor(date: datetime, notificationid: str) -> str:
+        """Codifica la posición (date, notificationid) como un cursor opaco"""
+        raw = f"{date.isoformat()}|{notificationid}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Decodifica un cursor opaco; lanza ValueError si es inválido"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+            date_str, notificationid = raw.split("|", 1)
+            return datetime.fromisoformat(date_str), notificationid
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    def get_unread_count(self, userid: str, db: Session) -> int:
+        """Obtiene la cantidad de notificaciones no leídas de un usuario"""
+        count = unread_count_cache.get(userid)
+        if count is not None:
+            return count
+        
+        generation = unread_count_cache.generation(userid)
+        count = db.execute(self._unread_count_statement(userid)).scalar()
+        unread_count_cache.set(userid, count, generation)
+        
+        return count
+    
+    @staticmethod
+    def _unread_count_statement(userid: str):
+        """Construye el conteo de no leídas (resuelto por el índice parcial)"""
+        return select(func.count()).select_from(Notification).where(
+            Notification.userid == userid,
+            Notification.was_read == False
+        )
     
     def mark_as_read(self, userid: str, notificationid: str, db: Session) -> Optional[Notification]:
         """Marca una notificación como leída"""
@@ -57,9 +661,13 @@ class NotificationService:
         
         if notification:
             notification.was_read = True
+            notification_versions.bump([userid], db)
+            change_feed.emit(db, [(userid, READ, notificationid)])
             db.commit()
             db.refresh(notification)
-            logger.info(f"Notificación marcada como leída: {notificationid}")
+            self._invalidate(userid)
+            hot_notifications.mark_read(userid, [notificationid])
+            logger.debug(f"Notificación marcada como leída: {notificationid}")
             return notification
         
         return None
@@ -73,37 +681,594 @@ class NotificationService:
         
         if notification:
             db.delete(notification)
+            notification_versions.bump([userid], db)
+            change_feed.emit(db, [(userid, DELETE, notificationid)])
             db.commit()
-            logger.info(f"Notificación eliminada: {notificationid}")
+            self._invalidate(userid)
+            hot_notifications.remove(userid, [notificationid])
+            logger.debug(f"Notificación eliminada: {notificationid}")
+            return True
+        
+        return False
+    
+    @staticmethod
+    def _bulk_conditions(
+        userid: str,
+        notificationids: Optional[List[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ) -> list:
+        """Construye las condiciones WHERE de una operación masiva"""
+        conditions = [Notification.userid == userid]
+        if notificationids:
+            conditions.append(Notification.notificationid.in_(notificationids))
+        if until is not None:
+            conditions.append(Notification.date <= until)
+        if type is not None:
+            conditions.append(Notification.type == type)
+        return conditions
+    
+    def _mark_read_statement(self, userid, notificationids=None, until=None, type=None):
+        """Construye el UPDATE masivo de marcado como leídas"""
+        return (
+            update(Notification)
+            .where(*self._bulk_conditions(userid, notificationids, until, type))
+            .where(Notification.was_read == False)
+            .values(was_read=True)
+            .execution_options(synchronize_session=False)
+        )
+    
+    def _delete_statement(self, userid, notificationids=None, until=None, type=None):
+        """Construye el DELETE masivo que devuelve los IDs eliminados"""
+        return (
+            delete(Notification)
+            .where(*self._bulk_conditions(userid, notificationids, until, type))
+            .returning(Notification.notificationid)
+            .execution_options(synchronize_session=False)
+        )
+    
+    def mark_as_read_bulk(
+        self,
+        userid: str,
+        db: Session,
+        notificationids: Optional[List[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ) -> int:
+        """
+        Marca como leídas varias notificaciones con un único UPDATE
+        
+        Sin `notificationids` aplica a todas las del usuario. Devuelve la
+        cantidad de notificaciones que cambiaron de estado.
+        """
+        stmt = self._mark_read_statement(userid, notificationids, until, type)
+        updated = db.execute(stmt).rowcount
+        if updated:
+            notification_versions.bump([userid], db)
+            change_feed.emit(db, self._read_changes(userid, notificationids, until, type))
+        db.commit()
+        self._invalidate(userid)
+        hot_notifications.mark_read(userid, notificationids, until, type)
+        logger.info(f"Notificaciones marcadas como leídas en lote: {updated}")
+        
+        return updated
+    
+    def delete_notifications_bulk(
+        self,
+        userid: str,
+        db: Session,
+        notificationids: Optional[List[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ) -> List[str]:
+        """
+        Elimina varias notificaciones con un único DELETE ... RETURNING
+        
+        Sin `notificationids` aplica a todas las del usuario. Devuelve los
+        IDs eliminados.
+        """
+        stmt = self._delete_statement(userid, notificationids, until, type)
+        deleted_ids = list(db.execute(stmt).scalars())
+        if deleted_ids:
+            notification_versions.bump([userid], db)
+            change_feed.emit(db, [(userid, DELETE, notificationid) for notificationid in deleted_ids])
+        db.commit()
+        self._invalidate(userid)
+        hot_notifications.remove(userid, deleted_ids)
+        logger.info(f"Notificaciones eliminadas en lote: {len(deleted_ids)}")
+        
+        return deleted_ids
+    
+    # ------------------------------------------------------------------
+    # Variantes async para las rutas HTTP
+    #
+    # Reciben una AsyncSession; si el motor async no está disponible
+    # reciben una Session síncrona y delegan en el método síncrono dentro
+    # del threadpool para no bloquear el event loop.
+    # ------------------------------------------------------------------
+    
+    async def create_notification_async(
+        self,
+        notification_create: NotificationCreate,
+        db: Union[AsyncSession, Session]
+    ) -> Notification:
+        """Crea una nueva notificación (async)"""
+        row = self._build_row(notification_create)
+        coalesced = NotificationType(row["type"]) in self.coalesce_policy()
+        if self.group_commit is not None and not coalesced:
+            # Se escribe junto con las creaciones concurrentes; vuelve tras el commit
+            await self.group_commit.submit(row)
+            return Notification(**row)
+        
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.create_notification, notification_create, db)
+        
+        if coalesced:
+            return Notification(**(await self._store_rows_async([row], db))[0])
+        
+        notification = Notification(**row)
+        db.add(notification)
+        await notification_versions.bump_async([row["userid"]], db)
+        await change_feed.emit_async(db, [(row["userid"], CREATE, row["notificationid"])])
+        await db.commit()
+        self._after_create([row])
+        logger.debug(f"Notificación creada: {notification.notificationid}")
+        
+        return notification
+    
+    async def _commit_group(self, rows: List[dict]):
+        """Escribe un grupo de creaciones concurrentes en una sola transacción"""
+        async with async_session_scope() as db:
+            if not isinstance(db, AsyncSession):
+                await run_in_threadpool(self._store_rows, rows, db)
+            else:
+                await self._store_rows_async(rows, db)
+    
+    async def create_notifications_batch_async(
+        self,
+        batch: NotificationBatchCreate,
+        db: Union[AsyncSession, Session]
+    ) -> List[str]:
+        """
+        Crea un lote de notificaciones (lista explícita o plantilla + userids)
+        
+        Los UUIDs se generan en Python y las filas se escriben con COPY (o
+        executemany fuera de PostgreSQL) en una sola transacción. Devuelve
+        los IDs creados.
+        """
+        if batch.template is not None:
+            rows = self._build_template_rows(batch.template, batch.userids)
+        else:
+            rows = [self._build_row(n) for n in batch.notifications]
+        
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.insert_rows, rows, db)
+        
+        return [row["notificationid"] for row in await self._store_rows_async(rows, db)]
+    
+    async def _store_rows_async(self, rows: List[dict], db: AsyncSession) -> List[dict]:
+        """Fusiona, inserta y confirma; devuelve las filas escritas (async)"""
+        if not rows:
+            return []
+        
+        # La fusión usa sentencias síncronas sobre la misma conexión async
+        rows, merged = await db.run_sync(lambda session: self._coalesce(rows, session))
+        if rows:
+            await self._write_rows_async(rows, db)
+        
+        rows = rows + merged
+        if rows:
+            await notification_versions.bump_async((row["userid"] for row in rows), db)
+            await change_feed.emit_async(db, self._created_changes(rows))
+        await db.commit()
+        self._after_create(rows, frozenset(row["notificationid"] for row in merged))
+        logger.info(f"Notificaciones creadas en lote: {len(rows)}")
+        
+        return rows
+    
+    async def get_user_notifications_page_async(
+        self,
+        userid: str,
+        db: Union[AsyncSession, Session],
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[tuple] = None,
+        filters: Optional[NotificationFilters] = None
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """Obtiene una página de notificaciones con paginación keyset (async)"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(
+                self.get_user_notifications_page, userid, db, limit, cursor, columns, filters
+            )
+        
+        stmt = self._notifications_statement(userid, limit + 1, cursor, columns, filters, db.get_bind().dialect.name)
+        result = await db.execute(stmt)
+        return self._split_page(list(result) if columns else list(result.scalars()), limit)
+    
+    async def get_user_notifications_cached_async(
+        self,
+        userid: str,
+        db: Union[AsyncSession, Session],
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[NotificationFilters] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Obtiene una página ya serializada pasando por el caché del usuario
+        
+        Devuelve (notificaciones, next_cursor). Las listas cacheadas se
+        comparten entre peticiones y no deben modificarse. Las búsquedas de
+        texto no se cachean: casi nunca se repiten y desplazarían las páginas
+        que sí se sondean. Sin filtros, las páginas que caen dentro del hot
+        tier se sirven desde memoria.
+        """
+        if filters is not None and filters.is_empty():
+            filters = None
+        
+        if filters is None and hot_notifications.enabled:
+            page = await self._hot_page(userid, db, limit, cursor)
+            if page is not None:
+                return page
+        
+        if filters is not None and filters.q:
+            rows, next_cursor = await self.get_user_notifications_page_async(
+                userid, db, limit, cursor, self.LISTING_COLUMNS, filters
+            )
+            return [self.serialize_columns(row) for row in rows], next_cursor
+        
+        page_key = f"{limit}:{cursor or ''}"
+        if filters is not None:
+            page_key += f":{filters.cache_key()}"
+        page = notification_cache.get(userid, page_key)
+        if page is not None:
+            return page
+        
+        generation = notification_cache.generation(userid)
+        rows, next_cursor = await self.get_user_notifications_page_async(
+            userid, db, limit, cursor, self.LISTING_COLUMNS, filters
+        )
+        page = ([self.serialize_columns(row) for row in rows], next_cursor)
+        notification_cache.set(userid, page_key, page, generation)
+        
+        return page
+    
+    async def _hot_page(
+        self,
+        userid: str,
+        db: Union[AsyncSession, Session],
+        limit: int,
+        cursor: Optional[str]
+    ) -> Optional[Tuple[List[dict], Optional[str]]]:
+        """Página servida desde el hot tier, llenándolo en la primera página; None si no cae dentro"""
+        after = None
+        if cursor:
+            try:
+                after = self.decode_cursor(cursor)
+            except ValueError:
+                return None
+        
+        hot_page = hot_notifications.page(userid, limit, after)
+        if hot_page is None and cursor is None and limit <= hot_notifications.capacity:
+            generation = hot_notifications.generation(userid)
+            rows, next_cursor = await self.get_user_notifications_page_async(
+                userid, db, hot_notifications.capacity, None, self.LISTING_COLUMNS
+            )
+            hot_notifications.fill(userid, rows, next_cursor is not None, generation)
+            # Si una escritura concurrente descartó el llenado se usa lo ya leído
+            hot_page = hot_notifications.page(userid, limit) or (
+                rows[:limit], len(rows) > limit or next_cursor is not None
+            )
+        
+        if hot_page is None:
+            return None
+        
+        records, has_more = hot_page
+        next_cursor = None
+        if has_more and records:
+            next_cursor = self.encode_cursor(records[-1][4], records[-1][0])
+        return [self.serialize_columns(record) for record in records], next_cursor
+    
+    async def get_notifications_since_async(
+        self,
+        userid: str,
+        since: datetime,
+        db: Union[AsyncSession, Session],
+        limit: int
+    ) -> List[Notification]:
+        """Obtiene las notificaciones posteriores a `since`, más antiguas primero (async)"""
+        stmt = (
+            select(Notification)
+            .where(Notification.userid == userid, Notification.date > since)
+            .order_by(Notification.date.asc(), Notification.notificationid.asc())
+            .limit(limit)
+        )
+        
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(lambda: list(db.execute(stmt).scalars()))
+        
+        return list((await db.execute(stmt)).scalars())
+    
+    async def get_version_async(self, userid: str) -> int:
+        """
+        Versión de las notificaciones del usuario, usada como ETag
+        
+        Se lee del primario: con la versión de una réplica atrasada el
+        cliente recibiría un 304 sobre notificaciones desactualizadas.
+        """
+        async with async_session_scope() as db:
+            return await notification_versions.get_async(userid, db)
+    
+    async def is_behind_version_async(self, userid: str, version: int, db: Union[AsyncSession, Session]) -> bool:
+        """Si la sesión de lectura (una réplica) todavía no alcanzó `version`"""
+        from app.database import read_replicas
+        if not read_replicas:
+            return False
+        return await notification_versions.read_async(userid, db) < version
+    
+    async def get_unread_count_async(self, userid: str, db: Union[AsyncSession, Session]) -> int:
+        """Obtiene la cantidad de notificaciones no leídas de un usuario (async)"""
+        count = unread_count_cache.get(userid)
+        if count is not None:
+            return count
+        
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.get_unread_count, userid, db)
+        
+        generation = unread_count_cache.generation(userid)
+        count = (await db.execute(self._unread_count_statement(userid))).scalar()
+        unread_count_cache.set(userid, count, generation)
+        
+        return count
+    
+    async def mark_as_read_async(self, userid: str, notificationid: str, db: Union[AsyncSession, Session]) -> bool:
+        """Marca una notificación como leída con un único UPDATE (async)"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.mark_as_read, userid, notificationid, db) is not None
+        
+        result = await db.execute(
+            update(Notification)
+            .where(Notification.notificationid == notificationid, Notification.userid == userid)
+            .values(was_read=True)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            await notification_versions.bump_async([userid], db)
+            await change_feed.emit_async(db, [(userid, READ, notificationid)])
+        await db.commit()
+        
+        if result.rowcount:
+            self._invalidate(userid)
+            hot_notifications.mark_read(userid, [notificationid])
+            logger.debug(f"Notificación marcada como leída: {notificationid}")
+            return True
+        
+        return False
+    
+    async def delete_notification_async(self, userid: str, notificationid: str, db: Union[AsyncSession, Session]) -> bool:
+        """Elimina una notificación con un único DELETE (async)"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.delete_notification, userid, notificationid, db)
+        
+        deleted_ids = await self._delete_async(userid, self._delete_statement(userid, [notificationid]), db)
+        
+        if deleted_ids:
+            self._invalidate(userid)
+            hot_notifications.remove(userid, deleted_ids)
+            logger.debug(f"Notificación eliminada: {notificationid}")
             return True
         
         return False
     
+    async def mark_as_read_bulk_async(
+        self,
+        userid: str,
+        db: Union[AsyncSession, Session],
+        notificationids: Optional[List[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ) -> int:
+        """Marca como leídas varias notificaciones con un único UPDATE (async)"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(
+                self.mark_as_read_bulk, userid, db, notificationids, until, type
+            )
+        
+        result = await db.execute(self._mark_read_statement(userid, notificationids, until, type))
+        if result.rowcount:
+            await notification_versions.bump_async([userid], db)
+            await change_feed.emit_async(db, self._read_changes(userid, notificationids, until, type))
+        await db.commit()
+        self._invalidate(userid)
+        hot_notifications.mark_read(userid, notificationids, until, type)
+        logger.info(f"Notificaciones marcadas como leídas en lote: {result.rowcount}")
+        
+        return result.rowcount
+    
+    async def delete_notifications_bulk_async(
+        self,
+        userid: str,
+        db: Union[AsyncSession, Session],
+        notificationids: Optional[List[str]] = None,
+        until: Optional[datetime] = None,
+        type: Optional[NotificationType] = None
+    ) -> List[str]:
+        """Elimina varias notificaciones con un único DELETE ... RETURNING (async)"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(
+                self.delete_notifications_bulk, userid, db, notificationids, until, type
+            )
+        
+        deleted_ids = await self._delete_async(
+            userid, self._delete_statement(userid, notificationids, until, type), db
+        )
+        self._invalidate(userid)
+        hot_notifications.remove(userid, deleted_ids)
+        logger.info(f"Notificaciones eliminadas en lote: {len(deleted_ids)}")
+        
+        return deleted_ids
+    
+    @staticmethod
+    async def _delete_async(userid: str, stmt, db: AsyncSession) -> List[str]:
+        """Ejecuta un DELETE ... RETURNING y confirma la transacción"""
+        deleted_ids = list((await db.execute(stmt)).scalars())
+        if deleted_ids:
+            await notification_versions.bump_async([userid], db)
+            await change_feed.emit_async(db, [(userid, DELETE, notificationid) for notificationid in deleted_ids])
+        await db.commit()
+        return deleted_ids
+    
     def process_kafka_event(self, event: dict) -> Optional[Notification]:
-        """Procesa un evento de Kafka y crea una notificación"""
+        """
+        Procesa un evento de Kafka y crea una notificación
+        
+        Devuelve None si el evento ya se había procesado (re-entrega).
+        """
         try:
-            kafka_event = KafkaNotificationEvent(**event)
-            
-            notification_create = NotificationCreate(
-                userid=kafka_event.user_id,
-                type=kafka_event.notification_type,
-                title=kafka_event.title,
-                description=kafka_event.message,
-                related_project_id=kafka_event.related_project_id,
-                related_user_id=kafka_event.related_user_id,
-                related_task_id=kafka_event.related_task_id
-            )
+            rows, keys, recipients = self._event_rows([event])
+            if not rows:
+                return None
             
             # Necesitamos una sesión de DB para esto
             from app.database import SessionLocal
             if SessionLocal:
                 db = SessionLocal()
                 try:
-                    return self.create_notification(notification_create, db)
+                    inserted = self.insert_rows(rows, db, skip_duplicates=True)
+                    self._store_recipients(recipients, db)
                 finally:
                     db.close()
+                recently_seen_events.add_many(keys)
+                return Notification(**rows[0]) if inserted else None
             
             return None
         except Exception as e:
             logger.error(f"Error procesando evento de Kafka: {str(e)}")
             raise
+    
+    @staticmethod
+    def event_key(event: dict) -> str:
+        """
+        Identidad de un evento de Kafka para deduplicar re-entregas
+        
+        Usa `event_id` si viene en el evento; si no, un hash del contenido
+        (incluye el timestamp, así que dos eventos reales distintos no colisionan).
+        """
+        event_id = event.get("event_id")
+        if event_id:
+            return str(event_id)
+        canonical = json.dumps(event, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _event_rows(self, events: List[dict], rejected: Optional[list] = None) -> Tuple[List[dict], List[str], Dict[str, tuple]]:
+        """
+        Construye las filas de los eventos válidos y no vistos recientemente
+        
+        El ID de cada notificación se deriva del evento, así una re-entrega
+        choca con la clave primaria en lugar de crear un duplicado. Los
+        eventos inválidos se agregan a `rejected` como (evento, error).
+        También devuelve el (email, nombre) de los usuarios cuyos eventos
+        los traen, para los resúmenes por email.
+        """
+        rows = []
+        keys = []
+        recipients = {}
+        batch_keys = set()
+        for event in events:
+            try:
+                data = parse_event(event)
+                kafka_event = KafkaNotificationEvent(**data)
+                notification_create = self._event_to_create(kafka_event)
+            except Exception as e:
+                logger.error(f"Evento de Kafka inválido descartado: {str(e)}")
+                if rejected is not None:
+                    rejected.append((event, e))
+                continue
+            
+            key = self.event_key(data)
+            if key in batch_keys or key in recently_seen_events:
+                continue
+            batch_keys.add(key)
+            
+            notificationid = str(uuid.uuid5(KAFKA_EVENT_NAMESPACE, key))
+            rows.append(self._build_row(notification_create, notificationid))
+            keys.append(key)
+            if kafka_event.user_email:
+                known_name = recipients.get(kafka_event.user_id, (None, None))[1]
+                recipients[kafka_event.user_id] = (kafka_event.user_email, kafka_event.user_name or known_name)
+        
+        return rows, keys, recipients
+    
+    @staticmethod
+    def _store_recipients(recipients: Dict[str, tuple], db: Session):
+        """Guarda el email de los usuarios que lo informaron; un evento sin nombre conserva el guardado"""
+        if not recipients:
+            return
+        
+        table = NotificationRecipient
+        now = datetime.utcnow()
+        values = [
+            {"userid": userid, "email": email, "name": name, "updated_at": now}
+            # Orden fijo para que dos transacciones no se bloqueen mutuamente
+            for userid, (email, name) in sorted(recipients.items())
+        ]
+        insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+        stmt = insert(table).values(values)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.userid],
+            set_={
+                "email": stmt.excluded.email,
+                "name": func.coalesce(stmt.excluded.name, table.name),
+                "updated_at": stmt.excluded.updated_at
+            },
+            # Solo se reescriben las filas que cambian
+            where=or_(
+                table.email != stmt.excluded.email,
+                and_(stmt.excluded.name.is_not(None), table.name.is_distinct_from(stmt.excluded.name))
+            )
+        ))
+        db.commit()
+    
+    @staticmethod
+    def _event_to_create(kafka_event: KafkaNotificationEvent) -> NotificationCreate:
+        """Convierte un evento de Kafka en el schema de creación"""
+        return NotificationCreate(
+            userid=kafka_event.user_id,
+            type=kafka_event.notification_type,
+            title=kafka_event.title,
+            description=kafka_event.message,
+            related_project_id=kafka_event.related_project_id,
+            related_user_id=kafka_event.related_user_id,
+            related_task_id=kafka_event.related_task_id
+        )
+    
+    def process_kafka_batch(self, events: List[dict], rejected: Optional[list] = None) -> int:
+        """
+        Procesa un lote de eventos de Kafka en una sola transacción
+        
+        Los eventos inválidos se descartan (reintentarlos no los corregiría;
+        con `rejected` se devuelven para el dead-letter) y las re-entregas
+        se omiten. Si la escritura falla se propaga la excepción para que el
+        consumidor no confirme los offsets del lote. Devuelve la cantidad de
+        notificaciones creadas.
+        """
+        rows, keys, recipients = self._event_rows(events, rejected)
+        if not rows:
+            return 0
+        
+        from app.database import SessionLocal
+        if SessionLocal is None:
+            raise RuntimeError("Base de datos no disponible, el lote se reintentará")
+        
+        db = SessionLocal()
+        try:
+            created = len(self.insert_rows(rows, db, skip_duplicates=True))
+            self._store_recipients(recipients, db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        # Solo después de confirmar: si la transacción falla, el reintento no debe omitirlos
+        recently_seen_events.add_many(keys)
+        return created
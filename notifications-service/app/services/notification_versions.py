@@ -0,0 +1,102 @@
+from typing import Iterable, Union
+from sqlalchemy import String, bindparam, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.models.notification import NotificationUserVersion
+from app.services.unread_count_cache import UserValueCache
+
+
+class NotificationVersions:
+    """
+    Versión por usuario de sus notificaciones
+
+    Las escrituras del servicio la incrementan dentro de su transacción; la
+    lectura es un acceso por clave primaria o un acierto en memoria. Un
+    usuario sin fila tiene versión 0.
+    """
+
+    def __init__(self, cache: UserValueCache):
+        self.cache = cache
+
+    @staticmethod
+    def _bump_statement(userids: list, dialect_name: str):
+        """UPSERT que incrementa la versión de cada usuario"""
+        table = NotificationUserVersion
+        if dialect_name == "sqlite":
+            stmt = sqlite_insert(table).values([{"userid": userid, "version": 1} for userid in userids])
+        else:
+            # Un único parámetro de tipo array, sin importar cuántos usuarios
+            users = select(
+                func.unnest(bindparam("userids", userids, type_=ARRAY(String))),
+                literal(1)
+            )
+            stmt = postgresql_insert(table).from_select(["userid", "version"], users)
+
+        return stmt.on_conflict_do_update(
+            index_elements=[table.userid],
+            set_={"version": table.version + 1}
+        )
+
+    def bump(self, userids: Iterable[str], db: Session):
+        """Incrementa las versiones dentro de la transacción actual"""
+        # Orden fijo para que dos transacciones no se bloqueen mutuamente
+        userids = sorted(set(userids))
+        if userids:
+            db.execute(self._bump_statement(userids, db.get_bind().dialect.name))
+
+    async def bump_async(self, userids: Iterable[str], db: AsyncSession):
+        """Incrementa las versiones dentro de la transacción actual (async)"""
+        userids = sorted(set(userids))
+        if userids:
+            await db.execute(self._bump_statement(userids, db.get_bind().dialect.name))
+
+    @staticmethod
+    def _get_statement(userid: str):
+        return select(NotificationUserVersion.version).where(NotificationUserVersion.userid == userid)
+
+    def get(self, userid: str, db: Session) -> int:
+        """Versión actual del usuario"""
+        version = self.cache.get(userid)
+        if version is None:
+            generation = self.cache.generation(userid)
+            version = db.execute(self._get_statement(userid)).scalar() or 0
+            self.cache.set(userid, version, generation)
+        return version
+
+    async def get_async(self, userid: str, db: Union[AsyncSession, Session]) -> int:
+        """Versión actual del usuario (async)"""
+        version = self.cache.get(userid)
+        if version is not None:
+            return version
+
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(self.get, userid, db)
+
+        generation = self.cache.generation(userid)
+        version = (await db.execute(self._get_statement(userid))).scalar() or 0
+        self.cache.set(userid, version, generation)
+        return version
+
+    async def read_async(self, userid: str, db: Union[AsyncSession, Session]) -> int:
+        """Versión tal como la ve `db` (p. ej. una réplica), sin pasar por el caché"""
+        if not isinstance(db, AsyncSession):
+            return await run_in_threadpool(lambda: db.execute(self._get_statement(userid)).scalar() or 0)
+        return (await db.execute(self._get_statement(userid))).scalar() or 0
+
+    def invalidate(self, userid: str):
+        """Descarta la versión cacheada tras una escritura"""
+        self.cache.invalidate(userid)
+
+    def clear(self):
+        """Descarta todas las versiones cacheadas"""
+        self.cache.clear()
+
+
+notification_versions = NotificationVersions(UserValueCache(
+    ttl_seconds=settings.NOTIFICATIONS_VERSION_CACHE_TTL_SECONDS,
+    max_users=settings.NOTIFICATIONS_VERSION_CACHE_MAX_USERS
+))
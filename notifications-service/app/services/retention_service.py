@@ -0,0 +1,195 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.notification import Notification, NotificationKafkaEvent
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionService:
+    """
+    Mantenimiento periódico del almacenamiento de notificaciones
+
+    Con la tabla particionada crea las particiones de los próximos meses y
+    elimina (o desacopla para archivo) las que superan la retención. Además
+    puede borrar notificaciones leídas antiguas en lotes pequeños y olvida
+    los eventos de Kafka procesados hace más de KAFKA_DEDUP_RETENTION_DAYS.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_enabled(self) -> bool:
+        """Indica si hay alguna regla de mantenimiento activa"""
+        return (
+            settings.NOTIFICATIONS_PARTITIONING_ENABLED
+            or settings.NOTIFICATIONS_RETENTION_MONTHS > 0
+            or settings.NOTIFICATIONS_READ_RETENTION_DAYS > 0
+            or (settings.KAFKA_ENABLED and settings.KAFKA_DEDUP_RETENTION_DAYS > 0)
+        )
+
+    def run_once(self) -> dict:
+        """Ejecuta una pasada de mantenimiento"""
+        from app.database import engine, is_table_partitioned, ensure_partitions, expire_partitions
+
+        result = {"expired_partitions": [], "deleted_read": 0, "deleted_events": 0}
+        if engine is None:
+            return result
+
+        if engine.dialect.name == "postgresql":
+            userids = set()
+            with engine.begin() as connection:
+                if is_table_partitioned(connection):
+                    ensure_partitions(connection, settings.NOTIFICATIONS_PARTITION_MONTHS_AHEAD)
+                    if settings.NOTIFICATIONS_RETENTION_MONTHS > 0:
+                        result["expired_partitions"], userids = expire_partitions(
+                            connection,
+                            settings.NOTIFICATIONS_RETENTION_MONTHS,
+                            detach_only=settings.NOTIFICATIONS_RETENTION_DETACH_ONLY
+                        )
+                        if userids:
+                            # Como un borrado: las versiones y el feed de cambios van en la misma transacción
+                            with Session(bind=connection) as db:
+                                self._announce_deleted(db, userids)
+            self._forget(userids)
+
+        if settings.NOTIFICATIONS_READ_RETENTION_DAYS > 0:
+            result["deleted_read"] = self.delete_old_read_notifications(
+                settings.NOTIFICATIONS_READ_RETENTION_DAYS,
+                settings.NOTIFICATIONS_RETENTION_BATCH_SIZE
+            )
+
+        if settings.KAFKA_DEDUP_RETENTION_DAYS > 0:
+            result["deleted_events"] = self.delete_old_kafka_events(
+                settings.KAFKA_DEDUP_RETENTION_DAYS,
+                settings.NOTIFICATIONS_RETENTION_BATCH_SIZE
+            )
+
+        return result
+
+    def delete_old_kafka_events(self, older_than_days: int, batch_size: int) -> int:
+        """Olvida los eventos de Kafka procesados hace más de `older_than_days`, en lotes"""
+        from app.database import SessionLocal
+
+        if SessionLocal is None:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        total = 0
+
+        while not self._stop.is_set():
+            expired_ids = (
+                select(NotificationKafkaEvent.notificationid)
+                .where(NotificationKafkaEvent.processed_at < cutoff)
+                .limit(batch_size)
+            )
+            stmt = delete(NotificationKafkaEvent).where(
+                NotificationKafkaEvent.notificationid.in_(expired_ids)
+            ).execution_options(synchronize_session=False)
+
+            db = SessionLocal()
+            try:
+                deleted = db.execute(stmt).rowcount
+                db.commit()
+            finally:
+                db.close()
+
+            total += deleted
+            if deleted < batch_size:
+                break
+            self._stop.wait(0.1)
+
+        return total
+
+    def delete_old_read_notifications(self, older_than_days: int, batch_size: int) -> int:
+        """
+        Borra notificaciones leídas más antiguas que `older_than_days`
+
+        Cada lote es una transacción corta para no bloquear el tráfico
+        normal; se detiene cuando un lote sale incompleto.
+        """
+        from app.database import SessionLocal
+
+        if SessionLocal is None:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        total = 0
+
+        while not self._stop.is_set():
+            expired_ids = (
+                select(Notification.notificationid)
+                .where(Notification.was_read == True, Notification.date < cutoff)
+                .limit(batch_size)
+            )
+            stmt = (
+                delete(Notification)
+                .where(Notification.notificationid.in_(expired_ids))
+                .returning(Notification.userid)
+                .execution_options(synchronize_session=False)
+            )
+
+            db = SessionLocal()
+            try:
+                userids = list(db.execute(stmt).scalars())
+                self._announce_deleted(db, set(userids))
+                db.commit()
+            finally:
+                db.close()
+
+            self._forget(set(userids))
+
+            total += len(userids)
+            if len(userids) < batch_size:
+                break
+            self._stop.wait(0.1)
+
+        return total
+
+    @staticmethod
+    def _announce_deleted(db: Session, userids: set):
+        """Sube la versión de los usuarios con notificaciones borradas y lo anuncia a las demás instancias"""
+        from app.services.notification_versions import notification_versions
+        from app.services.change_feed import change_feed, DELETE
+
+        notification_versions.bump(userids, db)
+        change_feed.emit(db, [(userid, DELETE, None) for userid in userids])
+
+    @staticmethod
+    def _forget(userids: set):
+        """Descarta los cachés locales de los usuarios, una vez confirmado el borrado"""
+        from app.services.notification_service import NotificationService
+        from app.services.hot_notifications import hot_notifications
+
+        for userid in userids:
+            NotificationService._invalidate(userid)
+            hot_notifications.invalidate(userid)
+
+    def start(self):
+        """Inicia el mantenimiento periódico en un hilo separado"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("Mantenimiento de retención iniciado")
+
+    def stop(self):
+        """Detiene el mantenimiento periódico"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = self.run_once()
+                if result["expired_partitions"] or result["deleted_read"] or result["deleted_events"]:
+                    logger.info(
+                        f"Retención: particiones expiradas {result['expired_partitions']}, "
+                        f"notificaciones leídas borradas {result['deleted_read']}, "
+                        f"eventos de Kafka olvidados {result['deleted_events']}"
+                    )
+            except Exception as e:
+                logger.error(f"Error en mantenimiento de retención: {str(e)}")
+
+            self._stop.wait(settings.NOTIFICATIONS_RETENTION_INTERVAL_SECONDS)
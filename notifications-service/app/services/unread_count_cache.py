@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+
+
+class UserValueCache:
+    """
+    Caché en proceso de un valor entero por usuario (contador de no leídas,
+    versión de las notificaciones)
+
+    Las entradas expiran tras `ttl_seconds` y se descartan por LRU al superar
+    `max_users`. Las escrituras del servicio invalidan la entrada del usuario.
+    Como en el caché de listados, quien lee de la base toma antes la
+    generación del usuario: si una escritura lo invalida mientras tanto, el
+    valor leído (quizás anterior a la escritura) no se guarda.
+    """
+
+    GENERATION_STRIPES = 4096
+
+    def __init__(self, ttl_seconds: float, max_users: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._generations = [0] * self.GENERATION_STRIPES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, userid: str) -> int:
+        with self._lock:
+            return self._generations[self._stripe(userid)]
+
+    def get(self, userid: str) -> Optional[int]:
+        """Devuelve el valor cacheado o None si no existe o expiró"""
+        with self._lock:
+            entry = self._entries.get(userid)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[userid]
+                return None
+
+            self._entries.move_to_end(userid)
+            return value
+
+    def set(self, userid: str, value: int, generation: int):
+        """Guarda el valor de un usuario si no fue invalidado desde `generation`"""
+        with self._lock:
+            if self._generations[self._stripe(userid)] != generation:
+                return
+            self._entries[userid] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(userid)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, userid: str):
+        """Elimina la entrada de un usuario tras una escritura"""
+        with self._lock:
+            self._generations[self._stripe(userid)] += 1
+            self._entries.pop(userid, None)
+
+    def clear(self):
+        """Elimina todas las entradas (cambios de otras instancias que no se recibieron)"""
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self._entries.clear()
+
+    def _stripe(self, userid: str) -> int:
+        return hash(userid) % self.GENERATION_STRIPES
+
+
+unread_count_cache = UserValueCache(
+    ttl_seconds=settings.UNREAD_COUNT_CACHE_TTL_SECONDS,
+    max_users=settings.UNREAD_COUNT_CACHE_MAX_USERS
+)
@@ -0,0 +1,95 @@
+"""
+Benchmark de concurrencia: motor síncrono vs motor async
+
+Levanta el servicio con uvicorn dos veces (DATABASE_ASYNC_ENABLED=false y
+true) contra la misma base de datos y lanza N clientes concurrentes sobre
+GET /notifications, reportando throughput y latencias en JSON.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/async_concurrency.py --clients 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from common import start_server, stop_server, summarize, wait_ready
+
+
+async def seed(client: httpx.AsyncClient, users: int, per_user: int):
+    for u in range(users):
+        for i in range(per_user):
+            await client.post("/notifications", json={
+                "userid": f"bench-user-{u}",
+                "type": "informative",
+                "title": f"Notificación {i}",
+                "description": "Notificación de benchmark"
+            })
+
+
+async def run_clients(client: httpx.AsyncClient, clients: int, requests_per_client: int, users: int) -> dict:
+    latencies = []
+    errors = 0
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        for i in range(requests_per_client):
+            userid = f"bench-user-{(worker_id + i) % users}"
+            start = time.perf_counter()
+            try:
+                response = await client.get("/notifications", params={"userid": userid, "limit": 20})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(clients)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench_mode(args, async_enabled: bool, port: int, seed_data: bool) -> dict:
+    server = start_server(
+        port,
+        os.environ["DATABASE_URL"],
+        {"DATABASE_ASYNC_ENABLED": "true" if async_enabled else "false"}
+    )
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            if seed_data:
+                await seed(client, args.users, args.per_user)
+            # Calentamiento: imports diferidos, pool de conexiones y sentencias preparadas
+            await run_clients(client, min(args.clients, 20), 5, args.users)
+            return await run_clients(client, args.clients, args.requests, args.users)
+    finally:
+        stop_server(server)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Peticiones por cliente")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8802)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL es obligatorio")
+
+    results = {
+        "clients": args.clients,
+        "sync": await bench_mode(args, async_enabled=False, port=args.port, seed_data=True),
+        "async": await bench_mode(args, async_enabled=True, port=args.port + 1, seed_data=False)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+Benchmark del feed de cambios entre instancias (LISTEN/NOTIFY)
+
+Levanta dos instancias del servicio (A y B) contra la misma base de datos
+PostgreSQL, primero sin y luego con NOTIFICATIONS_CHANGE_FEED_ENABLED, y
+mide lo que ve B de las escrituras hechas en A:
+
+- contador de no leídas: B lo tiene en caché; tras cada POST en A se
+  consulta B hasta que refleja la nueva notificación (o pasa --wait-s);
+- conexión en vivo: un cliente SSE conectado a B espera la notificación
+  creada en A;
+- costo en la escritura: latencia de POST /notifications en A.
+
+Requiere DATABASE_URL de PostgreSQL.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/change_feed.py --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from common import database_url, environment, start_server, stop_server, summarize, wait_ready
+
+
+async def create(client: httpx.AsyncClient, userid: str, title: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/notifications", json={
+        "userid": userid, "type": "informative", "title": title, "description": "Benchmark del feed de cambios"
+    })
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def unread_count(client: httpx.AsyncClient, userid: str) -> int:
+    response = await client.get("/notifications/unread-count", params={"userid": userid})
+    return response.json()["body"]["unread_count"]
+
+
+async def cache_convergence(a: httpx.AsyncClient, b: httpx.AsyncClient, iterations: int, args) -> dict:
+    """Tiempo hasta que el contador cacheado en B refleja un POST en A"""
+    latencies = []
+    writes = []
+    stale = 0
+    for i in range(iterations):
+        userid = f"change-feed-count-{i}"
+        await unread_count(b, userid)
+        writes.append(await create(a, userid, f"Contador {i}"))
+        start = time.perf_counter()
+        deadline = start + args.wait_s
+        while await unread_count(b, userid) != 1:
+            if time.perf_counter() > deadline:
+                stale += 1
+                break
+            await asyncio.sleep(0.002)
+        else:
+            latencies.append(time.perf_counter() - start)
+
+    result = {"stale_after_wait": stale, "post_on_a": summarize(writes, 0, sum(writes))}
+    result["post_on_a"].pop("throughput_rps")
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100)
+        result.update({
+            "converged": len(latencies),
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2)
+        })
+    return result
+
+
+async def live_push(a: httpx.AsyncClient, b: httpx.AsyncClient, iterations: int, args) -> dict:
+    """Latencia desde el POST en A hasta el evento SSE en B"""
+    latencies = []
+    missed = 0
+    for i in range(iterations):
+        userid = f"change-feed-live-{i}"
+        received = asyncio.get_running_loop().create_future()
+
+        async def listen():
+            async with b.stream("GET", "/notifications/stream", params={"userid": userid}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        received.set_result(time.perf_counter())
+                        return
+
+        listener = asyncio.create_task(listen())
+        # Espera a que B registre la suscripción
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await create(a, userid, f"En vivo {i}")
+        try:
+            latencies.append(await asyncio.wait_for(received, args.wait_s) - start)
+        except asyncio.TimeoutError:
+            missed += 1
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    result = {"missed": missed}
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100)
+        result.update({"p50_ms": round(quantiles[49] * 1000, 2), "p99_ms": round(quantiles[98] * 1000, 2)})
+    return result
+
+
+async def bench_mode(args, db_url: str, feed: bool, port: int) -> dict:
+    # Sin el feed cada iteración espera --wait-s completo: alcanza con pocas
+    iterations = args.iterations if feed else args.baseline_iterations
+    env = {
+        "NOTIFICATIONS_CHANGE_FEED_ENABLED": "true" if feed else "false",
+        "NOTIFICATIONS_CHANGE_FEED_CHANNEL": f"notifications_changes_bench_{os.getpid()}",
+        "METRICS_ENABLED": "false"
+    }
+    servers = [start_server(port, db_url, env), start_server(port + 1, db_url, env)]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as a, \
+                httpx.AsyncClient(base_url=f"http://127.0.0.1:{port + 1}", timeout=60) as b:
+            await wait_ready(a)
+            await wait_ready(b)
+            # Calentamiento: pools, imports diferidos y la conexión del listener
+            for i in range(20):
+                await create(a, "change-feed-warmup", f"Calentamiento {i}")
+            await asyncio.sleep(0.5)
+
+            result = {
+                "unread_count_on_b": await cache_convergence(a, b, iterations, args),
+                "live_push_on_b": await live_push(a, b, min(iterations, args.push_iterations), args)
+            }
+            if feed:
+                result["change_feed_b"] = (await b.get("/health")).json().get("change_feed")
+            return result
+    finally:
+        for server in servers:
+            stop_server(server)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--baseline-iterations", type=int, default=10, help="Iteraciones sin el feed")
+    parser.add_argument("--push-iterations", type=int, default=50)
+    parser.add_argument("--wait-s", type=float, default=2.0, help="Espera máxima por la convergencia en B")
+    parser.add_argument("--port", type=int, default=8850)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    if not db_url.startswith("postgres"):
+        raise SystemExit("El feed de cambios requiere PostgreSQL (DATABASE_URL)")
+
+    results = {
+        "environment": environment(db_url),
+        "without_feed": await bench_mode(args, db_url, feed=False, port=args.port),
+        "with_feed": await bench_mode(args, db_url, feed=True, port=args.port + 2)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Presupuesto de arranque en frío
+
+Mide, en procesos nuevos:
+  - el tiempo de `import app.main`;
+  - desde que se lanza uvicorn hasta la primera respuesta de /health y
+    hasta la primera respuesta 200 de GET /notifications, con el arranque
+    normal y con FAST_STARTUP=true.
+
+Antes de medir se hace un arranque que crea el esquema, como en un
+despliegue ya existente que despierta tras estar inactivo. Termina con
+código 1 si la mediana del import o de la primera respuesta con
+FAST_STARTUP supera el presupuesto.
+
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    python benchmarks/cold_start.py --runs 5 --max-import-ms 1500 --max-first-response-ms 3000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import SERVICE_DIR, database_url, environment, start_server, stop_server
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+
+
+def measure_import(db_url: str) -> float:
+    env = dict(os.environ, DATABASE_URL=db_url, KAFKA_ENABLED="false", LOG_LEVEL="WARNING")
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=SERVICE_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def wait_for(client: httpx.Client, path: str, params: dict, deadline: float) -> float:
+    """Reintenta hasta recibir un 200 y devuelve el instante de la respuesta"""
+    while time.monotonic() < deadline:
+        try:
+            if client.get(path, params=params).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{path} no respondió a tiempo")
+
+
+def measure_startup(port: int, db_url: str, fast: bool) -> dict:
+    start = time.perf_counter()
+    server = start_server(port, db_url, {"FAST_STARTUP": "true" if fast else "false"})
+    try:
+        deadline = time.monotonic() + 60
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            health = wait_for(client, "/health", {}, deadline)
+            first_response = wait_for(client, "/notifications", {"userid": "cold-start"}, deadline)
+    finally:
+        stop_server(server)
+
+    return {
+        "health_ms": round((health - start) * 1000, 1),
+        "first_response_ms": round((first_response - start) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-first-response-ms", type=float, default=3000)
+    parser.add_argument("--port", type=int, default=8830)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    # Primer arranque: crea el esquema y registra su huella
+    measure_startup(args.port, db_url, fast=False)
+
+    imports = [measure_import(db_url) for _ in range(args.runs)]
+    runs = {"standard": [], "fast": []}
+    for _ in range(args.runs):
+        runs["standard"].append(measure_startup(args.port, db_url, fast=False))
+        runs["fast"].append(measure_startup(args.port, db_url, fast=True))
+
+    medians = {
+        mode: {key: statistics.median(r[key] for r in results) for key in ("health_ms", "first_response_ms")}
+        for mode, results in runs.items()
+    }
+    import_ms = statistics.median(imports)
+    within_budget = (
+        import_ms <= args.max_import_ms
+        and medians["fast"]["first_response_ms"] <= args.max_first_response_ms
+    )
+
+    print(json.dumps({
+        "environment": environment(db_url),
+        "budget": {"import_ms": args.max_import_ms, "first_response_ms": args.max_first_response_ms},
+        "import_ms": round(import_ms, 1),
+        "median": medians,
+        "within_budget": within_budget,
+        "runs": runs
+    }, indent=2))
+
+    if not within_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Utilidades compartidas por los benchmarks
+
+Los resultados incluyen el commit, la versión de Python y el motor de base
+de datos para poder comparar corridas entre commits.
+"""
+import asyncio
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def database_url() -> str:
+    """DATABASE_URL del entorno o un SQLite temporal como respaldo"""
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+    path = os.path.join(tempfile.mkdtemp(prefix="notifications-bench-"), "bench.db")
+    return f"sqlite:///{path}"
+
+
+def environment(db_url: str) -> dict:
+    """Metadatos de la corrida"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "database": db_url.split(":", 1)[0],
+        "cpus": os.cpu_count()
+    }
+
+
+def start_server(port: int, db_url: str, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Levanta el servicio con uvicorn sin Kafka"""
+    env = dict(os.environ)
+    env["DATABASE_URL"] = db_url
+    env["KAFKA_ENABLED"] = "false"
+    env["LOG_LEVEL"] = "WARNING"
+    env.update(extra_env or {})
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    server.wait()
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("El servicio no respondió a tiempo")
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Throughput y percentiles de latencia en milisegundos"""
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    }
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(sorted(latencies), n=100)
+        result.update({
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p95_ms": round(quantiles[94] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2)
+        })
+    return result
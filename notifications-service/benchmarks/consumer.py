@@ -0,0 +1,136 @@
+"""
+Benchmark del consumidor de Kafka sin broker
+
+Genera eventos KafkaNotificationEvent sintéticos y los entrega directamente
+a NotificationService, midiendo eventos/segundo para el camino de a uno
+(process_kafka_event), el de lotes (process_kafka_batch) y el pool de
+workers con orden por usuario (KeyedWorkerPool + process_kafka_batch).
+
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    python benchmarks/consumer.py --events 5000 --batch-size 500 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from common import SERVICE_DIR, database_url, environment
+
+MODES = ("event", "batch", "parallel")
+
+
+def build_events(count: int, users: int, rng: random.Random) -> list:
+    now = datetime.utcnow().isoformat()
+    # IDs únicos por corrida: si no, cada modo vería los eventos del anterior como re-entregas
+    run_id = uuid.uuid4().hex
+    return [
+        {
+            "event_id": f"{run_id}-{i}",
+            "event_type": "task_assigned",
+            "user_id": f"consumer-user-{rng.randrange(users)}",
+            "notification_type": rng.choice(["warning", "success", "informative", "application"]),
+            "title": f"Evento {i}",
+            "message": "Evento sintético del benchmark del consumidor",
+            "timestamp": now,
+            "related_project_id": f"project-{rng.randrange(100)}"
+        }
+        for i in range(count)
+    ]
+
+
+def run_parallel(service, events: list, batch_size: int, workers: int):
+    from app.kafka.worker_pool import KeyedWorkerPool
+
+    pool = KeyedWorkerPool(
+        service.process_kafka_batch,
+        workers=workers,
+        queue_size=batch_size * 2,
+        batch_size=batch_size
+    )
+    pool.start()
+    for event in events:
+        # Como el consumidor: si la cola está llena se espera a que se libere
+        index = pool.worker_for(event["user_id"])
+        while not pool.try_submit(index, event):
+            time.sleep(0.001)
+
+    processed = 0
+    while processed < len(events):
+        items, _ = pool.completed.get()
+        processed += len(items)
+    pool.stop()
+
+
+def run_mode(service, mode: str, events: list, batch_size: int, workers: int) -> dict:
+    start = time.perf_counter()
+    if mode == "event":
+        for event in events:
+            service.process_kafka_event(event)
+    elif mode == "batch":
+        for offset in range(0, len(events), batch_size):
+            service.process_kafka_batch(events[offset:offset + batch_size])
+    else:
+        run_parallel(service, events, batch_size, workers)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "events": len(events),
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(len(events) / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="Workers del modo parallel")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo donde guardar el JSON")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"Modos desconocidos: {', '.join(sorted(unknown))}")
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    sys.path.insert(0, SERVICE_DIR)
+
+    from app import database
+    from app.services.notification_service import NotificationService
+
+    database.init_database()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    database.create_tables()
+
+    service = NotificationService()
+    results = {
+        "environment": environment(db_url),
+        "parameters": {k: v for k, v in vars(args).items() if k != "output"},
+        "modes": {}
+    }
+    for mode in modes:
+        events = build_events(args.events, args.users, random.Random(args.seed))
+        results["modes"][mode] = run_mode(service, mode, events, args.batch_size, args.workers)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark de los resúmenes por email de notificaciones no leídas
+
+Siembra --history-rows notificaciones anteriores a la ventana del resumen
+y --rows no leídas recientes repartidas entre --users usuarios, y ejecuta
+dos pasadas de DigestService: la primera con todo pendiente y una segunda,
+incremental, tras agregar --new-rows notificaciones. Reporta cuántos
+eventos de email se publican frente a uno por notificación y la duración de
+cada pasada. En PostgreSQL registra además el plan de la consulta agrupada.
+
+No necesita Kafka: los eventos se cuentan con un productor en memoria.
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/digest.py --rows 200000 --users 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import SERVICE_DIR, database_url, environment
+
+
+class _Delivered:
+    def get(self, timeout=None):
+        return None
+
+
+class CountingProducer:
+    """Productor en memoria con la interfaz de KafkaProducerService que usa el resumen"""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def send(self, topic, message, key=None):
+        self.messages += 1
+        self.bytes += len(json.dumps(message))
+        return _Delivered()
+
+    def flush(self, timeout=None):
+        pass
+
+
+def seed(database, service, users: int, rows: int, prefix: str, newest: datetime, spread: timedelta):
+    """Notificaciones no leídas con fechas al azar en (newest - spread, newest]"""
+    from app.schemas.notification import NotificationCreate
+
+    rng = random.Random(prefix)
+    with database.SessionLocal() as db:
+        for start in range(0, rows, 10000):
+            batch = []
+            for i in range(start, min(start + 10000, rows)):
+                row = service._build_row(NotificationCreate(
+                    userid=f"digest-{rng.randrange(users)}", type="informative",
+                    title=f"Actividad {prefix}-{i}", description="Notificación de benchmark"
+                ))
+                row["date"] = newest - timedelta(seconds=rng.random() * spread.total_seconds())
+                batch.append(row)
+            service.insert_rows(batch, db)
+
+
+def explain(database, digest, now: datetime) -> list:
+    from sqlalchemy import text
+    from app.config import settings
+
+    since = digest._scan_from or now - timedelta(hours=settings.NOTIFICATIONS_DIGEST_LOOKBACK_HOURS)
+    until = now - timedelta(seconds=digest.SETTLE_SECONDS)
+    stmt = digest._digest_statement("postgresql", since, until, settings.NOTIFICATIONS_DIGEST_MAX_ITEMS)
+    sql = str(stmt.compile(dialect=database.engine.dialect, compile_kwargs={"literal_binds": True}))
+    with database.engine.connect() as connection:
+        return [line for (line,) in connection.execute(text("EXPLAIN " + sql.replace(":", "\\:")))]
+
+
+def timed_run(digest, producer, now: datetime = None) -> dict:
+    before = producer.messages
+    start = time.perf_counter()
+    result = digest.run_once(now)
+    return {
+        **result,
+        "emails": producer.messages - before,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="No leídas dentro de la ventana")
+    parser.add_argument("--history-rows", type=int, default=800000, help="Notificaciones anteriores a la ventana")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--new-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    sys.path.insert(0, SERVICE_DIR)
+
+    from app import database
+    from app.services.digest_service import DigestService
+    from app.services.notification_service import NotificationService
+
+    database.initialize()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+
+    service = NotificationService()
+    producer = CountingProducer()
+    digest = DigestService(producer=producer)
+
+    # Margen de SETTLE_SECONDS: las filas deben quedar dentro de la pasada
+    settled = datetime.utcnow() - timedelta(seconds=DigestService.SETTLE_SECONDS + 60)
+    seed(database, service, args.users, args.history_rows, "history", settled - timedelta(days=3), timedelta(days=60))
+    seed(database, service, args.users, args.rows, "recent", settled, timedelta(hours=12))
+    if database.engine.dialect.name == "postgresql":
+        with database.engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE notifications")
+
+    first = timed_run(digest, producer)
+    # Notificaciones llegadas después de la primera pasada; la segunda simula
+    # la siguiente ejecución programada
+    seed(database, service, args.users, args.new_rows, "new", datetime.utcnow(), timedelta(seconds=30))
+    next_run = datetime.utcnow() + timedelta(seconds=DigestService.SETTLE_SECONDS + 1)
+    incremental = timed_run(digest, producer, next_run)
+
+    results = {
+        "environment": environment(db_url),
+        "rows": args.rows,
+        "history_rows": args.history_rows,
+        "users": args.users,
+        "first_run": first,
+        "incremental_run": incremental,
+        "emails_per_notification": round(first["emails"] / max(first["notifications"], 1), 4)
+    }
+    if database.engine.dialect.name == "postgresql":
+        # Plan de la pasada programada siguiente a la incremental
+        results["plan"] = explain(database, digest, next_run + timedelta(seconds=3600))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Benchmark del manejo de fallos del consumidor con un broker en memoria
+
+Entrega eventos sintéticos en lotes a NotificationService con una fracción
+de eventos venenosos (campos inválidos y títulos de más de 255 caracteres,
+que PostgreSQL rechaza con DataError) y una caída simulada de la base de
+datos (OperationalError durante --outage-s), comparando:
+
+- blocking: el consumidor anterior; un lote fallido se reintenta en el
+  lugar con espera exponencial y, agotados los intentos, se pierde;
+- pipeline: FailurePipeline; los fallos van al tema de reintentos (con
+  DelayQueue, como el consumidor de reintentos) o al dead-letter, y el
+  tema principal sigue avanzando.
+
+Reporta el tiempo hasta consumir el tema principal, el tiempo total, lo
+creado, lo reintentado, lo enviado al dead-letter y lo perdido.
+
+Usa DATABASE_URL o un SQLite temporal si no está definido (en SQLite los
+títulos largos no fallan).
+
+Uso:
+    python benchmarks/failure_pipeline.py --events 20000 --poison-rate 0.001 --outage-s 0.5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from common import SERVICE_DIR, database_url, environment
+
+MODES = ("blocking", "pipeline")
+
+
+class FakeFuture:
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+    def get(self, timeout=None):
+        return self.metadata
+
+
+class FakeRecord:
+    def __init__(self, topic: str, offset: int, key, value):
+        self.topic = topic
+        self.partition = 0
+        self.offset = offset
+        self.key = key
+        self.value = value
+
+
+class FakeBroker:
+    """Temas en memoria con la interfaz de envío de KafkaProducerService"""
+
+    def __init__(self):
+        self.topics = defaultdict(list)
+        self.positions = defaultdict(int)
+
+    def send(self, topic: str, message: dict, callback=None, key=None):
+        # Ida y vuelta por JSON, como el serializador del productor
+        record = FakeRecord(topic, len(self.topics[topic]), key, json.loads(json.dumps(message)))
+        self.topics[topic].append(record)
+        if callback is not None:
+            callback(None, record)
+        return FakeFuture(record)
+
+    def poll(self, topic: str, max_records: int) -> list:
+        start = self.positions[topic]
+        records = self.topics[topic][start:start + max_records]
+        self.positions[topic] += len(records)
+        return records
+
+
+class Outage:
+    """OperationalError en cada escritura mientras dura la ventana"""
+
+    def __init__(self, process_batch, start_s: float, duration_s: float):
+        self.process_batch = process_batch
+        self.start_s = start_s
+        self.duration_s = duration_s
+        self.started = None
+        self.failed_calls = 0
+
+    def begin(self):
+        self.started = time.monotonic()
+
+    def __call__(self, events, rejected=None):
+        elapsed = time.monotonic() - self.started
+        if self.start_s <= elapsed < self.start_s + self.duration_s:
+            from sqlalchemy.exc import OperationalError
+            self.failed_calls += 1
+            raise OperationalError("INSERT INTO notifications", {}, Exception("conexión rechazada (simulada)"))
+        return self.process_batch(events, rejected)
+
+
+def build_events(count: int, users: int, poison_rate: float, rng: random.Random) -> tuple:
+    now = datetime.utcnow().isoformat()
+    run_id = uuid.uuid4().hex
+    events = []
+    poison = {"invalid_fields": 0, "long_title": 0}
+    for i in range(count):
+        event = {
+            "event_id": f"{run_id}-{i}",
+            "event_type": "task_assigned",
+            "user_id": f"failure-user-{rng.randrange(users)}",
+            "notification_type": rng.choice(["warning", "success", "informative", "application"]),
+            "title": f"Evento {i}",
+            "message": "Evento sintético del benchmark de fallos",
+            "timestamp": now,
+            "related_project_id": f"project-{rng.randrange(100)}"
+        }
+        if rng.random() < poison_rate:
+            if rng.random() < 0.5:
+                event["notification_type"] = "desconocido"
+                poison["invalid_fields"] += 1
+            else:
+                event["title"] = "x" * 300
+                poison["long_title"] += 1
+        events.append(event)
+    return events, poison
+
+
+def run_blocking(process_batch, events: list, args) -> dict:
+    """Reintento en el lugar: el lote fallido frena todo lo que viene detrás"""
+    created = lost = discarded = 0
+    blocked = 0.0
+    for offset in range(0, len(events), args.batch_size):
+        batch = events[offset:offset + args.batch_size]
+        for attempt in range(1, args.max_attempts + 1):
+            rejected = []
+            try:
+                created += process_batch(batch, rejected)
+                discarded += len(rejected)
+                break
+            except Exception:
+                if attempt == args.max_attempts:
+                    lost += len(batch)
+                    break
+                delay = min(args.backoff_s * 2 ** (attempt - 1), args.backoff_max_s)
+                blocked += delay
+                time.sleep(delay)
+    return {"created": created, "lost": lost, "discarded_without_trace": discarded, "blocked_s": round(blocked, 3)}
+
+
+def run_pipeline(process_batch, events: list, args) -> dict:
+    from app.kafka.failures import DelayQueue, FailurePipeline
+
+    broker = FakeBroker()
+    pipeline = FailurePipeline(
+        process_batch,
+        broker,
+        retry_topic="notifications.retry",
+        dead_letter_topic="notifications.dlq",
+        backoff_seconds=args.backoff_s,
+        backoff_max_seconds=args.backoff_max_s,
+        max_attempts=args.max_attempts,
+        send_timeout=10
+    )
+    delayed = DelayQueue()
+    created = 0
+
+    def drain_retries():
+        # Lo que hace start_delayed: retener hasta not_before y procesar lo vencido
+        nonlocal created
+        for record in broker.poll("notifications.retry", args.batch_size):
+            delayed.add(record.value["not_before"], record)
+        due = delayed.pop_due(time.time())
+        for offset in range(0, len(due), args.batch_size):
+            created += pipeline.handle_retry([record.value for record in due[offset:offset + args.batch_size]])
+
+    start = time.perf_counter()
+    for offset in range(0, len(events), args.batch_size):
+        created += pipeline.handle(events[offset:offset + args.batch_size])
+        drain_retries()
+    main_topic_s = time.perf_counter() - start
+
+    drain_retries()
+    while len(delayed) or broker.positions["notifications.retry"] < len(broker.topics["notifications.retry"]):
+        next_due = delayed.next_due()
+        if next_due is not None:
+            time.sleep(max(next_due - time.time(), 0))
+        drain_retries()
+
+    dead_letters = broker.topics["notifications.dlq"]
+    categories = defaultdict(int)
+    for record in dead_letters:
+        categories[record.value["category"]] += 1
+    return {
+        "created": created,
+        "main_topic_s": round(main_topic_s, 3),
+        "retry_records": len(broker.topics["notifications.retry"]),
+        "dead_lettered": dict(categories),
+        "lost": len(events) - created - len(dead_letters)
+    }
+
+
+def run_mode(service, mode: str, args) -> dict:
+    events, poison = build_events(args.events, args.users, args.poison_rate, random.Random(args.seed))
+    outage = Outage(service.process_kafka_batch, args.outage_start_s, args.outage_s)
+    outage.begin()
+    start = time.perf_counter()
+    if mode == "blocking":
+        result = run_blocking(outage, events, args)
+    else:
+        result = run_pipeline(outage, events, args)
+    elapsed = time.perf_counter() - start
+
+    result.update({
+        "events": len(events),
+        "poison": poison,
+        "outage_failed_calls": outage.failed_calls,
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(len(events) / elapsed, 1)
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--poison-rate", type=float, default=0.001)
+    parser.add_argument("--outage-start-s", type=float, default=0.2)
+    parser.add_argument("--outage-s", type=float, default=0.5)
+    parser.add_argument("--backoff-s", type=float, default=0.05)
+    parser.add_argument("--backoff-max-s", type=float, default=1.0)
+    parser.add_argument("--max-attempts", type=int, default=6)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"Modos desconocidos: {', '.join(sorted(unknown))}")
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    sys.path.insert(0, SERVICE_DIR)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import database
+    from app.services.notification_service import NotificationService
+
+    database.init_database()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    database.create_tables()
+
+    service = NotificationService()
+    results = {
+        "environment": environment(db_url),
+        "parameters": vars(args),
+        "modes": {mode: run_mode(service, mode, args) for mode in modes}
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark de los filtros y la búsqueda de GET /notifications
+
+Siembra una tabla con N filas (un millón por defecto) donde un usuario
+"hot" concentra el 10 % de las notificaciones y el resto se reparte entre
+--users usuarios. Para cada forma de filtro mide la mediana de una página
+(LISTING_COLUMNS, --limit filas) del usuario hot y de uno típico y, en
+PostgreSQL, registra el plan de la consulta: los nodos de acceso y los
+índices que usa. Termina con código 1 si alguna forma recorre la tabla con
+un Seq Scan.
+
+En PostgreSQL la siembra es un único INSERT ... SELECT generate_series;
+en otros motores se usa el servicio (conviene bajar --rows). Las filas
+sembradas se reutilizan entre corridas.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/filtered_listing.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import SERVICE_DIR, database_url, environment
+
+HOT_USER = "filter-bench-hot"
+TITLES = [
+    "Nueva tarea asignada", "Tarea completada", "Comentario en tu tarea", "Revisión pendiente",
+    "Entrega próxima", "Reunión programada", "Nuevo miembro en el proyecto", "Despliegue finalizado"
+]
+WORDS = ["backend", "frontend", "diseño", "documentación", "pruebas", "sprint", "cliente", "migración"]
+
+SEED_SQL = """
+INSERT INTO notifications (
+    notificationid, userid, type, title, description, was_read, date, coalesced_count,
+    related_project_id, related_user_id, related_task_id
+)
+SELECT
+    'fb-' || i,
+    CASE WHEN i % 10 = 0 THEN CAST(:hot AS text) ELSE 'filter-bench-' || (i % CAST(:users AS integer)) END,
+    (ARRAY['WARNING', 'SUCCESS', 'INFORMATIVE', 'APPLICATION'])[1 + (i / 3) % 4]::notificationtype,
+    (CAST(:titles AS text[]))[1 + (i / 13) % 8],
+    'Actividad de ' || (CAST(:words AS text[]))[1 + (i / 8) % 8] || ' en el proyecto ' || ((i / 7) % 50)
+        || CASE WHEN (i / 10) % 100 = 7 THEN ' con un incidente crítico' ELSE '' END,
+    i % 3 <> 0,
+    now() - i * interval '30 seconds',
+    1,
+    'project-' || ((i / 7) % 50),
+    NULL,
+    'task-' || ((i / 11) % 500)
+FROM generate_series(CAST(:start AS integer), CAST(:stop AS integer)) AS i
+"""
+
+
+def build_shapes(filters_cls, now: datetime) -> dict:
+    return {
+        "none": filters_cls(),
+        "unread": filters_cls(unread=True),
+        "type": filters_cls(types=["warning"]),
+        "types": filters_cls(types=["warning", "success"]),
+        "project": filters_cls(related_project_id="project-7"),
+        "task": filters_cls(related_task_id="task-70"),
+        "date_range": filters_cls(since=now - timedelta(days=30), until=now - timedelta(days=7)),
+        "q_common": filters_cls(q="tarea"),
+        "q_rare": filters_cls(q="incidente"),
+        "q_unread": filters_cls(q="despliegue", unread=True)
+    }
+
+
+def seed(database, service, args):
+    from sqlalchemy import func, select, text
+    from app.models.notification import Notification
+    from app.schemas.notification import NotificationCreate, NotificationType
+
+    with database.SessionLocal() as db:
+        existing = db.execute(
+            select(func.count()).select_from(Notification).where(Notification.notificationid.like("fb-%"))
+        ).scalar()
+        if existing >= args.rows:
+            return existing
+
+        if database.engine.dialect.name == "postgresql":
+            # Por tramos para no sostener una única transacción enorme
+            for start in range(existing + 1, args.rows + 1, 100000):
+                db.execute(text(SEED_SQL), {
+                    "hot": HOT_USER, "users": args.users, "titles": TITLES, "words": WORDS,
+                    "start": start, "stop": min(start + 99999, args.rows)
+                })
+                db.commit()
+            db.execute(text("ANALYZE notifications"))
+            db.commit()
+            return args.rows
+
+    types = list(NotificationType)
+    now = datetime.utcnow()
+    for start in range(existing + 1, args.rows + 1, 5000):
+        rows = []
+        for i in range(start, min(start + 5000, args.rows + 1)):
+            create = NotificationCreate(
+                userid=HOT_USER if i % 10 == 0 else f"filter-bench-{i % args.users}",
+                type=types[(i // 3) % 4],
+                title=TITLES[(i // 13) % 8],
+                description=f"Actividad de {WORDS[(i // 8) % 8]} en el proyecto {(i // 7) % 50}"
+                + (" con un incidente crítico" if (i // 10) % 100 == 7 else ""),
+                related_project_id=f"project-{(i // 7) % 50}",
+                related_task_id=f"task-{(i // 11) % 500}"
+            )
+            row = service._build_row(create, notificationid=f"fb-{i}")
+            row["date"] = now - timedelta(seconds=30 * i)
+            row["was_read"] = i % 3 != 0
+            rows.append(row)
+        with database.SessionLocal() as db:
+            service.insert_rows(rows, db)
+    return args.rows
+
+
+def explain(db, stmt) -> dict:
+    """Nodos de acceso e índices del plan (solo PostgreSQL)"""
+    from sqlalchemy import text
+
+    sql = str(stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+    plan = db.execute(text("EXPLAIN (FORMAT JSON) " + sql.replace(":", "\\:"))).scalar()[0]["Plan"]
+
+    nodes, indexes = [], []
+
+    def walk(node):
+        if "Scan" in node["Node Type"]:
+            nodes.append(node["Node Type"])
+        if "Index Name" in node:
+            indexes.append(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return {"nodes": nodes, "indexes": sorted(set(indexes))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    sys.path.insert(0, SERVICE_DIR)
+
+    from app import database
+    from app.schemas.notification import NotificationFilters
+    from app.services.notification_service import NotificationService
+
+    database.init_database()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    database.create_tables()
+
+    service = NotificationService()
+    start = time.perf_counter()
+    rows = seed(database, service, args)
+    seed_s = time.perf_counter() - start
+
+    is_postgresql = database.engine.dialect.name == "postgresql"
+    users = {"hot": HOT_USER, "typical": "filter-bench-1"}
+    results = {}
+    with database.SessionLocal() as db:
+        for name, filters in build_shapes(NotificationFilters, datetime.utcnow()).items():
+            shape = {}
+            for label, userid in users.items():
+                timings = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    page, _ = service.get_user_notifications_page(
+                        userid, db, args.limit, None, service.LISTING_COLUMNS, filters
+                    )
+                    timings.append(time.perf_counter() - t0)
+                shape[label] = {"rows": len(page), "median_ms": round(statistics.median(timings) * 1000, 2)}
+            if is_postgresql:
+                stmt = service._notifications_statement(
+                    HOT_USER, args.limit + 1, None, service.LISTING_COLUMNS, filters, "postgresql"
+                )
+                shape["plan"] = explain(db, stmt)
+            results[name] = shape
+
+    seq_scans = [name for name, shape in results.items() if "Seq Scan" in shape.get("plan", {}).get("nodes", [])]
+    print(json.dumps({
+        "environment": environment(db_url),
+        "rows": rows,
+        "seed_s": round(seed_s, 1),
+        "shapes": results,
+        "seq_scans": seq_scans
+    }, indent=2, ensure_ascii=False))
+
+    if seq_scans:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
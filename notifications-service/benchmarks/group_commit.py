@@ -0,0 +1,94 @@
+"""
+Benchmark de group commit en POST /notifications
+
+Levanta el servicio con uvicorn dos veces (NOTIFICATIONS_GROUP_COMMIT_ENABLED
+=false y true) contra la misma base de datos y lanza N escritores
+concurrentes, cada uno creando notificaciones de a una. Reporta filas por
+segundo y latencias (p50/p95/p99) de cada modo y, con group commit, el
+tamaño medio de los grupos según /health.
+
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/group_commit.py --writers 128 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from common import database_url, environment, start_server, stop_server, summarize, wait_ready
+
+
+async def run_writers(client: httpx.AsyncClient, writers: int, requests_per_writer: int, users: int) -> dict:
+    latencies = []
+    errors = 0
+
+    async def writer(writer_id: int):
+        nonlocal errors
+        for i in range(requests_per_writer):
+            start = time.perf_counter()
+            try:
+                response = await client.post("/notifications", json={
+                    "userid": f"group-commit-{(writer_id + i) % users}",
+                    "type": "informative",
+                    "title": f"Notificación {i}",
+                    "description": f"Escritor {writer_id}"
+                })
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench_mode(args, db_url: str, group_commit: bool, port: int) -> dict:
+    server = start_server(port, db_url, {
+        "NOTIFICATIONS_GROUP_COMMIT_ENABLED": "true" if group_commit else "false",
+        "NOTIFICATIONS_GROUP_COMMIT_MAX_ROWS": str(args.max_rows),
+        "NOTIFICATIONS_GROUP_COMMIT_MAX_DELAY_MS": str(args.max_delay_ms),
+        "METRICS_ENABLED": "false"
+    })
+    limits = httpx.Limits(max_connections=args.writers, max_keepalive_connections=args.writers)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+            await wait_ready(client)
+            # Calentamiento: imports diferidos, pool de conexiones y sentencias preparadas
+            await run_writers(client, min(args.writers, 20), 5, args.users)
+            result = await run_writers(client, args.writers, args.requests, args.users)
+            result["rows_per_s"] = result.pop("throughput_rps")
+            if group_commit:
+                result["group_commit"] = (await client.get("/health")).json().get("group_commit")
+            return result
+    finally:
+        stop_server(server)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=50, help="Notificaciones por escritor")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--max-rows", type=int, default=500)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8840)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    results = {
+        "environment": environment(db_url),
+        "writers": args.writers,
+        "per_request": await bench_mode(args, db_url, group_commit=False, port=args.port),
+        "group_commit": await bench_mode(args, db_url, group_commit=True, port=args.port + 1)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
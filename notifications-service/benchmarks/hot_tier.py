@@ -0,0 +1,127 @@
+"""
+Benchmark del hot tier de notificaciones recientes
+
+En proceso, contra la base de datos configurada: siembra --users usuarios
+con --per-user notificaciones y repite, para usuarios al azar, una
+creación seguida de la primera página de GET /notifications (el patrón
+de un cliente que sondea). Compara la latencia de esa lectura con el
+caché de listados (que se invalida en cada escritura) y con el hot tier
+(que se actualiza), y estima la memoria del hot tier lleno con
+tracemalloc.
+
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    python benchmarks/hot_tier.py --users 1000 --per-user 100 --iterations 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from common import SERVICE_DIR, database_url, environment
+
+
+async def run(service, hot_notifications, args, hot: bool) -> dict:
+    from app.database import async_session_scope
+    from app.schemas.notification import NotificationCreate
+
+    hot_notifications.enabled = hot
+    rng = random.Random(1)
+    latencies = []
+    for i in range(args.iterations):
+        userid = f"hot-tier-{rng.randrange(args.users)}"
+        async with async_session_scope() as db:
+            await service.create_notification_async(NotificationCreate(
+                userid=userid, type="informative", title="Nueva tarea asignada", description=f"Iteración {i}"
+            ), db)
+        async with async_session_scope() as db:
+            start = time.perf_counter()
+            await service.get_user_notifications_cached_async(userid, db, args.limit)
+            latencies.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+        "hot_tier": hot_notifications.stats() if hot else None
+    }
+
+
+async def fill_memory(service, hot_notifications, args) -> dict:
+    """Memoria del hot tier con todos los usuarios sembrados cargados"""
+    from app.database import async_session_scope
+
+    hot_notifications.enabled = True
+    for u in range(args.users):
+        hot_notifications.invalidate(f"hot-tier-{u}")
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for u in range(args.users):
+        async with async_session_scope() as db:
+            await service.get_user_notifications_cached_async(f"hot-tier-{u}", db, args.limit)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "users": args.users,
+        "traced_bytes_per_user": round(allocated / args.users),
+        "estimated_bytes_per_user": round(hot_notifications.stats()["bytes"] / max(args.users, 1))
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--per-user", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["NOTIFICATIONS_HOT_TIER_ENABLED"] = "true"
+    os.environ.setdefault("NOTIFICATIONS_HOT_TIER_SIZE", str(args.limit))
+    sys.path.insert(0, SERVICE_DIR)
+
+    from app import database
+    from app.schemas.notification import NotificationCreate
+    from app.services.hot_notifications import hot_notifications
+    from app.services.notification_service import NotificationService
+
+    database.initialize()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+
+    service = NotificationService()
+    with database.SessionLocal() as db:
+        for u in range(args.users):
+            service.create_notifications_bulk([
+                NotificationCreate(
+                    userid=f"hot-tier-{u}", type="informative",
+                    title="Nueva tarea asignada", description=f"Notificación {i}"
+                )
+                for i in range(args.per_user)
+            ], db)
+
+    results = {
+        "environment": environment(db_url),
+        "users": args.users,
+        "per_user": args.per_user,
+        "page_cache": await run(service, hot_notifications, args, hot=False),
+        "hot_tier": await run(service, hot_notifications, args, hot=True),
+        "memory": await fill_memory(service, hot_notifications, args)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark de la serialización de listados
+
+Compara, sobre una lista de N notificaciones (10k por defecto), el camino
+anterior (objetos ORM -> dict -> NotificationListResponse ->
+jsonable_encoder -> JSONResponse) con el actual (tuplas de columnas ->
+dict -> FastJSONResponse). Verifica que ambos produzcan los mismos bytes.
+
+Usa DATABASE_URL o un SQLite temporal si no está definido.
+
+Uso:
+    python benchmarks/listing_serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from common import SERVICE_DIR, database_url, environment
+
+
+def best_of(repeat: int, fn) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["KAFKA_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    sys.path.insert(0, SERVICE_DIR)
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app import database
+    from app.responses import FastJSONResponse
+    from app.schemas.notification import NotificationCreate, NotificationListResponse, NotificationType
+    from app.services.notification_service import NotificationService
+
+    database.init_database()
+    if database.engine is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    database.create_tables()
+
+    service = NotificationService()
+    userid = f"listing-bench-{args.rows}"
+    db = database.SessionLocal()
+    try:
+        existing = len(service.get_user_notifications(userid, db, args.rows))
+        if existing < args.rows:
+            service.create_notifications_bulk([
+                NotificationCreate(
+                    userid=userid,
+                    type=NotificationType.INFORMATIVE,
+                    title=f"Notificación {i}",
+                    description="Descripción con acentos: notificación número " + str(i)
+                )
+                for i in range(args.rows - existing)
+            ], db)
+
+        def legacy_fetch():
+            return service.get_user_notifications(userid, db, args.rows)
+
+        def fast_fetch():
+            return service.get_user_notifications(userid, db, args.rows, columns=service.LISTING_COLUMNS)
+
+        def legacy_encode(notifications):
+            response = NotificationListResponse(
+                success=True,
+                message="Notificaciones obtenidas exitosamente",
+                body={"notifications": [service.serialize(n) for n in notifications], "next_cursor": None}
+            )
+            validated = NotificationListResponse.model_validate(response.model_dump())
+            return JSONResponse(jsonable_encoder(validated)).body
+
+        def fast_encode(rows):
+            return FastJSONResponse({
+                "success": True,
+                "message": "Notificaciones obtenidas exitosamente",
+                "body": {"notifications": [service.serialize_columns(r) for r in rows], "next_cursor": None}
+            }).body
+
+        notifications, legacy_fetch_min, legacy_fetch_median = best_of(args.repeat, legacy_fetch)
+        rows, fast_fetch_min, fast_fetch_median = best_of(args.repeat, fast_fetch)
+        legacy_body, legacy_encode_min, legacy_encode_median = best_of(args.repeat, lambda: legacy_encode(notifications))
+        fast_body, fast_encode_min, fast_encode_median = best_of(args.repeat, lambda: fast_encode(rows))
+    finally:
+        db.close()
+
+    ms = lambda seconds: round(seconds * 1000, 2)
+    print(json.dumps({
+        "environment": environment(db_url),
+        "rows": len(rows),
+        "bytes_identical": legacy_body == fast_body,
+        "response_bytes": len(fast_body),
+        "legacy": {
+            "fetch_ms": {"min": ms(legacy_fetch_min), "median": ms(legacy_fetch_median)},
+            "encode_ms": {"min": ms(legacy_encode_min), "median": ms(legacy_encode_median)}
+        },
+        "fast": {
+            "fetch_ms": {"min": ms(fast_fetch_min), "median": ms(fast_fetch_median)},
+            "encode_ms": {"min": ms(fast_encode_min), "median": ms(fast_encode_median)}
+        }
+    }, indent=2))
+
+    if legacy_body != fast_body:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
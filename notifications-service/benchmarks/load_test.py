@@ -0,0 +1,162 @@
+"""
+Prueba de carga HTTP del servicio de notificaciones
+
+Levanta el servicio con uvicorn contra DATABASE_URL (o un SQLite temporal
+si no está definido), siembra N usuarios × M notificaciones y ejecuta cada
+escenario con C clientes concurrentes:
+
+    list       GET    /notifications
+    create     POST   /notifications
+    mark_read  PATCH  /notifications/read
+    delete     DELETE /notifications
+
+Imprime throughput y latencias p50/p95/p99 en JSON. La semilla aleatoria es
+fija para que las corridas sean comparables entre commits.
+
+Uso:
+    python benchmarks/load_test.py --users 100 --per-user 50 --clients 50
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py --output results.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from common import database_url, environment, start_server, stop_server, summarize, wait_ready
+
+SCENARIOS = ("list", "create", "mark_read", "delete")
+SEED_CHUNK = 1000
+
+
+def userid_for(index: int) -> str:
+    return f"load-user-{index}"
+
+
+async def seed(client: httpx.AsyncClient, users: int, per_user: int):
+    """Siembra con POST /notifications/batch usando plantillas"""
+    userids = [userid_for(u) for u in range(users)]
+    for i in range(per_user):
+        for start in range(0, users, SEED_CHUNK):
+            response = await client.post("/notifications/batch", json={
+                "template": {
+                    "type": "informative",
+                    "title": f"Notificación {i}",
+                    "description": "Notificación sembrada para la prueba de carga"
+                },
+                "userids": userids[start:start + SEED_CHUNK]
+            })
+            response.raise_for_status()
+
+
+async def collect_ids(client: httpx.AsyncClient, users: int, per_user: int) -> list:
+    """Obtiene pares (userid, notificationid) para los escenarios de escritura"""
+    pairs = []
+    for u in range(users):
+        response = await client.get("/notifications", params={"userid": userid_for(u), "limit": min(per_user, 200)})
+        response.raise_for_status()
+        pairs.extend((userid_for(u), n["notificationid"]) for n in response.json()["body"]["notifications"])
+    return pairs
+
+
+def build_request(scenario: str, rng: random.Random, users: int, pairs: list) -> dict:
+    if scenario == "list":
+        return {"method": "GET", "url": "/notifications",
+                "params": {"userid": userid_for(rng.randrange(users)), "limit": 20}}
+    if scenario == "create":
+        return {"method": "POST", "url": "/notifications", "json": {
+            "userid": userid_for(rng.randrange(users)),
+            "type": "informative",
+            "title": "Notificación de carga",
+            "description": "Creada por la prueba de carga"
+        }}
+    if scenario == "mark_read":
+        userid, notificationid = rng.choice(pairs)
+        return {"method": "PATCH", "url": "/notifications/read",
+                "json": {"userid": userid, "notificationid": notificationid}}
+    # delete: cada id se usa una sola vez
+    userid, notificationid = pairs.pop()
+    return {"method": "DELETE", "url": "/notifications",
+            "json": {"userid": userid, "notificationid": notificationid}}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, args, pairs: list) -> dict:
+    rng = random.Random(args.seed)
+    total = args.clients * args.requests
+    if scenario == "delete":
+        total = min(total, len(pairs))
+    requests = [build_request(scenario, rng, args.users, pairs) for _ in range(total)]
+
+    latencies = []
+    errors = 0
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        for request in requests[worker_id::args.clients]:
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(args.clients)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--per-user", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Peticiones por cliente y escenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8810)
+    parser.add_argument("--output", help="Archivo donde guardar el JSON")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    db_url = database_url()
+    server = start_server(args.port, db_url)
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    results = {
+        "environment": environment(db_url),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("port", "output")},
+        "scenarios": {}
+    }
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+
+            start = time.perf_counter()
+            await seed(client, args.users, args.per_user)
+            results["seed_s"] = round(time.perf_counter() - start, 3)
+
+            pairs = await collect_ids(client, args.users, args.per_user)
+            random.Random(args.seed).shuffle(pairs)
+
+            for scenario in scenarios:
+                results["scenarios"][scenario] = await run_scenario(client, scenario, args, pairs)
+    finally:
+        stop_server(server)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
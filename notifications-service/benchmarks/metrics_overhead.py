@@ -0,0 +1,73 @@
+"""
+Costo de la instrumentación de /metrics
+
+Ejecuta el escenario de listado de load_test.py con METRICS_ENABLED=false y
+true sobre la misma base de datos, alternando las corridas para reducir el
+ruido, y reporta la diferencia de throughput y p50. Termina con código 1 si
+el sobrecosto supera --max-overhead por ciento.
+
+Uso:
+    python benchmarks/metrics_overhead.py --rounds 3 --max-overhead 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+
+import httpx
+
+from common import database_url, environment, start_server, stop_server, wait_ready
+from load_test import run_scenario, seed
+
+
+async def run_once(args, db_url: str, metrics_enabled: bool, seed_data: bool) -> dict:
+    server = start_server(args.port, db_url, {"METRICS_ENABLED": "true" if metrics_enabled else "false"})
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            if seed_data:
+                await seed(client, args.users, args.per_user)
+            # Calentamiento antes de medir
+            await run_scenario(client, "list", args, [])
+            return await run_scenario(client, "list", args, [])
+    finally:
+        stop_server(server)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40, help="Peticiones por cliente")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-overhead", type=float, default=5.0, help="Sobrecosto máximo aceptado (%%)")
+    parser.add_argument("--port", type=int, default=8820)
+    args = parser.parse_args()
+
+    db_url = database_url()
+    runs = {"disabled": [], "enabled": []}
+    for round_number in range(args.rounds):
+        runs["disabled"].append(await run_once(args, db_url, False, seed_data=round_number == 0))
+        runs["enabled"].append(await run_once(args, db_url, True, seed_data=False))
+
+    throughput = {mode: statistics.median(r["throughput_rps"] for r in results) for mode, results in runs.items()}
+    p50 = {mode: statistics.median(r["p50_ms"] for r in results) for mode, results in runs.items()}
+    overhead = (throughput["disabled"] - throughput["enabled"]) / throughput["disabled"] * 100
+
+    print(json.dumps({
+        "environment": environment(db_url),
+        "throughput_rps": throughput,
+        "p50_ms": p50,
+        "overhead_pct": round(overhead, 2),
+        "runs": runs
+    }, indent=2))
+
+    if overhead > args.max_overhead:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
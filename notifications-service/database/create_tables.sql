@@ -11,11 +11,15 @@ CREATE TABLE IF NOT EXISTS notifications (
     description TEXT NOT NULL,
     was_read BOOLEAN DEFAULT FALSE NOT NULL,
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    coalesced_count INTEGER DEFAULT 1 NOT NULL,
     related_project_id VARCHAR(36),
     related_user_id VARCHAR(36),
     related_task_id VARCHAR(36)
 );
 
+-- Tablas creadas antes de la fusión de notificaciones similares
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS coalesced_count INTEGER DEFAULT 1 NOT NULL;
+
 -- Crear índices para mejorar el rendimiento
 CREATE INDEX IF NOT EXISTS idx_notifications_userid ON notifications(userid);
 CREATE INDEX IF NOT EXISTS idx_notifications_was_read ON notifications(was_read);
@@ -23,6 +27,104 @@ CREATE INDEX IF NOT EXISTS idx_notifications_date ON notifications(date DESC);
 CREATE INDEX IF NOT EXISTS idx_notifications_type ON notifications(type);
 CREATE INDEX IF NOT EXISTS idx_notifications_related_project ON notifications(related_project_id);
 
+-- Índice compuesto para la paginación keyset de GET /notifications
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_date ON notifications(userid, date DESC, notificationid DESC);
+
+-- Índice parcial para GET /notifications/unread-count
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_unread ON notifications(userid) WHERE was_read = FALSE;
+
+-- Filtros de GET /notifications (unread, type, related_project_id, related_task_id)
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_unread_date ON notifications(userid, date DESC, notificationid DESC) WHERE was_read = FALSE;
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_type_date ON notifications(userid, type, date DESC, notificationid DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_project_date ON notifications(userid, related_project_id, date DESC, notificationid DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_userid_task_date ON notifications(userid, related_task_id, date DESC, notificationid DESC);
+
+-- Resúmenes por email: cada pasada recorre un rango de fechas de las no leídas
+CREATE INDEX IF NOT EXISTS idx_notifications_unread_date ON notifications(date) WHERE was_read = FALSE;
+
+-- Búsqueda de texto (parámetro q): columna generada e índice GIN (PostgreSQL 12+)
+-- En una tabla existente el ALTER reescribe la tabla una vez
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('spanish', title || ' ' || description)) STORED;
+CREATE INDEX IF NOT EXISTS idx_notifications_search ON notifications USING GIN (search_vector);
+
+-- Versión por usuario: cada escritura la incrementa y GET /notifications la
+-- usa como ETag para responder 304 sin consultar las notificaciones
+CREATE TABLE IF NOT EXISTS notification_user_versions (
+    userid VARCHAR(36) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Eventos de Kafka ya procesados: la clave es solo el ID derivado del evento,
+-- así las re-entregas se detectan aunque notifications esté particionada
+CREATE TABLE IF NOT EXISTS notification_kafka_events (
+    notificationid VARCHAR(36) PRIMARY KEY,
+    processed_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_notification_kafka_events_processed_at ON notification_kafka_events(processed_at);
+
+-- Resúmenes por email: última notificación incluida en el resumen de cada
+-- usuario, para que cada pasada solo considere lo nuevo
+CREATE TABLE IF NOT EXISTS notification_digest_watermarks (
+    userid VARCHAR(36) PRIMARY KEY,
+    last_notification_at TIMESTAMP NOT NULL,
+    last_digest_at TIMESTAMP NOT NULL
+);
+
+-- Destinatario de los resúmenes: los eventos de Kafka lo informan en
+-- user_email/user_name; sin email el usuario no recibe resumen
+CREATE TABLE IF NOT EXISTS notification_recipients (
+    userid VARCHAR(36) PRIMARY KEY,
+    email VARCHAR(255) NOT NULL,
+    name VARCHAR(255),
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Huella del esquema que aplicó el servicio: si coincide con la de los
+-- modelos, el arranque omite create_all. Al crear el esquema con este
+-- script la tabla queda vacía y el primer arranque lo verifica y la completa.
+CREATE TABLE IF NOT EXISTS schema_version (
+    component VARCHAR(64) PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+);
+
+-- Variante particionada (opcional, NOTIFICATIONS_PARTITIONING_ENABLED=true)
+-- Solo para bases nuevas: en lugar del CREATE TABLE anterior, la tabla se
+-- particiona por mes sobre date. La clave primaria debe incluir date.
+-- El servicio crea las particiones de los próximos meses y elimina (o
+-- desacopla) las que superan NOTIFICATIONS_RETENTION_MONTHS.
+
+/*
+CREATE TABLE IF NOT EXISTS notifications (
+    notificationid VARCHAR(36) NOT NULL,
+    userid VARCHAR(36) NOT NULL,
+    type VARCHAR(20) NOT NULL CHECK (type IN ('warning', 'success', 'informative', 'application')),
+    title VARCHAR(255) NOT NULL,
+    description TEXT NOT NULL,
+    was_read BOOLEAN DEFAULT FALSE NOT NULL,
+    date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    coalesced_count INTEGER DEFAULT 1 NOT NULL,
+    related_project_id VARCHAR(36),
+    related_user_id VARCHAR(36),
+    related_task_id VARCHAR(36),
+    PRIMARY KEY (notificationid, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE IF NOT EXISTS notifications_p2025_11 PARTITION OF notifications
+    FOR VALUES FROM ('2025-11-01') TO ('2025-12-01');
+CREATE TABLE IF NOT EXISTS notifications_p2025_12 PARTITION OF notifications
+    FOR VALUES FROM ('2025-12-01') TO ('2026-01-01');
+
+-- Filas fuera de las particiones mensuales (p. ej. con el mantenimiento detenido)
+CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT;
+
+-- Retención: eliminar una partición completa es una operación de metadatos
+-- DROP TABLE notifications_p2025_11;
+-- o desacoplarla para archivarla
+-- ALTER TABLE notifications DETACH PARTITION notifications_p2025_11;
+*/
+
 -- Comentarios para documentación
 COMMENT ON TABLE notifications IS 'Tabla de notificaciones del sistema';
 COMMENT ON COLUMN notifications.notificationid IS 'ID único de la notificación (UUID)';